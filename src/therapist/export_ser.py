@@ -0,0 +1,154 @@
+import os, copy, glob, json, time, argparse
+from typing import List
+
+import librosa
+import torch
+from transformers import WhisperModel
+
+from logic.tools.ser_tool import (
+    EXPORT_MANIFEST_FILE, MERGED_WEIGHTS_FILE, ONNX_MODEL_FILE, SAMPLE_RATE, SER_EXPORT_DIR,
+    SER_LENGTH_AWARE, FramesSERModel, OnnxSERModel, build_ser_model, clip_windows, load_ser_processor,
+    merge_ser_model, quantize_ser_model, ser_features,
+)
+
+BASE_DIR = os.path.dirname(__file__)
+DEFAULT_SAMPLES = os.path.join(BASE_DIR, "swagger_server", "voice_samples")
+
+
+def load_reference() -> torch.nn.Module:
+    """The runtime SER model: whisper-base encoder + LoRA adapters, fp32, CPU."""
+    base = WhisperModel.from_pretrained("openai/whisper-base")
+    return build_ser_model(base.encoder).cpu().eval()
+
+
+def sample_features(sample_dir: str, limit: int) -> List[torch.Tensor]:
+    """
+    Features of the sample clips, windowed and padded exactly as detectEmotion
+    does it in the configured mode (SER_LENGTH_AWARE, else 30 s padded input).
+    """
+    processor = load_ser_processor()
+    paths = sorted(glob.glob(os.path.join(sample_dir, "*.wav")))[:limit]
+    if not paths:
+        raise RuntimeError(f"No .wav samples found in {sample_dir}")
+    features = []
+    for path in paths:
+        audio, _ = librosa.load(path, sr=SAMPLE_RATE, mono=True)
+        for _, _, samples in clip_windows(audio):
+            features.append(ser_features(processor, samples))
+    mode = "length-aware" if SER_LENGTH_AWARE else "30 s padded"
+    print(f"[export_ser] {len(paths)} clips → {len(features)} windows ({mode})")
+    return features
+
+
+def run_model(model, features: List[torch.Tensor], runs: int):
+    """Logits per window plus the mean latency per window in ms."""
+    with torch.no_grad():
+        logits = [model(input_values=x) for x in features]
+        start = time.perf_counter()
+        for _ in range(runs):
+            for x in features:
+                model(input_values=x)
+        elapsed = time.perf_counter() - start
+    return torch.cat(logits), elapsed * 1000.0 / max(1, runs * len(features))
+
+
+def compare(name: str, reference, ref_ms: float, logits, ms: float, tolerance: float) -> dict:
+    max_diff = float((logits - reference).abs().max())
+    agreement = float((logits.argmax(-1) == reference.argmax(-1)).float().mean())
+    report = {
+        "max_abs_logit_diff": round(max_diff, 6),
+        "top1_agreement": round(agreement, 4),
+        "latency_ms": round(ms, 2),
+        "speedup": round(ref_ms / ms, 2) if ms else None,
+        "tolerance": tolerance,
+        "passed": max_diff <= tolerance and agreement == 1.0,
+    }
+    print(f"[export_ser] {name:<7} max|Δlogit|={max_diff:.2e} top1={agreement:.1%} "
+          f"{ms:.1f} ms/window ({report['speedup']}x) {'OK' if report['passed'] else 'FAILED'}")
+    return report
+
+
+def export_onnx(merged, path: str, example: torch.Tensor) -> None:
+    torch.onnx.export(
+        FramesSERModel(merged).eval(),
+        (example,),
+        path,
+        input_names=["input_features"],
+        output_names=["logits"],
+        dynamic_axes={"input_features": {0: "batch", 2: "frames"}, "logits": {0: "batch"}},
+        opset_version=17,
+    )
+
+
+def run_export(out_dir: str, formats: List[str], sample_dir: str, limit: int, runs: int,
+               tolerance: float, int8_tolerance: float) -> dict:
+    os.makedirs(out_dir, exist_ok=True)
+    torch.manual_seed(0)
+
+    features = sample_features(sample_dir, limit)
+    reference = load_reference()
+    ref_logits, ref_ms = run_model(reference, features, runs)
+    print(f"[export_ser] peft    {ref_ms:.1f} ms/window (reference)")
+    backends = {"peft": {"latency_ms": round(ref_ms, 2), "passed": True}}
+
+    # Merging mutates the model, so it works on a copy. Copying (rather than
+    # loading again) also keeps the emotion head identical to the reference.
+    merged = merge_ser_model(copy.deepcopy(reference))
+    torch.save(
+        {"config": merged.config.to_dict(), "state_dict": merged.state_dict()},
+        os.path.join(out_dir, MERGED_WEIGHTS_FILE),
+    )
+
+    if "merged" in formats:
+        logits, ms = run_model(merged, features, runs)
+        backends["merged"] = compare("merged", ref_logits, ref_ms, logits, ms, tolerance)
+
+    if "int8" in formats:
+        quantized = quantize_ser_model(copy.deepcopy(merged))
+        logits, ms = run_model(quantized, features, runs)
+        backends["int8"] = compare("int8", ref_logits, ref_ms, logits, ms, int8_tolerance)
+
+    if "onnx" in formats:
+        onnx_path = os.path.join(out_dir, ONNX_MODEL_FILE)
+        export_onnx(merged, onnx_path, features[0])
+        try:
+            session = OnnxSERModel(onnx_path)
+        except ImportError:
+            print("[export_ser] onnxruntime not installed, ONNX model written but not verified")
+            backends["onnx"] = {"passed": False, "error": "onnxruntime not installed"}
+        else:
+            logits, ms = run_model(session, features, runs)
+            backends["onnx"] = compare("onnx", ref_logits, ref_ms, logits, ms, tolerance)
+
+    manifest = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "torch": torch.__version__,
+        "threads": torch.get_num_threads(),
+        "samples": len(features),
+        "length_aware": SER_LENGTH_AWARE,
+        "backends": backends,
+    }
+    with open(os.path.join(out_dir, EXPORT_MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    print(f"[export_ser] wrote {out_dir}")
+    return manifest
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(
+        description="Merge the SER LoRA adapter and export optimized CPU artifacts (merged fp32, int8, ONNX)."
+    )
+    ap.add_argument("--out-dir", default=SER_EXPORT_DIR, help="Output directory (default: SER_EXPORT_DIR)")
+    ap.add_argument("--formats", default="merged,int8,onnx", help="Comma-separated: merged,int8,onnx")
+    ap.add_argument("--samples", default=DEFAULT_SAMPLES, help="Directory of .wav clips for the parity check")
+    ap.add_argument("--num-samples", type=int, default=16)
+    ap.add_argument("--runs", type=int, default=3, help="Timed passes over the samples per backend")
+    ap.add_argument("--tolerance", type=float, default=1e-3, help="Max |Δlogit| for merged/onnx")
+    ap.add_argument("--int8-tolerance", type=float, default=0.5, help="Max |Δlogit| for int8")
+    args = ap.parse_args()
+
+    formats = [f.strip() for f in args.formats.split(",") if f.strip()]
+    manifest = run_export(args.out_dir, formats, args.samples, args.num_samples, args.runs,
+                          args.tolerance, args.int8_tolerance)
+    failed = [name for name, report in manifest["backends"].items() if not report.get("passed")]
+    raise SystemExit(1 if failed else 0)
@@ -1,4 +1,5 @@
 from crewai import Agent, Crew, Task, LLM
+from crewai.agents.cache import CacheHandler
 from crewai.project import CrewBase, agent, crew, task
 from crewai_tools import VisionTool
 from .tools.voice_transcription_tool import VoiceTranscriptionTool
@@ -9,11 +10,27 @@ ollama_host = os.getenv('OLLAMA_HOST', 'host.docker.internal:11434')
 
 base_url = f"http://{ollama_host}"
 
-therapistllm = LLM(
-    model="ollama/therapist-llm:latest",
-    base_url=base_url,
-    temperature=0.3,
-    timeout=60,
+# Agent step-by-step output is a debugging aid; keep it off in production
+VERBOSE = os.getenv("CREW_VERBOSE", os.getenv("APP_DEBUG", "0")) == "1"
+
+def make_therapist_llm(stream: bool = False) -> LLM:
+    """Create a client for the fine-tuned therapist model."""
+    return LLM(
+        model="ollama/therapist-llm:latest",
+        base_url=base_url,
+        temperature=0.3,
+        timeout=60,
+        stream=stream,
+    )
+
+
+therapistllm = make_therapist_llm()
+
+# Appended to the conversation task when the analyses run outside the crew
+# (managed orchestration) and their reports are passed in as an input.
+ANALYSIS_REPORTS_SECTION = (
+    "\n    Reports of the textTherapist, imageTherapist, voiceTherapist for the user's latest message:\n"
+    "{analysis_reports}\n"
 )
 
 @CrewBase
@@ -28,24 +45,28 @@ class Therapist():
     ser_tool = SERTool()
 
 
-    def __init__(self, text_provided=False, audio_provided=False, image_provided=False):
+    def __init__(self, text_provided=False, audio_provided=False, image_provided=False, stream=False):
         self.enable_text_agent = text_provided
         self.enable_audio_agent = audio_provided
         self.enable_image_agent = image_provided
+        # A streaming crew gets its own LLM client so its chunks can be told apart
+        self.therapist_llm = make_therapist_llm(stream=True) if stream else therapistllm
+        # Crews are built once per instance and reused by later kickoffs
+        self._crews = {}
 
     @agent
     def imageTherapist(self) -> Agent:
         return Agent(
             config=self.agents_config['imageTherapist'],
             tools=[self.vision_tool],
-            verbose=True,
+            verbose=VERBOSE,
         )
 
     @agent
     def textTherapist(self) -> Agent:
         return Agent(
             config=self.agents_config['textTherapist'],
-            verbose=True,
+            verbose=VERBOSE,
             
         )
 
@@ -54,7 +75,7 @@ class Therapist():
         return Agent(
             config=self.agents_config['voiceTherapist'],
             tools=[self.voice_tool, self.ser_tool],
-            verbose=True,
+            verbose=VERBOSE,
         )
 
     @agent
@@ -62,15 +83,14 @@ class Therapist():
         return Agent(
             config=self.agents_config['therapist'],
             memory=True,
-            verbose=True,
-            llm=therapistllm
+            verbose=VERBOSE,
+            llm=self.therapist_llm
         )
 
     @task
     def image_analysis_task(self) -> Task:
         return Task(
             config=self.tasks_config['image_analysis_task'],
-            output_file='report/image_report.md',
             async_execution=True,
         )
 
@@ -78,7 +98,6 @@ class Therapist():
     def text_analysis_task(self) -> Task:
         return Task(
             config=self.tasks_config['text_analysis_task'],
-            output_file='report/text_report.md',
             async_execution=True,
         )
 
@@ -86,7 +105,6 @@ class Therapist():
     def voice_analysis_task(self) -> Task:
         return Task(
             config=self.tasks_config['voice_analysis_task'],
-            output_file='report/audio_report.md',
             async_execution=True,
         )
 
@@ -107,6 +125,11 @@ class Therapist():
 
     def crew(self) -> Crew:
         """Creates the Therapist crew"""
+        if "main" not in self._crews:
+            self._crews["main"] = self._build_crew()
+        return self._crews["main"]
+
+    def _build_crew(self) -> Crew:
         agents = []
         tasks = []
 
@@ -128,3 +151,86 @@ class Therapist():
             tasks=tasks,
             verbose=False,
         )
+
+    def reports(self) -> dict:
+        """
+        Return the raw output of each enabled analysis task after kickoff,
+        keyed by modality ("text", "image", "audio"). Outputs stay in memory
+        on this instance, so concurrent sessions never see each other's reports.
+        """
+        enabled = {
+            "audio": (self.enable_audio_agent, self.voice_analysis_task),
+            "image": (self.enable_image_agent, self.image_analysis_task),
+            "text": (self.enable_text_agent, self.text_analysis_task),
+        }
+        reports = {}
+        for modality, (is_enabled, task) in enabled.items():
+            output = task().output if is_enabled else None
+            reports[modality] = output.raw if output is not None else None
+        return reports
+
+    def analysis_crew(self, modality: str) -> Crew:
+        """Single-agent crew running one modality analysis ("text", "image", "audio") on its own."""
+        agent_fn, task_fn = {
+            "audio": (self.voiceTherapist, self.voice_analysis_task),
+            "image": (self.imageTherapist, self.image_analysis_task),
+            "text": (self.textTherapist, self.text_analysis_task),
+        }[modality]
+        if modality not in self._crews:
+            self._crews[modality] = Crew(
+                agents=[agent_fn()],
+                tasks=[task_fn()],
+                verbose=False,
+            )
+        return self._crews[modality]
+
+    def reported_conversation_task(self) -> Task:
+        """Conversation task that reads the analysis reports from the `analysis_reports` input."""
+        config = dict(self.tasks_config['conversation_task'])
+        config['description'] = config['description'] + ANALYSIS_REPORTS_SECTION
+        return Task(
+            config=config,
+            async_execution=False,
+        )
+
+    def conversation_crew(self) -> Crew:
+        """Therapist-only crew for replies whose analyses were run separately."""
+        if "conversation" not in self._crews:
+            self._crews["conversation"] = Crew(
+                agents=[self.therapist()],
+                tasks=[self.reported_conversation_task()],
+                verbose=False,
+            )
+        return self._crews["conversation"]
+
+    def prebuild(self) -> None:
+        """Build every crew this instance can run, so no request pays for it."""
+        self.crew()
+        self.conversation_crew()
+        for modality, enabled in (("audio", self.enable_audio_agent),
+                                  ("image", self.enable_image_agent),
+                                  ("text", self.enable_text_agent)):
+            if enabled:
+                self.analysis_crew(modality)
+
+    def reset(self) -> None:
+        """
+        Drop the per-run state of the last kickoff so the crews can be reused:
+        task outputs and counters, the tool result cache and usage metrics.
+        """
+        for crew in self._crews.values():
+            # Crew.kickoff hands its cache handler to the agents, so both get a fresh one
+            if hasattr(crew, "_cache_handler"):
+                crew._cache_handler = CacheHandler()
+            if getattr(crew, "usage_metrics", None) is not None:
+                crew.usage_metrics = None
+            for crew_task in crew.tasks:
+                crew_task.output = None
+                for counter in ("used_tools", "tools_errors", "delegations"):
+                    if hasattr(crew_task, counter):
+                        setattr(crew_task, counter, 0)
+                if hasattr(crew_task, "processed_by_agents"):
+                    crew_task.processed_by_agents = set()
+            for crew_agent in crew.agents:
+                if hasattr(crew_agent, "set_cache_handler"):
+                    crew_agent.set_cache_handler(CacheHandler())
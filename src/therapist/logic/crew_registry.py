@@ -0,0 +1,93 @@
+import os
+import logging
+import threading
+from itertools import product
+from typing import Dict, List, Tuple
+
+from .crew import Therapist
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Config
+# ---------------------------------------------------------------------------
+CREW_POOL_SIZE = int(os.getenv("CREW_POOL_SIZE", "4"))  # idle crews kept per combination
+CREW_PREBUILD = os.getenv("CREW_PREBUILD", "1") == "1"
+
+# (text, image, audio) for every non-empty combination of inputs
+MODALITY_COMBINATIONS = [combo for combo in product((True, False), repeat=3) if any(combo)]
+
+_Key = Tuple[bool, bool, bool, bool]
+
+
+class CrewRegistry:
+    """
+    Pool of pre-built `Therapist` crews, one pool per modality combination.
+
+    Building a `Therapist` resolves the YAML configs and creates every
+    Agent/Task/Crew object, so requests check a ready instance out instead
+    and return it afterwards. An instance is used by one request at a time;
+    its per-run state (task outputs, tool cache, usage metrics) is cleared on
+    check-in so nothing leaks between requests, and an instance that cannot
+    be reset is dropped so a fresh one gets built.
+    """
+
+    def __init__(self, pool_size: int = CREW_POOL_SIZE):
+        self.pool_size = pool_size
+        self._idle: Dict[_Key, List[Therapist]] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, text_provided=False, image_provided=False, audio_provided=False,
+                stream=False) -> Therapist:
+        """Check out a crew for the given inputs, building one if none is idle."""
+        key = (bool(text_provided), bool(image_provided), bool(audio_provided), bool(stream))
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop()
+        return self._build(key)
+
+    def release(self, therapist: Therapist, reusable: bool = True) -> None:
+        """
+        Return a crew to its pool. Pass `reusable=False` when work started on
+        it may still be running (e.g. an abandoned analysis); it is dropped.
+        """
+        if not reusable:
+            return
+        try:
+            therapist.reset()
+        except Exception as e:
+            logger.warning(f"Dropping crew that could not be reset: {e}")
+            return
+        with self._lock:
+            idle = self._idle.setdefault(therapist.pool_key, [])
+            if len(idle) < self.pool_size:
+                idle.append(therapist)
+
+    def warm_up(self, stream: bool = False) -> None:
+        """Build the Agent/Task/Crew objects of every modality combination ahead of the first request."""
+        for text, image, audio in MODALITY_COMBINATIONS:
+            key = (text, image, audio, stream)
+            with self._lock:
+                if self._idle.get(key):
+                    continue
+            therapist = self._build(key)
+            therapist.prebuild()
+            self.release(therapist)
+        logger.info("Pre-built %d crew templates (stream=%s)", len(MODALITY_COMBINATIONS), stream)
+
+    @staticmethod
+    def _build(key: _Key) -> Therapist:
+        text, image, audio, stream = key
+        therapist = Therapist(
+            text_provided=text,
+            image_provided=image,
+            audio_provided=audio,
+            stream=stream,
+        )
+        therapist.pool_key = key
+        return therapist
+
+
+# Process-wide registry used by TherapySession
+crew_registry = CrewRegistry()
@@ -0,0 +1,220 @@
+import os
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .crew import therapistllm
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Config
+# ---------------------------------------------------------------------------
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "1500"))   # tokens of verbatim turns
+HISTORY_MAX_TURNS = int(os.getenv("HISTORY_MAX_TURNS", "12"))           # verbatim turns at most
+HISTORY_SUMMARY_ENABLED = os.getenv("HISTORY_SUMMARY_ENABLED", "1") == "1"
+HISTORY_SUMMARY_MAX_WORDS = int(os.getenv("HISTORY_SUMMARY_MAX_WORDS", "150"))
+# Turns folded into the summary per LLM call
+HISTORY_SUMMARY_CHUNK_TOKENS = int(os.getenv("HISTORY_SUMMARY_CHUNK_TOKENS", "2000"))
+# Older turns not summarized yet stay in the prompt verbatim, up to this many tokens
+HISTORY_PENDING_TOKEN_BUDGET = int(os.getenv("HISTORY_PENDING_TOKEN_BUDGET", "3000"))
+# Summaries are stored per conversation, so they survive restarts
+HISTORY_SUMMARY_DIR = Path(os.getenv(
+    "HISTORY_SUMMARY_DIR", os.path.join(os.getenv("DATA_DIR", "/tmp/therapist-data"), "summaries")
+))
+
+SUMMARY_PROMPT = (
+    "You maintain a running summary of a therapy conversation for the therapist.\n"
+    "Update the summary with the new turns below. Keep the user's key concerns, "
+    "emotions, important life events and any advice already given, so it is not repeated. "
+    "Write at most {max_words} words in third person. Reply with the summary only.\n\n"
+    "Current summary:\n{summary}\n\n"
+    "New turns:\n{turns}"
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token), good enough for budgeting."""
+    return len(text) // 4 + 1
+
+
+def chunk_turns(turns: List[str], max_tokens: int) -> List[List[str]]:
+    """Group consecutive turns into chunks of at most `max_tokens`; oversized turns are cut."""
+    chunks: List[List[str]] = []
+    current: List[str] = []
+    used = 0
+    for turn in turns:
+        if estimate_tokens(turn) > max_tokens:
+            turn = turn[:max_tokens * 4 - 4]
+        cost = estimate_tokens(turn)
+        if current and used + cost > max_tokens:
+            chunks.append(current)
+            current, used = [], 0
+        current.append(turn)
+        used += cost
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class _Summary:
+    """Rolling summary state of one conversation."""
+
+    __slots__ = ("text", "covered", "pending")
+
+    def __init__(self, text: str = "", covered: int = 0):
+        self.text = text          # summary of turns[:covered]
+        self.covered = covered    # number of leading turns folded into `text`
+        self.pending = False      # a background update is running
+
+
+class HistoryManager:
+    """
+    Bounds the conversation history that goes into the crew prompt.
+
+    The newest turns are kept verbatim, up to `max_turns` and `token_budget`.
+    Turns that fall out of that window are folded into a rolling summary per
+    conversation by a background worker, a bounded chunk per LLM call, so the
+    prompt carries "summary + recent turns" instead of the whole conversation.
+    Until the summary covers them, older turns stay in the prompt verbatim
+    (up to `pending_budget` tokens); the request never waits for the summary.
+    Summaries are written to `directory`, one JSON file per conversation.
+    """
+
+    def __init__(self, token_budget: int = HISTORY_TOKEN_BUDGET, max_turns: int = HISTORY_MAX_TURNS,
+                 summarize: bool = HISTORY_SUMMARY_ENABLED, chunk_tokens: int = HISTORY_SUMMARY_CHUNK_TOKENS,
+                 pending_budget: int = HISTORY_PENDING_TOKEN_BUDGET, directory: Optional[Path] = HISTORY_SUMMARY_DIR):
+        self.token_budget = token_budget
+        self.max_turns = max_turns
+        self.summarize = summarize
+        self.chunk_tokens = chunk_tokens
+        self.pending_budget = pending_budget
+        self.directory = Path(directory) if directory else None
+        self._summaries: Dict[object, _Summary] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="history-summary")
+
+    def render(self, conversation_id, turns: List[str]) -> str:
+        """Return the prompt history for `turns` (oldest first) of a conversation."""
+        split = self._window_start(turns)
+        if split == 0:
+            return '\n'.join(turns)
+
+        summary, covered = self._summary_for(conversation_id, turns, split)
+        recent = '\n'.join(turns[self._pending_start(turns, covered, split):])
+        if not summary:
+            return recent
+        return f"Summary of earlier conversation:\n{summary}\n\nRecent conversation:\n{recent}"
+
+    def summary(self, conversation_id) -> Optional[str]:
+        with self._lock:
+            state = self._summaries.get(conversation_id)
+            return state.text if state else None
+
+    def _window_start(self, turns: List[str]) -> int:
+        """Index of the first turn kept verbatim."""
+        used = 0
+        start = len(turns)
+        while start > 0 and len(turns) - start < self.max_turns:
+            cost = estimate_tokens(turns[start - 1])
+            # Always keep the newest turn, even if it alone exceeds the budget
+            if used + cost > self.token_budget and start < len(turns):
+                break
+            used += cost
+            start -= 1
+        return start
+
+    def _pending_start(self, turns: List[str], covered: int, split: int) -> int:
+        """First turn in the prompt: the window, extended back over turns the summary does not cover yet."""
+        start = split
+        used = 0
+        while start > covered:
+            used += estimate_tokens(turns[start - 1])
+            if used > self.pending_budget:
+                break
+            start -= 1
+        return start
+
+    def _summary_for(self, conversation_id, turns: List[str], split: int) -> Tuple[str, int]:
+        """(summary, turns it covers); schedules an update if older turns are not covered yet."""
+        if not self.summarize or conversation_id is None:
+            return "", split
+        with self._lock:
+            state = self._summaries.get(conversation_id)
+            if state is None:
+                state = self._summaries[conversation_id] = self._load(conversation_id)
+            if state.covered > len(turns):
+                # History shrank (e.g. conversation reset); start over
+                state.text, state.covered = "", 0
+            if state.covered < split and not state.pending:
+                state.pending = True
+                self._executor.submit(
+                    self._update_summary, conversation_id, state.text, state.covered, turns[state.covered:split]
+                )
+            return state.text, min(state.covered, split)
+
+    def _update_summary(self, conversation_id, text: str, covered: int, new_turns: List[str]) -> None:
+        try:
+            for chunk in chunk_turns(new_turns, self.chunk_tokens):
+                text = _summarize(text, chunk)
+                covered += len(chunk)
+                # Publish after every chunk, so a long backlog shrinks the prompt step by step
+                with self._lock:
+                    state = self._summaries.get(conversation_id)
+                    if state is not None:
+                        state.text, state.covered = text, covered
+                self._save(conversation_id, text, covered)
+            logger.info(f"Updated history summary for conversation {conversation_id} ({covered} turns)")
+        except Exception as e:
+            logger.warning(f"History summary update failed for conversation {conversation_id}: {e}")
+        finally:
+            with self._lock:
+                state = self._summaries.get(conversation_id)
+                if state is not None:
+                    state.pending = False
+
+    def _path(self, conversation_id) -> Path:
+        return self.directory / f"{conversation_id}.json"
+
+    def _load(self, conversation_id) -> _Summary:
+        if self.directory is None:
+            return _Summary()
+        try:
+            with open(self._path(conversation_id), "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return _Summary(data["text"], int(data["covered"]))
+        except FileNotFoundError:
+            return _Summary()
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable history summary of conversation {conversation_id}: {e}")
+            return _Summary()
+
+    def _save(self, conversation_id, text: str, covered: int) -> None:
+        if self.directory is None:
+            return
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            path = self._path(conversation_id)
+            tmp = path.with_suffix(".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"text": text, "covered": covered}, f)
+            os.replace(tmp, path)
+        except Exception as e:
+            logger.warning(f"Could not store history summary of conversation {conversation_id}: {e}")
+
+
+def _summarize(previous: str, new_turns: List[str]) -> str:
+    """Fold `new_turns` into `previous` with the therapist LLM."""
+    prompt = SUMMARY_PROMPT.format(
+        max_words=HISTORY_SUMMARY_MAX_WORDS,
+        summary=previous or "(none yet)",
+        turns='\n'.join(new_turns),
+    )
+    return therapistllm.call([{"role": "user", "content": prompt}]).strip()
+
+
+# Process-wide manager used by TherapySession
+history_manager = HistoryManager()
@@ -0,0 +1,61 @@
+import os
+import re
+
+# ---------------------------------------------------------------------------
+# Config
+# ---------------------------------------------------------------------------
+FAST_PATH_ENABLED = os.getenv("FAST_PATH_ENABLED", "1") == "1"
+FAST_PATH_MAX_WORDS = int(os.getenv("FAST_PATH_MAX_WORDS", "8"))
+
+FAST_PATH_PROMPT = (
+    "You are an experienced, warm therapist chatting with a client. "
+    "The client's latest message is small talk (a greeting, thanks or casual remark). "
+    "Respond naturally and briefly in one or two sentences, without giving advice, "
+    "and end with one gentle open question.\n\n"
+    "Conversation History:\n{conversation_history}\n\n"
+    "Client: {text}"
+)
+
+# One greeting, thanks or pleasantry; a small-talk message consists of
+# nothing but these, separated by punctuation, whitespace or emoji
+_PLEASANTRY = (
+    r"(hi|hey|hello|hallo|yo|hiya|howdy|(hi|hey|hello) (there|again)|"
+    r"good (morning|afternoon|evening|night)|morning|evening|"
+    r"thanks?( (a lot|so much|again))?|thank you( (so much|very much|again))?|thx|ty|"
+    r"ok(ay)?|cool|nice|great|bye|goodbye|see you( (later|soon|tomorrow))?|"
+    r"how are you( (doing|today))?|how('s| is) it going|what'?s up|nice to meet you)"
+)
+_SMALL_TALK = re.compile(
+    rf"[\W_]*{_PLEASANTRY}([\W_]+{_PLEASANTRY})*[\W_]*",
+    re.IGNORECASE,
+)
+
+# Anything that hints at distress or a request for help goes through the full crew
+_NEEDS_ANALYSIS = re.compile(
+    r"\b(sad|down|low|depress\w*|anxi\w*|panic\w*|stress\w*|lonely|alone|hurt\w*|pain\w*|cry\w*|"
+    r"angry|upset|afraid|scared|fear\w*|worr\w*|suicid\w*|kill\w*|die|died|dying|dead|death|"
+    r"end (my|it)|my life|self.?harm\w*|cut(ting)? myself|cut|harm\w*|overdos\w*|"
+    r"passed away|pass(ed)? on|lost|loss|funeral|grie(f|v\w*)|mourn\w*|"
+    r"fired|laid off|divorc\w*|break ?up|broke up|dumped|abus\w*|assault\w*|rape\w*|"
+    r"hopeless|worthless|empty|numb|overwhelm\w*|miserable|crisis|"
+    r"tired|exhausted|can'?t (cope|go on|sleep|take)|give up|giving up|"
+    r"not (ok|okay|good|fine|well)|bad|terrible|awful|horrible|help|how (do|can|should) i|"
+    r"why|advice|problem|struggl\w*)\b",
+    re.IGNORECASE,
+)
+
+
+def is_small_talk(text: str, max_words: int = FAST_PATH_MAX_WORDS) -> bool:
+    """
+    Cheap heuristic for greetings and short casual turns.
+
+    Errs on the side of the full crew: only short messages that consist of
+    nothing but greetings or thanks (plus punctuation and emoji) and carry
+    no distress or help-seeking words qualify.
+    """
+    text = (text or "").strip()
+    if not text or len(text.split()) > max_words:
+        return False
+    if _NEEDS_ANALYSIS.search(text):
+        return False
+    return bool(_SMALL_TALK.fullmatch(text))
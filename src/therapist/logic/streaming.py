@@ -0,0 +1,120 @@
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# crewai moved its event bus between releases; streaming is simply
+# unavailable when neither location exists.
+try:
+    from crewai.utilities.events import crewai_event_bus
+    from crewai.utilities.events.llm_events import LLMCallStartedEvent, LLMStreamChunkEvent
+except ImportError:
+    try:
+        from crewai.events import crewai_event_bus, LLMCallStartedEvent, LLMStreamChunkEvent
+    except ImportError:
+        crewai_event_bus = None
+        LLMCallStartedEvent = None
+        LLMStreamChunkEvent = None
+
+FINAL_ANSWER_MARKER = "Final Answer:"
+
+# id(LLM instance) -> token filter. The event bus is global, so events are
+# routed by the LLM object that produced them.
+_sinks: Dict[int, "FinalAnswerFilter"] = {}
+_sinks_lock = threading.Lock()
+
+
+def streaming_available() -> bool:
+    return crewai_event_bus is not None
+
+
+if crewai_event_bus is not None:
+    @crewai_event_bus.on(LLMStreamChunkEvent)
+    def _dispatch_chunk(source, event):
+        with _sinks_lock:
+            sink = _sinks.get(id(source))
+        if sink is None:
+            return
+        try:
+            sink.feed(event.chunk)
+        except Exception as e:
+            logger.warning(f"Token sink failed: {e}")
+
+    @crewai_event_bus.on(LLMCallStartedEvent)
+    def _reset_filter(source, event):
+        with _sinks_lock:
+            sink = _sinks.get(id(source))
+        if sink is not None:
+            sink.reset()
+
+
+class FinalAnswerFilter:
+    """
+    Forwards only the user-facing part of a streamed agent generation.
+
+    crewai agents answer as "Thought: ...\\nFinal Answer: <reply>", so
+    everything up to the marker is buffered and dropped. An agent makes
+    several LLM calls (tool use, retries), so the filter is reset at the
+    start of each one; if the last call never printed the marker, `flush`
+    forwards what it generated. With `passthrough=True` (plain LLM calls)
+    every chunk is forwarded as is.
+    """
+
+    def __init__(self, on_token: Callable[[str], None], passthrough: bool = False):
+        self.on_token = on_token
+        self.passthrough = passthrough
+        self._open = passthrough
+        self._buffer = ""
+
+    def reset(self) -> None:
+        """Start filtering a new LLM call; text buffered from the previous one is dropped."""
+        self._open = self.passthrough
+        self._buffer = ""
+
+    def feed(self, chunk: str) -> None:
+        if not chunk:
+            return
+        if self._open:
+            self.on_token(chunk)
+            return
+        self._buffer += chunk
+        idx = self._buffer.find(FINAL_ANSWER_MARKER)
+        if idx == -1:
+            return
+        self._open = True
+        rest = self._buffer[idx + len(FINAL_ANSWER_MARKER):].lstrip()
+        self._buffer = ""
+        if rest:
+            self.on_token(rest)
+
+    def flush(self) -> None:
+        """Forward the buffered generation when it never reached the marker."""
+        rest, self._buffer = self._buffer.strip(), ""
+        if rest and not self._open:
+            self._open = True
+            self.on_token(rest)
+
+
+@contextmanager
+def stream_tokens(llm, on_token: Optional[Callable[[str], None]], passthrough: bool = False):
+    """
+    Forward the streamed chunks of `llm` to `on_token` while the block runs.
+    `llm` must be created with stream=True and must not be shared with
+    another request for the duration of the block.
+    """
+    if on_token is None or not streaming_available():
+        yield
+        return
+
+    token_filter = FinalAnswerFilter(on_token, passthrough=passthrough)
+    key = id(llm)
+    with _sinks_lock:
+        _sinks[key] = token_filter
+    try:
+        yield
+    finally:
+        with _sinks_lock:
+            _sinks.pop(key, None)
+    token_filter.flush()
@@ -1,49 +1,253 @@
-from .crew import Therapist
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from dataclasses import dataclass
+from typing import Optional
+
+from .crew import make_therapist_llm, therapistllm
+from .crew_registry import crew_registry
+from .history import history_manager
+from .router import FAST_PATH_ENABLED, FAST_PATH_PROMPT, is_small_talk
+from .streaming import stream_tokens, streaming_available
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Orchestration config
+# ---------------------------------------------------------------------------
+# "crew":    one crew, analyses scheduled by crewai (async tasks as context)
+# "managed": analyses run on our own executor with per-modality deadlines;
+#            the therapist answers with whatever reports finished in time
+ORCHESTRATION_MODE = os.getenv("ORCHESTRATION_MODE", "crew")
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", "6"))
+# Extra workers that analyses abandoned at their deadline may keep busy; once
+# they are all taken, new analyses are skipped instead of queueing behind them
+ANALYSIS_ABANDONED_SLOTS = int(os.getenv("ANALYSIS_ABANDONED_SLOTS", str(ANALYSIS_WORKERS)))
+ANALYSIS_DEADLINES = {
+    "text": float(os.getenv("TEXT_ANALYSIS_TIMEOUT", "45")),
+    "image": float(os.getenv("IMAGE_ANALYSIS_TIMEOUT", "60")),
+    "audio": float(os.getenv("AUDIO_ANALYSIS_TIMEOUT", "90")),
+}
+REPORT_TITLES = {
+    "audio": "Voice analysis (voiceTherapist)",
+    "image": "Image analysis (imageTherapist)",
+    "text": "Text analysis (textTherapist)",
+}
+# Why a report is missing, as shown to the therapist
+UNAVAILABLE_REASONS = {
+    "timeout": "the analysis did not finish in time",
+    "error": "the analysis failed",
+    "skipped": "the analysis was skipped because the server is busy",
+}
+
+_analysis_executor = ThreadPoolExecutor(
+    max_workers=ANALYSIS_WORKERS + ANALYSIS_ABANDONED_SLOTS, thread_name_prefix="analysis"
+)
+# Analyses abandoned at their deadline that are still running
+_abandoned = set()
+_abandoned_lock = threading.Lock()
+
+
+def _abandon(future) -> None:
+    """Track a running analysis nobody waits for any more, until it ends."""
+    with _abandoned_lock:
+        _abandoned.add(future)
+    future.add_done_callback(_forget)
+
+
+def _forget(future) -> None:
+    with _abandoned_lock:
+        _abandoned.discard(future)
+
+
+def abandoned_analyses() -> int:
+    """Number of abandoned analyses still occupying a worker."""
+    with _abandoned_lock:
+        return len(_abandoned)
+
+
+@dataclass
+class TherapyResult:
+    """Therapist reply plus the per-modality analysis reports of one request."""
+    reply: str
+    text_report: Optional[str] = None
+    image_report: Optional[str] = None
+    audio_report: Optional[str] = None
+
 
 class TherapySession:
     def __init__(self):
         self.conversation_history = ""
-    
-    def run(self, user_text="", image_path="", audio_path="", conversation_log=""):
+
+    def run(self, user_text="", image_path="", audio_path="", conversation_log="", conversation_id=None,
+            on_token=None):
         """
         Process user input and interact with the therapist.
-        
+
         Args:
             user_text (str): Text input from the user.
             image_path (str): Path to an optional uploaded image file.
             audio_path (str): Path to an optional uploaded audio file.
-            conversation_log (str): Existing conversation history.
-            
+            conversation_log (str | list[str]): Existing conversation history, either
+                preformatted or as a list of turns. A list is windowed to the
+                configured token budget, older turns being replaced by a summary.
+            conversation_id: Key for the rolling summary of this conversation.
+            on_token (callable): Optional callback receiving the therapist's reply
+                token by token while it is generated.
+
         Returns:
             str: Therapist's response.
         """
+        return self.respond(
+            user_text=user_text,
+            image_path=image_path,
+            audio_path=audio_path,
+            conversation_log=conversation_log,
+            conversation_id=conversation_id,
+            on_token=on_token,
+        ).reply
+
+    def respond(self, user_text="", image_path="", audio_path="", conversation_log="", conversation_id=None,
+                on_token=None):
+        """
+        Same as `run`, but also returns the analysis reports of this request.
+
+        Returns:
+            TherapyResult: Therapist's response and the text/image/audio reports
+            (None for modalities that were not provided).
+        """
         # Determine which inputs are provided
         text_provided = bool(user_text)
         image_provided = bool(image_path)
         audio_provided = bool(audio_path)
-        
-        # Initialize therapist with appropriate flags
-        therapist = Therapist(
-            text_provided=text_provided,
-            image_provided=image_provided,
-            audio_provided=audio_provided
-        )
-        crew = therapist.crew()
-        
+
+        stream = on_token is not None and streaming_available()
+
+        # Bound the history that goes into every agent's prompt
+        if isinstance(conversation_log, (list, tuple)):
+            conversation_log = history_manager.render(conversation_id, list(conversation_log))
+
+        # Greetings and casual text-only turns skip the analysis crew
+        if FAST_PATH_ENABLED and text_provided and not (image_provided or audio_provided) \
+                and is_small_talk(user_text):
+            reply = self._small_talk_reply(user_text, conversation_log, on_token if stream else None)
+            return TherapyResult(reply=reply)
+
         # Build inputs dict
         inputs = {"conversation_history": conversation_log or ""}
-        
+
         if text_provided:
             inputs["text"] = user_text
-        
+
         if image_provided:
             inputs["image_path"] = image_path  # Changed from "image" to "image_path"
-        
+
         if audio_provided:
             inputs["audio_path"] = audio_path
-        
-        # Generate response
-        result = crew.kickoff(inputs=inputs)
-        response = result.raw
-        
-        return response
\ No newline at end of file
+
+        modalities = [
+            modality for modality, provided in (
+                ("audio", audio_provided), ("image", image_provided), ("text", text_provided),
+            ) if provided
+        ]
+
+        # Check out a pre-built crew for this combination of inputs
+        therapist = crew_registry.acquire(
+            text_provided=text_provided,
+            image_provided=image_provided,
+            audio_provided=audio_provided,
+            stream=stream,
+        )
+        reusable = False
+        try:
+            if ORCHESTRATION_MODE == "managed":
+                reports, failures, settled = self._run_analyses(therapist, modalities, inputs)
+                inputs["analysis_reports"] = _format_reports(reports, modalities, failures)
+                crew = therapist.conversation_crew()
+            else:
+                reports, settled = None, True
+                crew = therapist.crew()
+
+            # Generate response, streaming the final therapist generation if requested
+            with stream_tokens(therapist.therapist_llm, on_token if stream else None):
+                result = crew.kickoff(inputs=inputs)
+            if reports is None:
+                reports = therapist.reports()
+            # An abandoned analysis may still be using this crew's agents
+            reusable = settled
+        finally:
+            crew_registry.release(therapist, reusable=reusable)
+
+        return TherapyResult(
+            reply=result.raw,
+            text_report=reports["text"],
+            image_report=reports["image"],
+            audio_report=reports["audio"],
+        )
+
+    def _small_talk_reply(self, user_text, conversation_log, on_token=None):
+        """Answer a small-talk turn with a single direct therapist LLM call."""
+        logger.debug("Fast path: small talk, skipping the analysis crew")
+        # The shared client does not stream; a streaming reply needs its own instance
+        llm = make_therapist_llm(stream=True) if on_token is not None else therapistllm
+        prompt = FAST_PATH_PROMPT.format(conversation_history=conversation_log or "", text=user_text)
+        with stream_tokens(llm, on_token, passthrough=True):
+            reply = llm.call([{"role": "user", "content": prompt}])
+        return reply.strip()
+
+    def _run_analyses(self, therapist, modalities, inputs):
+        """
+        Run each modality analysis as its own crew on the shared executor.
+
+        Every analysis gets its own deadline, counted from when they all start.
+        Returns ({modality: report or None}, {modality: reason}, settled). A
+        missing report is presented to the therapist as unavailable, with its
+        reason: "timeout", "error" or "skipped" (no free workers). Work that
+        misses its deadline is cancelled if it has not started, else abandoned
+        and tracked until it ends; `settled` is False while any of it may
+        still be running.
+        """
+        reports = {"text": None, "image": None, "audio": None}
+        if abandoned_analyses() >= ANALYSIS_ABANDONED_SLOTS:
+            logger.warning(f"{abandoned_analyses()} abandoned analyses still running; skipping analyses")
+            return reports, {modality: "skipped" for modality in modalities}, True
+
+        crews = {modality: therapist.analysis_crew(modality) for modality in modalities}
+        started = time.monotonic()
+        futures = {
+            modality: _analysis_executor.submit(crew.kickoff, inputs=dict(inputs))
+            for modality, crew in crews.items()
+        }
+
+        failures = {}
+        for modality, future in futures.items():
+            remaining = ANALYSIS_DEADLINES[modality] - (time.monotonic() - started)
+            try:
+                reports[modality] = future.result(timeout=max(0.0, remaining)).raw
+            except FutureTimeout:
+                failures[modality] = "timeout"
+                if not future.cancel():
+                    _abandon(future)
+                logger.warning(f"{modality} analysis missed its {ANALYSIS_DEADLINES[modality]:.0f}s deadline")
+            except Exception as e:
+                failures[modality] = "error"
+                logger.warning(f"{modality} analysis failed: {e}")
+        settled = all(future.done() for future in futures.values())
+        return reports, failures, settled
+
+
+def _format_reports(reports, modalities, failures=None):
+    """Render the analysis reports for the conversation task prompt."""
+    failures = failures or {}
+    sections = []
+    for modality in modalities:
+        report = reports.get(modality)
+        if report:
+            body = report
+        else:
+            reason = UNAVAILABLE_REASONS.get(failures.get(modality), "the analysis returned no report")
+            body = f"Unavailable ({reason}). Do not guess its content."
+        sections.append(f"{REPORT_TITLES[modality]}:\n{body}")
+    return "\n\n".join(sections) if sections else "No media or text analysis for this message."
@@ -0,0 +1,165 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Config
+# ---------------------------------------------------------------------------
+ANALYSIS_CACHE_ENABLED = os.getenv("ANALYSIS_CACHE_ENABLED", "1") == "1"
+# Runtime data lives outside the code tree (DATA_DIR is shared with the history summaries)
+ANALYSIS_CACHE_DIR = Path(os.getenv(
+    "ANALYSIS_CACHE_DIR", os.path.join(os.getenv("DATA_DIR", "/tmp/therapist-data"), "analysis_cache")
+))
+ANALYSIS_CACHE_MAX_ENTRIES = int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "5000"))
+ANALYSIS_CACHE_MAX_MB = int(os.getenv("ANALYSIS_CACHE_MAX_MB", "100"))
+ANALYSIS_CACHE_TTL_HOURS = float(os.getenv("ANALYSIS_CACHE_TTL_HOURS", "720"))  # 0 = entries never expire
+
+HASH_CHUNK_BYTES = 1024 * 1024
+
+
+def audio_fingerprint(audio_path: str) -> str:
+    """SHA-256 of the stored audio file; reads the bytes, never decodes them."""
+    digest = hashlib.sha256()
+    with open(audio_path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class AnalysisCache:
+    """
+    Persistent cache of audio analysis results (emotion distributions, transcripts).
+
+    Entries are keyed by the audio fingerprint, the kind of analysis, the
+    model version and the analysis parameters, and stored as one JSON file
+    each. Entries older than `ttl_hours` are dropped when read. Reads bump the
+    file's mtime; once there are more than `max_entries` files or they take
+    more than `max_bytes`, expired and then least recently used ones are deleted.
+    """
+
+    def __init__(self, directory: Path = ANALYSIS_CACHE_DIR, max_entries: int = ANALYSIS_CACHE_MAX_ENTRIES,
+                 max_bytes: int = ANALYSIS_CACHE_MAX_MB * 1024 * 1024, ttl_hours: float = ANALYSIS_CACHE_TTL_HOURS,
+                 enabled: bool = ANALYSIS_CACHE_ENABLED):
+        self.directory = Path(directory)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl_hours * 3600
+        self.enabled = enabled
+        self._usage = None  # (files, bytes) on disk, counted on first write
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(fingerprint: str, kind: str, params: dict) -> str:
+        blob = json.dumps({"audio": fingerprint, "kind": kind, "params": params}, sort_keys=True, default=str)
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    def key_for(self, audio_path: str, kind: str, params: dict) -> Optional[str]:
+        """Cache key of an analysis of `audio_path`; None when the cache is disabled."""
+        if not self.enabled:
+            return None
+        return self.key(audio_fingerprint(audio_path), kind, params)
+
+    def get(self, key: Optional[str]) -> Optional[str]:
+        if not self.enabled or key is None:
+            return None
+        path = self.directory / f"{key}.json"
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            if self._expired(entry.get("created", 0)):
+                self._remove(path)
+                return None
+            os.utime(path)
+            return entry["value"]
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable analysis cache entry {path}: {e}")
+            return None
+
+    def put(self, key: Optional[str], kind: str, value: str) -> None:
+        if not self.enabled or key is None:
+            return
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            path = self.directory / f"{key}.json"
+            tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"kind": kind, "value": value, "created": time.time()}, f)
+            old_size = path.stat().st_size if path.exists() else None
+            os.replace(tmp, path)
+            size = path.stat().st_size
+            with self._lock:
+                if self._usage is None:
+                    self._usage = self._disk_usage()
+                elif old_size is None:
+                    self._usage = (self._usage[0] + 1, self._usage[1] + size)
+                else:
+                    self._usage = (self._usage[0], self._usage[1] + size - old_size)
+                if self._usage[0] > self.max_entries or self._usage[1] > self.max_bytes:
+                    self._evict()
+        except Exception as e:
+            logger.warning(f"Could not write analysis cache entry: {e}")
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl > 0 and time.time() - created > self.ttl
+
+    def _remove(self, path: Path) -> None:
+        try:
+            size = path.stat().st_size
+            path.unlink()
+        except OSError:
+            return
+        with self._lock:
+            if self._usage is not None:
+                self._usage = (self._usage[0] - 1, self._usage[1] - size)
+
+    def _disk_usage(self):
+        sizes = [p.stat().st_size for p in self.directory.glob("*.json")]
+        return len(sizes), sum(sizes)
+
+    def _evict(self) -> None:
+        """
+        Delete expired entries, then the least recently used ones down to 90%
+        of both limits. Caller holds the lock.
+        """
+        entries = sorted(((p, p.stat()) for p in self.directory.glob("*.json")), key=lambda e: e[1].st_mtime)
+        files, size = len(entries), sum(stat.st_size for _, stat in entries)
+        evicted = 0
+        for path, stat in entries:
+            # mtime is bumped on reads, so an entry untouched for the TTL is certainly expired
+            over = files > self.max_entries * 0.9 or size > self.max_bytes * 0.9
+            if not over and not self._expired(stat.st_mtime):
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            files -= 1
+            size -= stat.st_size
+            evicted += 1
+        self._usage = (files, size)
+        logger.info(f"Analysis cache evicted {evicted} entries")
+
+    def cached(self, audio_path: str, kind: str, params: dict, compute):
+        """Return the cached result for this clip/kind/params, or compute and store it."""
+        key = self.key_for(audio_path, kind, params)
+        value = self.get(key)
+        if value is not None:
+            logger.info(f"Analysis cache hit ({kind}) for {audio_path}")
+            return value
+        value = compute()
+        if value is not None:
+            self.put(key, kind, value)
+        return value
+
+
+# Process-wide cache shared by the audio tools
+analysis_cache = AnalysisCache()
@@ -0,0 +1,83 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+import librosa
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Config
+# ---------------------------------------------------------------------------
+AUDIO_BUFFER_CACHE_SIZE = int(os.getenv("AUDIO_BUFFER_CACHE_SIZE", "8"))  # clips kept in memory
+AUDIO_BUFFER_TTL = int(os.getenv("AUDIO_BUFFER_TTL", "600"))              # seconds
+
+SAMPLE_RATE = 16000
+
+
+def segment_to_array(segment) -> np.ndarray:
+    """Turn a pydub AudioSegment into a 16 kHz mono float32 array in [-1, 1]."""
+    segment = segment.set_frame_rate(SAMPLE_RATE).set_channels(1)
+    samples = np.array(segment.get_array_of_samples(), dtype=np.float32)
+    return samples / float(1 << (8 * segment.sample_width - 1))
+
+
+class AudioBufferCache:
+    """
+    Decoded voice messages, keyed by the path of their stored file.
+
+    The upload handler decodes a voice note once and registers the 16 kHz
+    mono samples here; emotion recognition and transcription read them
+    instead of loading and resampling the file again. A path that was never
+    registered (or has expired) is decoded from disk and cached on first use.
+    """
+
+    def __init__(self, max_items: int = AUDIO_BUFFER_CACHE_SIZE, ttl: int = AUDIO_BUFFER_TTL):
+        self.max_items = max_items
+        self.ttl = ttl
+        self._items = OrderedDict()  # path -> (stored_at, samples)
+        self._lock = threading.Lock()
+
+    def put(self, path: str, samples: np.ndarray) -> None:
+        samples.setflags(write=False)  # shared between consumers
+        with self._lock:
+            self._items[str(path)] = (time.time(), samples)
+            self._items.move_to_end(str(path))
+            self._evict()
+
+    def load(self, path: str) -> np.ndarray:
+        """Return the 16 kHz mono samples of `path`, decoding the file only on a miss."""
+        with self._lock:
+            self._evict()
+            item = self._items.get(str(path))
+            if item is not None:
+                self._items.move_to_end(str(path))
+                return item[1]
+
+        logger.debug(f"Audio buffer miss, decoding {path}")
+        samples, _ = librosa.load(path, sr=SAMPLE_RATE, mono=True)
+        samples = samples.astype(np.float32, copy=False)
+        self.put(path, samples)
+        return samples
+
+    def release(self, path: str) -> None:
+        """Forget `path` once its request is done."""
+        if not path:
+            return
+        with self._lock:
+            self._items.pop(str(path), None)
+
+    def _evict(self) -> None:
+        """Drop expired and least recently used entries. Caller holds the lock."""
+        cutoff = time.time() - self.ttl
+        for key in [k for k, (stored_at, _) in self._items.items() if stored_at < cutoff]:
+            del self._items[key]
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+
+
+# Process-wide cache shared by the upload handler and the audio tools
+audio_buffers = AudioBufferCache()
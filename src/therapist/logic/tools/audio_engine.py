@@ -0,0 +1,199 @@
+import os
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass
+
+import torch
+from transformers import WhisperForConditionalGeneration, WhisperProcessor
+from transformers.modeling_outputs import BaseModelOutput
+
+from .analysis_cache import analysis_cache
+from .audio_buffer import audio_buffers, SAMPLE_RATE
+from .ser_tool import build_ser_model, emotion_distribution, device, ser_model_version
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Config
+# ---------------------------------------------------------------------------
+WHISPER_ASR_MODEL = os.getenv("WHISPER_ASR_MODEL", "openai/whisper-base")
+WHISPER_NUM_BEAMS = int(os.getenv("WHISPER_NUM_BEAMS", "1"))      # 1 = greedy decoding
+WHISPER_LANGUAGE = os.getenv("WHISPER_LANGUAGE") or None           # e.g. "en"; None = auto-detect
+WHISPER_MAX_NEW_TOKENS = int(os.getenv("WHISPER_MAX_NEW_TOKENS", "220"))
+# Decode from the LoRA-adapted encoder states instead of a second, adapter-free
+# encoder pass. Halves encoder time at a (small) cost in transcription accuracy;
+# set AUDIO_SINGLE_ENCODER_PASS=0 to transcribe from the plain encoder again.
+AUDIO_SINGLE_ENCODER_PASS = os.getenv("AUDIO_SINGLE_ENCODER_PASS", "1") == "1"
+AUDIO_RESULT_CACHE_SIZE = int(os.getenv("AUDIO_RESULT_CACHE_SIZE", "16"))
+# Longest wait for the engine while another (possibly abandoned) analysis runs
+AUDIO_ENGINE_LOCK_TIMEOUT = float(os.getenv("AUDIO_ENGINE_LOCK_TIMEOUT", "60"))
+
+WINDOW_SECONDS = 30  # Whisper's fixed input length
+
+
+@dataclass
+class AudioAnalysis:
+    """Transcript and emotion distribution of one clip."""
+    transcript: str
+    emotions: dict
+
+    def emotions_json(self) -> str:
+        return json.dumps(self.emotions)
+
+    def to_json(self) -> str:
+        return json.dumps({"transcript": self.transcript, "emotions": self.emotions})
+
+    @classmethod
+    def from_json(cls, value: str) -> "AudioAnalysis":
+        data = json.loads(value)
+        return cls(transcript=data["transcript"], emotions=data["emotions"])
+
+
+class AudioAnalysisEngine:
+    """
+    Transcription and speech emotion recognition from one set of Whisper weights.
+
+    The SER head and its LoRA adapters sit on the encoder of the ASR model, so
+    both share one model in memory. Each clip is decoded, resampled and turned
+    into log-mel features once and the encoder runs a single time, with the
+    adapters, for both heads. With AUDIO_SINGLE_ENCODER_PASS=0 it runs a second
+    time without them for the decoder. Results are kept per file, so the
+    transcription and emotion tools of one voice message share a single run.
+    A run that overran its caller's deadline still holds the engine until it
+    ends, so callers wait for the engine at most `timeout` seconds.
+    """
+
+    def __init__(self, model_name: str = WHISPER_ASR_MODEL, num_beams: int = WHISPER_NUM_BEAMS,
+                 language: str = WHISPER_LANGUAGE, single_pass: bool = AUDIO_SINGLE_ENCODER_PASS,
+                 cache_size: int = AUDIO_RESULT_CACHE_SIZE):
+        self.model_name = model_name
+        self.num_beams = num_beams
+        self.language = language
+        self.single_pass = single_pass
+        self.cache_size = cache_size
+        self._asr = None
+        self._ser = None
+        self._processor = None
+        self._results = OrderedDict()
+        # Adapters are toggled on the shared encoder, so inference is serialized
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._asr is None:
+            start = time.time()
+            self._processor = WhisperProcessor.from_pretrained(self.model_name)
+            asr = WhisperForConditionalGeneration.from_pretrained(self.model_name)
+            asr = asr.to(device).eval()
+            # Adapts asr.model.encoder in place
+            self._ser = build_ser_model(asr.model.encoder)
+            self._asr = asr
+            logger.info(f"Loaded shared audio engine ({self.model_name}) in {time.time() - start:.2f}s")
+
+    def analyze(self, audio_path: str, timeout: float = AUDIO_ENGINE_LOCK_TIMEOUT) -> AudioAnalysis:
+        """Transcribe `audio_path` and detect its emotions (cached per file)."""
+        stat = os.stat(audio_path)
+        key = (audio_path, stat.st_mtime_ns, stat.st_size)
+        with self._acquire(timeout):
+            cached = self._results.get(key)
+            if cached is not None:
+                self._results.move_to_end(key)
+                return cached
+
+            # Repeated clips (resends, retries) are served from the persistent cache
+            cache_key = analysis_cache.key_for(audio_path, "audio_engine", self.cache_params())
+            stored = analysis_cache.get(cache_key)
+            if stored is not None:
+                logger.info(f"Audio analysis cache hit for {audio_path}")
+                result = AudioAnalysis.from_json(stored)
+            else:
+                self._load()
+                start = time.time()
+                result = self._run(audio_buffers.load(audio_path))
+                logger.info(f"Analyzed {audio_path} in {time.time() - start:.2f}s")
+                analysis_cache.put(cache_key, "audio_engine", result.to_json())
+
+            self._results[key] = result
+            while len(self._results) > self.cache_size:
+                self._results.popitem(last=False)
+            return result
+
+    def cache_params(self) -> dict:
+        return {
+            "asr_model": self.model_name,
+            "ser_model": ser_model_version(),
+            "num_beams": self.num_beams,
+            "language": self.language,
+            "single_pass": self.single_pass,
+            "max_new_tokens": WHISPER_MAX_NEW_TOKENS,
+        }
+
+    def transcribe(self, audio_path: str, timeout: float = AUDIO_ENGINE_LOCK_TIMEOUT) -> str:
+        return self.analyze(audio_path, timeout).transcript
+
+    def detect_emotions(self, audio_path: str, timeout: float = AUDIO_ENGINE_LOCK_TIMEOUT) -> str:
+        return self.analyze(audio_path, timeout).emotions_json()
+
+    @contextmanager
+    def _acquire(self, timeout: float):
+        if not self._lock.acquire(timeout=timeout):
+            raise TimeoutError(f"Audio engine busy for more than {timeout}s")
+        try:
+            yield
+        finally:
+            self._lock.release()
+
+    def warm_up(self) -> None:
+        """Load the models and analyze a second of silence."""
+        with self._lock:
+            self._load()
+            self._run(torch.zeros(SAMPLE_RATE).numpy())
+
+    def _run(self, audio) -> AudioAnalysis:
+        window = WINDOW_SECONDS * SAMPLE_RATE
+        chunks = [audio[i:i + window] for i in range(0, max(len(audio), 1), window)]
+        features = self._processor(chunks, sampling_rate=SAMPLE_RATE, return_tensors="pt").input_features
+        features = features.to(device)
+
+        encoder = self._ser.encoder
+        with torch.inference_mode():
+            if self.single_pass:
+                asr_states = encoder(features).last_hidden_state
+                ser_states = asr_states[:1]
+            else:
+                # SER only ever looked at the first 30 s window
+                ser_states = encoder(features[:1]).last_hidden_state
+                disable = getattr(self._ser, "disable_adapter", None)
+                with disable() if disable else nullcontext():
+                    asr_states = encoder(features).last_hidden_state
+
+            logits = self._ser.fc(ser_states.mean(dim=1))
+            token_ids = self._asr.generate(
+                encoder_outputs=BaseModelOutput(last_hidden_state=asr_states),
+                num_beams=self.num_beams,
+                language=self.language,
+                task="transcribe",
+                max_new_tokens=WHISPER_MAX_NEW_TOKENS,
+            )
+
+        texts = self._processor.batch_decode(token_ids, skip_special_tokens=True)
+        return AudioAnalysis(
+            transcript=" ".join(text.strip() for text in texts if text.strip()),
+            emotions=emotion_distribution(logits),
+        )
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_audio_engine() -> AudioAnalysisEngine:
+    """Process-wide engine, created on first use."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = AudioAnalysisEngine()
+        return _engine
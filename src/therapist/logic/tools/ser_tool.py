@@ -2,16 +2,22 @@ from crewai.tools import BaseTool
 from typing import Type
 from pydantic import BaseModel, Field
 import os
-import soundfile as sf
 import torch
 import torch.nn.functional as F
-from transformers import WhisperProcessor, WhisperModel
+from transformers import WhisperConfig, WhisperProcessor, WhisperModel
+from transformers.models.whisper.modeling_whisper import WhisperEncoder
 from peft import PeftModel
 import json
-import librosa
+import hashlib
 import logging
+import math
 import time
-from functools import lru_cache
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from functools import lru_cache, partial
+from .audio_buffer import audio_buffers, SAMPLE_RATE
+from .analysis_cache import analysis_cache
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -19,6 +25,30 @@ logger = logging.getLogger(__name__)
 
 BASE_DIR = os.path.dirname(__file__)  
 OUTPUT_DIR = os.path.join(BASE_DIR, "fine_tuned_whisper-base")
+# Optimized artifacts written by export_ser.py: "peft" (runtime LoRA, default),
+# "merged" (LoRA folded into the weights), "int8" (merged + dynamic int8
+# quantization, CPU only) or "onnx" (ONNX Runtime, needs onnxruntime)
+SER_BACKEND = os.environ.get('SER_BACKEND', 'peft')
+SER_EXPORT_DIR = os.environ.get('SER_EXPORT_DIR', os.path.join(BASE_DIR, "ser_export"))
+MERGED_WEIGHTS_FILE = "ser_merged.pt"
+ONNX_MODEL_FILE = "ser.onnx"
+EXPORT_MANIFEST_FILE = "manifest.json"
+# With local transcription, emotions come from the shared audio engine
+SHARED_AUDIO_ENGINE = os.getenv("TRANSCRIPTION_BACKEND", "openai") == "local"
+# Micro-batching of concurrent SER requests
+SER_MAX_BATCH = int(os.environ.get('SER_MAX_BATCH', '8'))
+SER_BATCH_WAIT_MS = float(os.environ.get('SER_BATCH_WAIT_MS', '10'))
+# Length-aware SER: short clips are encoded at their real length (rounded up to
+# SER_BUCKET_SECONDS so similar clips still batch), long clips as overlapping windows.
+# Opt-in; it is switched off again at load time if `encode_frames` fails its parity check
+SER_LENGTH_AWARE = os.environ.get('SER_LENGTH_AWARE', '0') == '1'
+SER_BUCKET_SECONDS = int(os.environ.get('SER_BUCKET_SECONDS', '5'))
+SER_WINDOW_SECONDS = 30  # Whisper's maximum input length
+SER_HOP_SECONDS = int(os.environ.get('SER_HOP_SECONDS', '15'))
+SER_TIMELINE = os.environ.get('SER_TIMELINE', '0') == '1'  # add the per-window timeline to the tool output
+# Hard deadline per SER call; the caller gets the neutral distribution once it passes
+SER_TIMEOUT = float(os.environ.get('SER_TIMEOUT', '30'))
+SER_WORKERS = int(os.environ.get('SER_WORKERS', '4'))
 LABELS = ["neutral", "happy", "sad", "angry", "fearful", "disgust", "surprised", "calm"]
 
 # Global model cache
@@ -52,16 +82,194 @@ class WhisperSERModel(torch.nn.Module):
     def forward(self, input_ids=None, input_values=None, **kwargs):
         if input_values is None:
             raise ValueError("Pass `input_values` (audio features).")
-        outputs = self.encoder(input_values, output_hidden_states=False)
-        hidden = outputs.last_hidden_state   # (B, T, D)
+        if input_values.shape[-1] == 2 * self.config.max_source_positions:
+            outputs = self.encoder(input_values, output_hidden_states=False)
+            hidden = outputs.last_hidden_state   # (B, T, D)
+        else:
+            hidden = encode_frames(self.encoder, input_values)
         pooled = hidden.mean(dim=1)          # (B, D)
         pooled = self.dropout(pooled)
         return self.fc(pooled)               # (B, num_labels)
 
+def encode_frames(encoder, input_features):
+    """
+    Whisper encoder forward for inputs shorter than 30 s.
+
+    The HF encoder insists on exactly 3000 mel frames; this runs the same
+    layers on fewer frames, using only the first positional embeddings.
+    It calls the encoder layers directly, so it depends on the layer call
+    signature of the pinned transformers version (see requirements.txt);
+    `frames_parity` checks it against the encoder's own forward.
+    """
+    hidden = F.gelu(encoder.conv1(input_features))
+    hidden = F.gelu(encoder.conv2(hidden))
+    hidden = hidden.permute(0, 2, 1)
+    positions = torch.arange(hidden.shape[1], device=hidden.device)
+    hidden = hidden + encoder.embed_positions(positions)
+    for layer in encoder.layers:
+        out = layer(hidden, attention_mask=None, layer_head_mask=None)
+        hidden = out[0] if isinstance(out, tuple) else out
+    return encoder.layer_norm(hidden)
+
+def frames_parity(encoder, atol=1e-3) -> bool:
+    """True when `encode_frames` matches the encoder's own forward on a full 30 s input."""
+    try:
+        param = next(encoder.parameters())
+        features = torch.randn(1, encoder.config.num_mel_bins, 2 * encoder.config.max_source_positions,
+                               device=param.device, dtype=param.dtype)
+        with torch.inference_mode():
+            expected = encoder(features).last_hidden_state
+            actual = encode_frames(encoder, features)
+        return torch.allclose(expected, actual, atol=atol)
+    except Exception as e:
+        logger.warning(f"encode_frames parity check failed to run: {e}")
+        return False
+
+def ser_windows(audio):
+    """
+    Split 16 kHz samples into SER inputs: [(start_s, end_s, samples)].
+
+    Clips up to 30 s give one window, zero-padded to the next bucket
+    boundary. Longer clips give 30 s windows every SER_HOP_SECONDS, the last
+    one aligned to the end of the clip so nothing is cut off.
+    """
+    window = SER_WINDOW_SECONDS * SAMPLE_RATE
+    total = max(len(audio), 1)
+    if total <= window:
+        bucket = SER_BUCKET_SECONDS * SAMPLE_RATE
+        padded = min(window, math.ceil(total / bucket) * bucket)
+        samples = torch.zeros(padded, dtype=torch.float32)
+        samples[:len(audio)] = torch.as_tensor(audio, dtype=torch.float32)
+        return [(0.0, total / SAMPLE_RATE, samples.numpy())]
+
+    hop = SER_HOP_SECONDS * SAMPLE_RATE
+    starts = list(range(0, total - window, hop)) + [total - window]
+    return [(s / SAMPLE_RATE, (s + window) / SAMPLE_RATE, audio[s:s + window]) for s in starts]
+
+def clip_windows(audio):
+    """SER inputs of a clip as detectEmotion runs them in the configured mode."""
+    if SER_LENGTH_AWARE:
+        return ser_windows(audio)
+    # Legacy behaviour: first 30 s, padded to 30 s
+    return [(0.0, min(len(audio) / SAMPLE_RATE, SER_WINDOW_SECONDS), audio)]
+
+def build_ser_model(encoder):
+    """
+    Put the emotion head (and the LoRA adapters, if present) on a Whisper
+    encoder and move it to `device`. The encoder module is adapted in place.
+    """
+    # Create SER model
+    ser = WhisperSERModel(encoder=encoder, num_labels=len(LABELS))
+    
+    # Check if LoRA weights exist
+    if os.path.exists(OUTPUT_DIR):
+        logger.info("Loading LoRA adapters...")
+        try:
+            ser = PeftModel.from_pretrained(ser, OUTPUT_DIR, local_files_only=True)
+        except Exception as e:
+            logger.warning(f"Failed to load LoRA adapters: {e}. Using base model.")
+    else:
+        logger.warning(f"LoRA weights not found at {OUTPUT_DIR}. Using base model.")
+
+    # Fix for missing num_embeddings attribute
+    embed_pos = ser.encoder.embed_positions
+    if hasattr(embed_pos, 'weight') and not hasattr(embed_pos, 'num_embeddings'):
+        embed_pos.num_embeddings = embed_pos.weight.shape[0]
+
+    ser.eval()
+    
+    # Move to device with memory optimization
+    if device.type == 'cpu':
+        ser = ser.to(device)
+    else:
+        with torch.cuda.amp.autocast(enabled=False):
+            ser = ser.to(device)
+
+    # Inject id2label/label2id
+    ser.config.id2label = {i: label for i, label in enumerate(LABELS)}
+    ser.config.label2id = {label: i for i, label in enumerate(LABELS)}
+    return ser
+
+def merge_ser_model(ser):
+    """Fold the LoRA adapters into the encoder weights, returning a plain WhisperSERModel."""
+    if isinstance(ser, PeftModel):
+        ser = ser.merge_and_unload()
+    return ser.eval()
+
+def quantize_ser_model(ser):
+    """Dynamic int8 quantization of all Linear layers (CPU inference)."""
+    return torch.quantization.quantize_dynamic(ser, {torch.nn.Linear}, dtype=torch.qint8)
+
+class FramesSERModel(torch.nn.Module):
+    """Export wrapper: always uses `encode_frames`, so the frame axis can stay dynamic."""
+    def __init__(self, ser):
+        super().__init__()
+        self.ser = ser
+
+    def forward(self, input_values):
+        hidden = encode_frames(self.ser.encoder, input_values)
+        return self.ser.fc(hidden.mean(dim=1))
+
+class OnnxSERModel:
+    """ONNX Runtime session with the call signature of WhisperSERModel."""
+    def __init__(self, path):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = torch.get_num_threads()
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, input_values=None, **kwargs):
+        features = input_values.detach().cpu().float().numpy()
+        logits = self.session.run(None, {self.input_name: features})[0]
+        return torch.from_numpy(logits)
+
+def load_exported_ser_model(backend, export_dir=SER_EXPORT_DIR):
+    """Load an artifact written by export_ser.py; refuses ones that failed the parity check."""
+    manifest_path = os.path.join(export_dir, EXPORT_MANIFEST_FILE)
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    report = manifest.get("backends", {}).get(backend)
+    if not report or not report.get("passed"):
+        raise RuntimeError(f"{backend} SER artifact missing or failed its parity check ({manifest_path})")
+
+    if backend == "onnx":
+        return OnnxSERModel(os.path.join(export_dir, ONNX_MODEL_FILE))
+
+    checkpoint = torch.load(os.path.join(export_dir, MERGED_WEIGHTS_FILE), map_location="cpu")
+    encoder = WhisperEncoder(WhisperConfig.from_dict(checkpoint["config"]))
+    ser = WhisperSERModel(encoder=encoder, num_labels=len(LABELS))
+    ser.load_state_dict(checkpoint["state_dict"])
+    ser.eval()
+    if backend == "int8":
+        if device.type != 'cpu':
+            raise RuntimeError("int8 SER model only runs on CPU")
+        return quantize_ser_model(ser)
+    return ser.to(device)
+
+def load_ser_processor():
+    if os.path.exists(OUTPUT_DIR):
+        return WhisperProcessor.from_pretrained(OUTPUT_DIR, local_files_only=True)
+    return WhisperProcessor.from_pretrained("openai/whisper-base")
+
+def emotion_distribution(logits=None, probs=None) -> dict:
+    """Map the SER logits (or probabilities) of one clip to {label: percentage}."""
+    if probs is None:
+        probs = F.softmax(logits, dim=-1)[0].cpu()
+    return {
+        LABELS[i]: round(probs[i].item() * 100, 1)
+        for i in range(probs.shape[0])
+    }
+
+def default_distribution() -> dict:
+    """Uniform distribution returned when emotion detection fails."""
+    return {label: 12.5 for label in LABELS}
+
 @lru_cache(maxsize=1)
 def load_ser_model(timeout=60):
     """Load SER model with timeout and caching"""
-    global _model, _processor
+    global _model, _processor, SER_LENGTH_AWARE
     
     if _model is not None:
         return _model, _processor
@@ -74,58 +282,36 @@ def load_ser_model(timeout=60):
         if time.time() - start_time > timeout * 0.3:
             raise TimeoutError("Model loading timeout")
             
-        logger.info("Loading Whisper base model...")
-        base = WhisperModel.from_pretrained(
-            "openai/whisper-base",
-            local_files_only=os.path.exists(os.path.expanduser("~/.cache/huggingface/hub/models--openai--whisper-base"))
-        )
-        num_labels = len(LABELS)
-
-        # Create SER model
-        ser = WhisperSERModel(encoder=base.encoder, num_labels=num_labels)
-        
-        # Check if LoRA weights exist
-        if os.path.exists(OUTPUT_DIR):
-            logger.info("Loading LoRA adapters...")
-            if time.time() - start_time > timeout * 0.6:
-                raise TimeoutError("Model loading timeout")
-                
+        ser = None
+        if SER_BACKEND != "peft":
+            logger.info(f"Loading {SER_BACKEND} SER artifact from {SER_EXPORT_DIR}...")
             try:
-                ser = PeftModel.from_pretrained(ser, OUTPUT_DIR, local_files_only=True)
+                ser = load_exported_ser_model(SER_BACKEND)
             except Exception as e:
-                logger.warning(f"Failed to load LoRA adapters: {e}. Using base model.")
-        else:
-            logger.warning(f"LoRA weights not found at {OUTPUT_DIR}. Using base model.")
-
-        # Fix for missing num_embeddings attribute
-        embed_pos = ser.encoder.embed_positions
-        if hasattr(embed_pos, 'weight') and not hasattr(embed_pos, 'num_embeddings'):
-            embed_pos.num_embeddings = embed_pos.weight.shape[0]
-
-        ser.eval()
-        
-        # Move to device with memory optimization
-        if device.type == 'cpu':
-            ser = ser.to(device)
-        else:
-            with torch.cuda.amp.autocast(enabled=False):
-                ser = ser.to(device)
+                logger.warning(f"Failed to load {SER_BACKEND} SER artifact: {e}. Using PEFT model.")
 
-        # Inject id2label/label2id
-        ser.config.id2label = {i: label for i, label in enumerate(LABELS)}
-        ser.config.label2id = {label: i for i, label in enumerate(LABELS)}
+        if ser is None:
+            logger.info("Loading Whisper base model...")
+            base = WhisperModel.from_pretrained(
+                "openai/whisper-base",
+                local_files_only=os.path.exists(os.path.expanduser("~/.cache/huggingface/hub/models--openai--whisper-base"))
+            )
+            if time.time() - start_time > timeout * 0.6:
+                raise TimeoutError("Model loading timeout")
+            ser = build_ser_model(base.encoder)
 
         # Load processor
         logger.info("Loading Whisper processor...")
         if time.time() - start_time > timeout * 0.8:
             raise TimeoutError("Model loading timeout")
-            
-        if os.path.exists(OUTPUT_DIR):
-            _processor = WhisperProcessor.from_pretrained(OUTPUT_DIR, local_files_only=True)
-        else:
-            _processor = WhisperProcessor.from_pretrained("openai/whisper-base")
+        _processor = load_ser_processor()
         
         _model = ser
+
+        # ONNX artifacts passed the same check at export time
+        if SER_LENGTH_AWARE and hasattr(ser, "encoder") and not frames_parity(ser.encoder):
+            logger.warning("encode_frames does not match the Whisper encoder; disabling length-aware SER")
+            SER_LENGTH_AWARE = False
         
         elapsed = time.time() - start_time
         logger.info(f"Model loaded successfully in {elapsed:.2f} seconds")
@@ -136,66 +322,291 @@ def load_ser_model(timeout=60):
         logger.error(f"Failed to load model: {str(e)}")
         raise
 
-def detectEmotion(audio_file_path: str, timeout: int = 30) -> str:
-    """Detect emotions with timeout and error handling"""
-    start_time = time.time()
-    
-    try:
-        # Load model
-        model, processor = load_ser_model(timeout=timeout)
-        
-        # Check timeout
-        if time.time() - start_time > timeout * 0.3:
-            raise TimeoutError("Audio processing timeout")
-        
-        # Read and process audio
-        logger.info(f"Processing audio file: {audio_file_path}")
-        audio, sr = sf.read(audio_file_path)
-        
-        # Resample if needed
-        if sr != 16000:
-            logger.info(f"Resampling from {sr}Hz to 16000Hz")
-            audio = librosa.resample(audio, orig_sr=sr, target_sr=16000)
-            sr = 16000
-        
-        # Check timeout
-        if time.time() - start_time > timeout * 0.6:
-            raise TimeoutError("Audio processing timeout")
-        
-        # Preprocess
-        inputs = processor(audio, sampling_rate=sr, return_tensors="pt")
-        input_values = inputs.input_features.to(device)
-        
-        # Forward pass with mixed precision on GPU
-        logger.info("Running inference...")
-        with torch.no_grad():
-            if device.type == 'cuda':
-                with torch.cuda.amp.autocast():
+class SERBatcher:
+    """
+    In-process SER inference server.
+
+    Callers submit the features of one clip and get a Future for its logits.
+    A single worker thread takes the first waiting request, collects more for
+    up to `max_wait_ms` (or until `max_batch` are queued), and runs them as one
+    batch, so voice notes arriving together share a forward pass.
+    """
+
+    def __init__(self, max_batch: int = SER_MAX_BATCH, max_wait_ms: float = SER_BATCH_WAIT_MS):
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._worker = None
+        self._start_lock = threading.Lock()
+
+    def submit(self, input_values) -> Future:
+        """Queue the (1, n_mels, frames) features of one clip."""
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((input_values, future))
+        return future
+
+    def infer(self, input_values, timeout=None):
+        """Blocking helper: logits (1, num_labels) of one clip."""
+        future = self.submit(input_values)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            future.cancel()
+            raise TimeoutError("Emotion inference timeout")
+
+    def queue_depth(self) -> int:
+        """Number of clips waiting for the worker."""
+        return self._queue.qsize()
+
+    def _ensure_worker(self):
+        with self._start_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._loop, name="ser-batcher", daemon=True)
+                self._worker.start()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        # Callers that timed out while waiting have cancelled their futures
+        live = [(x, f) for x, f in batch if f.set_running_or_notify_cancel()]
+        if len(live) < len(batch):
+            ser_stats.incr("dropped", len(batch) - len(live))
+        return live
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            if not batch:
+                continue
+            try:
+                model, _ = load_ser_model()
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            # Clips of different length (frame count) run as separate batches
+            groups = {}
+            for item in batch:
+                groups.setdefault(item[0].shape[-1], []).append(item)
+            for group in groups.values():
+                self._run_group(model, group)
+
+    def _run_group(self, model, group):
+        try:
+            input_values = torch.cat([x for x, _ in group], dim=0).to(device)
+            with torch.no_grad():
+                if device.type == 'cuda':
+                    with torch.cuda.amp.autocast():
+                        logits = model(input_values=input_values)
+                else:
                     logits = model(input_values=input_values)
-            else:
-                logits = model(input_values=input_values)
-            
-            probs = F.softmax(logits, dim=-1)[0].cpu()
-        
-        # Build result
-        label_probs = {
-            model.config.id2label[i]: round(probs[i].item() * 100, 1)
-            for i in range(probs.shape[0])
-        }
-        
-        elapsed = time.time() - start_time
-        logger.info(f"Emotion detection completed in {elapsed:.2f} seconds")
-        
-        return json.dumps(label_probs)
-        
-    except TimeoutError:
-        logger.error("Emotion detection timed out")
-        # Return default distribution
-        return json.dumps({label: 12.5 for label in LABELS})
+            if len(group) > 1:
+                logger.info(f"SER batch of {len(group)} clips ({input_values.shape[-1]} frames)")
+            for i, (_, future) in enumerate(group):
+                future.set_result(logits[i:i + 1])
+        except Exception as e:
+            for _, future in group:
+                future.set_exception(e)
+
+
+ser_batcher = SERBatcher()
+
+class SERStats:
+    """Thread-safe counters of SER calls, exposed at /direct/ser/status."""
+
+    FIELDS = ("requests", "completed", "cache_hits", "timeouts", "errors", "dropped", "late_finished", "late_failed")
+
+    def __init__(self):
+        self._counts = {name: 0 for name in self.FIELDS}
+        self._lock = threading.Lock()
+
+    def incr(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self._counts[name] += n
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self._counts)
+
+ser_stats = SERStats()
+
+# SER work runs here so the calling thread can give up at the deadline
+_ser_executor = ThreadPoolExecutor(max_workers=max(1, SER_WORKERS), thread_name_prefix="ser")
+
+def run_with_deadline(fn, timeout, *args, **kwargs) -> str:
+    """
+    Run `fn` on the SER executor; the neutral distribution if it fails or
+    does not finish within `timeout` seconds.
+
+    Threads cannot be killed, so work that overruns is cancelled if it has
+    not started yet and otherwise abandoned: it stops at its next deadline
+    check and its result is discarded. Abandoned work is counted once it
+    ends, as `late_finished` or `late_failed`.
+    """
+    ser_stats.incr("requests")
+    future = _ser_executor.submit(fn, *args, **kwargs)
+    try:
+        result = future.result(timeout=timeout)
+    except FutureTimeout:
+        if not future.cancel():
+            future.add_done_callback(_count_late)
+        ser_stats.incr("timeouts")
+        logger.error(f"Emotion detection timed out after {timeout}s")
+        return json.dumps(default_distribution())
     except Exception as e:
+        ser_stats.incr("errors")
         logger.error(f"Error in emotion detection: {str(e)}")
-        # Return default distribution
-        return json.dumps({label: 12.5 for label in LABELS})
+        return json.dumps(default_distribution())
+    ser_stats.incr("completed")
+    return result
+
+def _count_late(future) -> None:
+    ser_stats.incr("late_failed" if future.exception() is not None else "late_finished")
+
+def ser_status() -> dict:
+    """Counters plus configuration, for monitoring."""
+    return {
+        "backend": SER_BACKEND,
+        "model_loaded": _model is not None,
+        "timeout_seconds": SER_TIMEOUT,
+        "workers": SER_WORKERS,
+        "queued": ser_batcher.queue_depth(),
+        "counts": ser_stats.snapshot(),
+    }
+
+def ser_features(processor, samples):
+    """Log-mel features of one window; padded to 30 s only in legacy mode."""
+    if SER_LENGTH_AWARE:
+        inputs = processor(samples, sampling_rate=SAMPLE_RATE, return_tensors="pt", padding="longest")
+    else:
+        inputs = processor(samples, sampling_rate=SAMPLE_RATE, return_tensors="pt")
+    return inputs.input_features
+
+def warm_up_ser() -> None:
+    """
+    Warm up the SER backend that serves requests: the shared audio engine
+    when TRANSCRIPTION_BACKEND=local, otherwise the standalone SER model
+    (loaded, then one inference on a second of silence).
+    """
+    if SHARED_AUDIO_ENGINE:
+        # Imported here: audio_engine builds on this module
+        from .audio_engine import get_audio_engine
+        get_audio_engine().warm_up()
+        return
+    _, processor = load_ser_model()
+    silence = torch.zeros(SAMPLE_RATE).numpy()
+    samples = clip_windows(silence)[0][2]
+    ser_batcher.infer(ser_features(processor, samples))
+
+@lru_cache(maxsize=1)
+def ser_model_version() -> str:
+    """Identifies the SER weights in use, so cached results die with a model change."""
+    if SER_BACKEND != "peft":
+        try:
+            with open(os.path.join(SER_EXPORT_DIR, EXPORT_MANIFEST_FILE)) as f:
+                return f"{SER_BACKEND}:{json.load(f).get('created_at')}"
+        except OSError:
+            pass
+    adapter = os.path.join(OUTPUT_DIR, "adapter_model.safetensors")
+    if not os.path.exists(adapter):
+        return "whisper-base"
+    with open(adapter, "rb") as f:
+        return "whisper-base+lora:" + hashlib.sha256(f.read()).hexdigest()[:16]
+
+def ser_cache_params(timeline: bool = False) -> dict:
+    return {
+        "model": ser_model_version(),
+        "length_aware": SER_LENGTH_AWARE,
+        "bucket": SER_BUCKET_SECONDS,
+        "hop": SER_HOP_SECONDS,
+        "timeline": timeline,
+    }
+
+def detectEmotion(audio_file_path: str, timeout: float = SER_TIMEOUT, timeline: bool = False) -> str:
+    """
+    Detect emotions with an enforced deadline and error handling.
+
+    Returns the {label: percentage} distribution as JSON. With `timeline`
+    the JSON is {"distribution": ..., "timeline": [{"start", "end", "emotions"}]}
+    listing the distribution of every analysed window. Returns the neutral
+    distribution as soon as `timeout` seconds have passed.
+    """
+    deadline = time.monotonic() + timeout
+    return run_with_deadline(_detect_emotion, timeout, audio_file_path, deadline, timeline)
+
+def _check_deadline(deadline: float) -> None:
+    if time.monotonic() > deadline:
+        raise TimeoutError("Audio processing timeout")
+
+def _detect_emotion(audio_file_path: str, deadline: float, timeline: bool) -> str:
+    start_time = time.time()
+    
+    # Repeated clips skip model loading and inference entirely
+    cache_key = analysis_cache.key_for(audio_file_path, "emotion", ser_cache_params(timeline))
+    cached = analysis_cache.get(cache_key)
+    if cached is not None:
+        logger.info(f"Emotion detection cache hit for {audio_file_path}")
+        ser_stats.incr("cache_hits")
+        return cached
+    
+    # Load model; a load that overruns still finishes for later calls
+    model, processor = load_ser_model()
+    _check_deadline(deadline)
+    
+    # 16 kHz mono samples, decoded once at upload time
+    logger.info(f"Processing audio file: {audio_file_path}")
+    audio = audio_buffers.load(audio_file_path)
+    _check_deadline(deadline)
+    
+    # Preprocess
+    windows = clip_windows(audio)
+    # Windows of one clip are submitted together, so they share a batch
+    futures = [ser_batcher.submit(ser_features(processor, samples)) for _, _, samples in windows]
+    
+    # Forward pass, batched with concurrent requests. Windows still queued
+    # at the deadline are cancelled, so the batcher never runs them.
+    logger.info(f"Running inference on {len(windows)} window(s)...")
+    window_probs = []
+    for future in futures:
+        try:
+            logits = future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FutureTimeout:
+            for pending in futures:
+                pending.cancel()
+            raise TimeoutError("Emotion inference timeout")
+        window_probs.append(F.softmax(logits, dim=-1)[0].cpu())
+    
+    # Build result: windows weighted by the audio they cover
+    weights = torch.tensor([end - start for start, end, _ in windows]).clamp_min(1e-3)
+    probs = (torch.stack(window_probs) * weights[:, None]).sum(dim=0) / weights.sum()
+    label_probs = emotion_distribution(probs=probs)
+    
+    elapsed = time.time() - start_time
+    logger.info(f"Emotion detection completed in {elapsed:.2f} seconds")
+    
+    if timeline:
+        result = json.dumps({
+            "distribution": label_probs,
+            "timeline": [
+                {"start": round(start, 1), "end": round(end, 1), "emotions": emotion_distribution(probs=p)}
+                for (start, end, _), p in zip(windows, window_probs)
+            ],
+        })
+    else:
+        result = json.dumps(label_probs)
+    # Only real results are cached, never the fallback distribution
+    analysis_cache.put(cache_key, "emotion", result)
+    return result
 
 class MyCustomToolInput(BaseModel):
     """Input schema for VoiceEmotionDistributionTool."""
@@ -209,6 +620,10 @@ class SERTool(BaseTool):
     args_schema: Type[BaseModel] = MyCustomToolInput
 
     def _run(self, audio_path: str) -> str:
-        # Use environment variable for timeout if available
-        timeout = int(os.environ.get('SER_TIMEOUT', '30'))
-        return detectEmotion(audio_file_path=audio_path, timeout=timeout)
\ No newline at end of file
+        if SHARED_AUDIO_ENGINE:
+            # Imported here: audio_engine builds on this module
+            from .audio_engine import get_audio_engine
+            # The engine's own lock wait is bounded by the same deadline
+            detect = partial(get_audio_engine().detect_emotions, timeout=SER_TIMEOUT)
+            return run_with_deadline(detect, SER_TIMEOUT, audio_path)
+        return detectEmotion(audio_file_path=audio_path, timeout=SER_TIMEOUT, timeline=SER_TIMELINE)
\ No newline at end of file
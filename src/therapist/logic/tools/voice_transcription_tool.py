@@ -2,34 +2,135 @@ from crewai.tools import BaseTool
 from typing import Type
 from pydantic import BaseModel, Field
 import os
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 from openai import OpenAI
+from .analysis_cache import analysis_cache
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+logger = logging.getLogger(__name__)
 
+# ---------------------------------------------------------------------------
+# Config
+# ---------------------------------------------------------------------------
+# "openai": gpt-4o-transcribe over the network
+# "local":  Whisper on this machine (see audio_engine.py for its settings)
+TRANSCRIPTION_BACKEND = os.getenv("TRANSCRIPTION_BACKEND", "openai")
+# Longest a local transcription may take (engine wait included) before the tool gives up
+TRANSCRIPTION_TIMEOUT = float(os.getenv("TRANSCRIPTION_TIMEOUT", "60"))
+# What the tool returns instead of a transcript that did not finish in time
+TRANSCRIPTION_TIMEOUT_TEXT = "Transcription unavailable (it did not finish in time). Do not guess what was said."
 
-def transcribe_audio(audio_file_path):
-    """
-    Transcribe audio using OpenAI’s Whisper-based GPT-4o Transcribe model.
-    """
-    try:
+TRANSCRIPTION_PROMPT = (
+    "The audio is a recording of an individual speaking candidly "
+    "about their thoughts, feelings, and experiences, "
+    "as if addressing a psychotherapist. The content may include "
+    "discussions about emotions, personal challenges, relationships, "
+    "and life events. The tone is introspective and reflective, "
+    "and the transcription should aim to capture the speaker’s words "
+    "as accurately as possible, maintaining the emotional nuances."
+)
+
+
+class OpenAITranscriber:
+    """Transcription through OpenAI's Whisper-based GPT-4o Transcribe model."""
+
+    name = "openai"
+
+    def __init__(self):
+        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+    def cache_params(self):
+        return {"backend": self.name, "model": "gpt-4o-transcribe", "prompt": TRANSCRIPTION_PROMPT}
+
+    def transcribe(self, audio_file_path: str) -> str:
         with open(audio_file_path, "rb") as audio_file:
-            # NEW: use `audio.transcriptions.create`
-            result = client.audio.transcriptions.create(
+            # If you set response_format="text", the result is a plain string
+            return self.client.audio.transcriptions.create(
                 model="gpt-4o-transcribe",
                 file=audio_file,
-                prompt=(
-                    "The audio is a recording of an individual speaking candidly "
-                    "about their thoughts, feelings, and experiences, "
-                    "as if addressing a psychotherapist. The content may include "
-                    "discussions about emotions, personal challenges, relationships, "
-                    "and life events. The tone is introspective and reflective, "
-                    "and the transcription should aim to capture the speaker’s words "
-                    "as accurately as possible, maintaining the emotional nuances."
-                ),
+                prompt=TRANSCRIPTION_PROMPT,
                 response_format="text"
             )
-        # If you set response_format="text", `result` is a plain string
-        return result
+
+
+class LocalWhisperTranscriber:
+    """
+    Offline transcription with a local Whisper checkpoint (WHISPER_ASR_MODEL).
+
+    Runs on the shared audio engine, which also serves the emotion tool, so a
+    voice message is decoded and encoded once for both.
+    """
+
+    name = "local"
+
+    def cache_params(self):
+        # The audio engine caches transcript and emotions together
+        return None
+
+    def transcribe(self, audio_file_path: str, timeout: float = TRANSCRIPTION_TIMEOUT) -> str:
+        """
+        Transcribe on the local executor, so the caller gives up at `timeout`.
+        Work that overruns is cancelled if it has not started, else abandoned.
+        """
+        def run():
+            # Imported here: the engine pulls in transformers, which the openai backend does not need
+            from .audio_engine import get_audio_engine
+            return get_audio_engine().transcribe(audio_file_path, timeout=timeout)
+
+        future = _local_executor.submit(run)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            future.cancel()
+            raise TimeoutError(f"Local transcription did not finish within {timeout}s")
+
+
+# Local transcriptions run here so the calling thread can give up at the deadline
+_local_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="transcribe")
+
+_BACKENDS = {
+    "openai": OpenAITranscriber,
+    "local": LocalWhisperTranscriber,
+}
+_transcribers = {}
+_transcribers_lock = threading.Lock()
+
+
+def get_transcriber(backend: str = None):
+    """Return the (cached) transcriber for `backend`, TRANSCRIPTION_BACKEND by default."""
+    backend = backend or TRANSCRIPTION_BACKEND
+    if backend not in _BACKENDS:
+        raise ValueError(f"Unknown transcription backend '{backend}', expected one of {sorted(_BACKENDS)}")
+    with _transcribers_lock:
+        if backend not in _transcribers:
+            _transcribers[backend] = _BACKENDS[backend]()
+        return _transcribers[backend]
+
+
+def transcribe_audio(audio_file_path, backend=None):
+    """
+    Transcribe audio with the configured backend (see TRANSCRIPTION_BACKEND).
+
+    A transcription that times out yields TRANSCRIPTION_TIMEOUT_TEXT; other
+    failures raise RuntimeError.
+    """
+    try:
+        start = time.time()
+        transcriber = get_transcriber(backend)
+        params = transcriber.cache_params()
+        if params is None:
+            text = transcriber.transcribe(audio_file_path)
+        else:
+            text = analysis_cache.cached(
+                audio_file_path, "transcript", params, lambda: transcriber.transcribe(audio_file_path)
+            )
+        logger.info(f"Transcribed {audio_file_path} with {transcriber.name} backend in {time.time() - start:.2f}s")
+        return text
+    except TimeoutError as e:
+        logger.error(f"Transcription of {audio_file_path} timed out: {e}")
+        return TRANSCRIPTION_TIMEOUT_TEXT
     except Exception as e:
         raise RuntimeError(f"VoiceTranscriptionTool failed: {e}") from e
 
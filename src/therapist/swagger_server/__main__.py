@@ -1,10 +1,14 @@
 #!/usr/bin/env python3
 import os
 import jwt
+import torch
 from flask import Flask, send_from_directory, request
 from flask_cors import CORS
 from flask_socketio import SocketIO, emit, join_room, leave_room, disconnect
-from swagger_server.direct_routes import register_direct_routes
+from swagger_server.direct_routes import register_direct_routes, STREAM_REPLIES
+from swagger_server.logging_setup import configure_logging, get_logger, DEBUG_ENABLED
+from logic.streaming import streaming_available
+from swagger_server.warmup import warmup_state, default_tasks, WARMUP_ENABLED
 
 # Set up upload directories
 UPLOAD_DIR = os.getenv("UPLOAD_DIR", "/tmp/uploads")
@@ -15,8 +19,11 @@ os.makedirs(os.path.join(UPLOAD_DIR, "audio"), exist_ok=True)
 # JWT Secret (should match your auth routes)
 JWT_SECRET = os.getenv("JWT_SECRET", "your-secret-key")
 
+logger = get_logger(__name__)
+
 def create_app():
     """Create and configure the Flask application."""
+    configure_logging()
     app = Flask(__name__)
     
     # Enable CORS for your React frontend
@@ -24,14 +31,15 @@ def create_app():
         app,
         origins=["http://localhost:5173"],  # or your actual frontend URL
         supports_credentials=True,
+        expose_headers=["ETag", "X-Has-More", "X-Next-Before", "X-Last-Id"],
     )
     
     # Initialize Socket.IO
     socketio = SocketIO(
         app,
         cors_allowed_origins=["http://localhost:5173"],
-        logger=True,
-        engineio_logger=True,
+        logger=DEBUG_ENABLED,
+        engineio_logger=DEBUG_ENABLED,
         ping_timeout=60,
         ping_interval=25
     )
@@ -51,21 +59,19 @@ def create_app():
             payload = jwt.decode(token, JWT_SECRET, algorithms=['HS256'])
             return payload.get('user_id') or payload.get('id')
         except jwt.InvalidTokenError:
-            print("Invalid JWT token for socket connection")
+            logger.info("Invalid JWT token for socket connection")
             return None
         except Exception as e:
-            print(f"Socket auth error: {e}")
+            logger.warning("Socket auth error: %s", e)
             return None
     
     # Socket.IO Event Handlers
     @socketio.on('connect')
     def handle_connect(auth):
         """Handle client connection."""
-        print(f"Socket connection attempt with auth: {auth}")
-        
         user_id = authenticate_socket(auth)
         if not user_id:
-            print("Socket connection rejected: Invalid authentication")
+            logger.info("Socket connection rejected: Invalid authentication")
             disconnect()
             return False
         
@@ -75,7 +81,7 @@ def create_app():
         # Join user to their personal room
         join_room(f"user_{user_id}")
         
-        print(f"User {user_id} connected with session {request.sid}")
+        logger.info("User %s connected with session %s", user_id, request.sid)
         emit('connected', {
             'status': 'Connected to server',
             'user_id': user_id
@@ -87,7 +93,7 @@ def create_app():
         user_id = connected_users.pop(request.sid, None)
         if user_id:
             leave_room(f"user_{user_id}")
-            print(f"User {user_id} disconnected")
+            logger.info("User %s disconnected", user_id)
     
     @socketio.on('join_chat')
     def handle_join_chat(data):
@@ -101,7 +107,7 @@ def create_app():
         if chat_id:
             join_room(f"chat_{chat_id}")
             emit('joined_chat', {'chat_id': chat_id})
-            print(f"User {user_id} joined chat {chat_id}")
+            logger.debug("User %s joined chat %s", user_id, chat_id)
     
     @socketio.on('leave_chat')
     def handle_leave_chat(data):
@@ -113,13 +119,13 @@ def create_app():
         chat_id = data.get('chat_id')
         if chat_id:
             leave_room(f"chat_{chat_id}")
-            print(f"User {user_id} left chat {chat_id}")
+            logger.debug("User %s left chat %s", user_id, chat_id)
     
     # Function to emit new messages to connected clients
     def emit_new_message(user_id, message_data):
         """Emit a new message to the user's room."""
         socketio.emit('new_message', message_data, room=f"user_{user_id}")
-        print(f"Emitted new message to user {user_id}")
+        logger.debug("Emitted new message to user %s", user_id)
     
     # Make emit_new_message available to other modules
     app.emit_new_message = emit_new_message
@@ -128,7 +134,7 @@ def create_app():
     @app.route("/uploads/<path:filename>")
     def uploaded_file(filename):
         """Serve uploaded files with proper headers."""
-        print(f"Serving file: {filename}")
+        logger.debug("Serving file: %s", filename)
         
         # Detect content type based on file extension
         content_type = None
@@ -159,6 +165,13 @@ def create_app():
         """Simple health check endpoint."""
         return {"status": "healthy"}, 200
     
+    # Readiness: models loaded and warmed up (see swagger_server/warmup.py)
+    @app.route('/ready', methods=['GET'])
+    def readiness_check():
+        """Return 200 once the warm-up has finished, 503 before."""
+        state = warmup_state.snapshot()
+        return state, 200 if state["ready"] else 503
+    
     # Add Socket.IO status endpoint
     @app.route('/socket-status', methods=['GET'])
     def socket_status():
@@ -182,71 +195,58 @@ def create_app():
                     "POST /direct/auth/logout": "Log out current user"
                 },
                 "messages": {
-                    "POST /direct/messages/send/{userId}": "Send a message",
-                    "GET /direct/messages/{userId}": "Get all messages for a user",
+                    "POST /direct/messages/send/{userId}": "Send a message (add ?async=1 to get 202 + jobId and receive the reply over Socket.IO)",
+                    "GET /direct/messages/jobs/{jobId}": "Get the status of one of your async message jobs (Bearer token)",
+                    "GET /direct/messages/{userId}": "Get messages for a user (?limit=&before= / ?after= / ?since= cursors, ETag support)",
                     "POST /direct/messages/test/{userId}": "Test endpoint"
                 },
                 "files": {
-                    "GET /uploads/{path}": "Serve uploaded files"
+                    "GET /uploads/{path}": "Serve uploaded files",
+                    "GET|POST /direct/tts/stream": "Synthesize `text` (Bearer token, up to TTS_STREAM_MAX_CHARS) as a chunked WAV stream, sentence by sentence"
+                },
+                "health": {
+                    "GET /health": "Liveness check",
+                    "GET /ready": "Readiness check: 503 until the models are warmed up",
+                    "GET /direct/ser/status": "Emotion recognition counters (timeouts, dropped work)"
                 },
                 "websocket": {
                     "connect": "Connect to Socket.IO with JWT token",
                     "join_chat": "Join a specific chat room",
                     "leave_chat": "Leave a chat room",
-                    "new_message": "Receive new message events"
+                    "new_message": "Receive new message events",
+                    "newMessage": "Receive bot replies produced by async message jobs",
+                    "messageFailed": "Async message job failed",
+                    "replyStart / replyToken / replyEnd": "Therapist reply streamed token by token while it is generated",
+                    "replyAudio": "Reply audio, one WAV per sentence as soon as it is synthesized",
+                    "replyAudioEnd": "Last replyAudio of a stream was sent (streamId, audio URL). Comes before replyEnd with inline TTS, after it with ASYNC_TTS",
+                    "audioReady": "Stored reply audio is available (messageId, audio URL) for replies sent with audioPending"
                 }
             }
         }, 200
     
     return app, socketio
 
-import os
-import sys
-import logging
-from transformers import WhisperModel, WhisperProcessor
-import torch
-
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
-
 def setup_environment():
     """Setup and optimize the Docker environment"""
     
     # 1. Check PyTorch installation
-    logger.info(f"PyTorch version: {torch.__version__}")
-    logger.info(f"CUDA available: {torch.cuda.is_available()}")
-    logger.info(f"CPU threads: {torch.get_num_threads()}")
-    
-    # 2. Pre-download Whisper models
-    logger.info("Pre-downloading Whisper models...")
-    try:
-        model = WhisperModel.from_pretrained("openai/whisper-base")
-        processor = WhisperProcessor.from_pretrained("openai/whisper-base")
-        logger.info("Whisper models downloaded successfully")
-        
-        # Clear memory
-        del model
-        del processor
-        torch.cuda.empty_cache() if torch.cuda.is_available() else None
-        
-    except Exception as e:
-        logger.error(f"Failed to download Whisper models: {e}")
-        sys.exit(1)
+    logger.info("PyTorch version: %s", torch.__version__)
+    logger.info("CUDA available: %s", torch.cuda.is_available())
+    logger.info("CPU threads: %s", torch.get_num_threads())
     
-    # 3. Create necessary directories
+    # 2. Create necessary directories (models are loaded by the warm-up in main())
     directories = [
         "/media/uploads/audio",
         "/media/uploads/images",
-        "/usr/src/app/report",
         "/root/.cache/huggingface",
         "/usr/src/app/fine_tuned_whisper-base"
     ]
     
     for directory in directories:
         os.makedirs(directory, exist_ok=True)
-        logger.info(f"Created directory: {directory}")
+        logger.info("Created directory: %s", directory)
     
-    # 4. Set optimal environment variables
+    # 3. Set optimal environment variables
     env_vars = {
         "TRANSFORMERS_CACHE": "/root/.cache/huggingface",
         "HF_HOME": "/root/.cache/huggingface",
@@ -256,13 +256,19 @@ def setup_environment():
     
     for key, value in env_vars.items():
         os.environ[key] = value
-        logger.info(f"Set {key}={value}")
+        logger.info("Set %s=%s", key, value)
     
     logger.info("Setup completed successfully!")
 
 def main():
     """Run the Flask application with Socket.IO."""
     app, socketio = create_app()
+
+    # Load and warm up the models in the background; /ready reports progress
+    if WARMUP_ENABLED:
+        warmup_state.start(default_tasks(stream=STREAM_REPLIES and streaming_available()))
+    else:
+        warmup_state.mark_ready()
     
     # Use socketio.run instead of app.run for Socket.IO support
     socketio.run(
@@ -274,5 +280,6 @@ def main():
     )
 
 if __name__ == "__main__":
+    configure_logging()
     setup_environment()
     main()
\ No newline at end of file
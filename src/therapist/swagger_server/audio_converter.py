@@ -1,17 +1,201 @@
 import uuid
 import os
+import shutil
+import struct
+import subprocess
+import threading
+import wave
 from pathlib import Path
+
+import numpy as np
 from pydub import AudioSegment
+from logic.tools.audio_buffer import audio_buffers, segment_to_array, SAMPLE_RATE
+
+# ---------------------------------------------------------------------------
+# Config
+# ---------------------------------------------------------------------------
+# Probe uploads and stream them through ffmpeg; 0 = legacy temp file + pydub transcode
+AUDIO_STREAMING_CONVERT = os.getenv("AUDIO_STREAMING_CONVERT", "1") == "1"
+FFMPEG_BIN = os.getenv("FFMPEG_BIN", "ffmpeg")
+
+PROBE_BYTES = 4096
+CHUNK_BYTES = 64 * 1024
+# Containers whose index may sit at the end of the file; ffmpeg cannot read
+# them from a pipe, so they are spooled to disk first
+SEEKABLE_INPUT_SUFFIXES = {".m4a", ".mp4", ".mov", ".3gp"}
 
 
 def save_and_convert_audio(storage, directory: Path, target_ext: str = ".wav") -> str | None:
-    """Save the uploaded file, convert it to target_ext (wav/mp3), and return the new path."""
+    """
+    Save the uploaded file, convert it to target_ext (wav/mp3), and return the new path.
+
+    The decoded audio is also registered with `audio_buffers` under that path,
+    so the analysis tools do not have to read and resample the file again.
+    """
     if storage is None:
         return None
 
     # Ensure the output directory exists
     directory.mkdir(parents=True, exist_ok=True)
 
+    final_name = f"{uuid.uuid4().hex}{target_ext}"
+    final_path = directory / final_name
+
+    if not AUDIO_STREAMING_CONVERT:
+        _convert_with_pydub(storage, directory, final_path, target_ext)
+        return str(final_path)
+
+    source = storage.stream
+    head = source.read(PROBE_BYTES)
+
+    suffix = Path(storage.filename or "").suffix.lower()
+    spooled = None
+    if target_ext == ".wav" and _is_normalized_wav(head):
+        # Already 16 kHz mono 16-bit PCM: store the upload as is
+        with open(final_path, "wb") as out:
+            out.write(head)
+            shutil.copyfileobj(source, out, CHUNK_BYTES)
+        samples = _read_wav_samples(final_path)
+        if samples is not None:
+            audio_buffers.put(str(final_path), samples)
+            return str(final_path)
+        # The header looked right but the file does not parse: let ffmpeg decode it
+        spooled = directory / f"{uuid.uuid4().hex}_temp.wav"
+        os.replace(final_path, spooled)
+    elif suffix in SEEKABLE_INPUT_SUFFIXES:
+        spooled = directory / f"{uuid.uuid4().hex}_temp{suffix}"
+        with open(spooled, "wb") as out:
+            out.write(head)
+            shutil.copyfileobj(source, out, CHUNK_BYTES)
+
+    try:
+        if target_ext == ".wav":
+            samples = _ffmpeg_to_wav(source, head, final_path, input_path=spooled)
+            audio_buffers.put(str(final_path), samples)
+        else:
+            _ffmpeg_to_file(source, head, final_path, input_path=spooled)
+    except Exception:
+        try:
+            os.remove(final_path)
+        except OSError:
+            pass
+        raise
+    finally:
+        if spooled is not None:
+            try:
+                os.remove(spooled)
+            except OSError:
+                pass
+
+    return str(final_path)
+
+
+def _is_normalized_wav(head: bytes) -> bool:
+    """True when `head` starts a RIFF/WAVE file of 16 kHz mono 16-bit PCM."""
+    if len(head) < 12 or head[:4] != b"RIFF" or head[8:12] != b"WAVE":
+        return False
+    offset = 12
+    while offset + 8 <= len(head):
+        chunk_id = head[offset:offset + 4]
+        chunk_size = struct.unpack("<I", head[offset + 4:offset + 8])[0]
+        if chunk_id == b"fmt ":
+            if chunk_size < 16 or offset + 24 > len(head):
+                return False
+            audio_format, channels, rate, _, _, bits = struct.unpack("<HHIIHH", head[offset + 8:offset + 24])
+            return audio_format == 1 and channels == 1 and rate == SAMPLE_RATE and bits == 16
+        offset += 8 + chunk_size + (chunk_size & 1)
+    return False
+
+
+def _read_wav_samples(path: Path):
+    """Float32 samples of a 16-bit PCM WAV; None if the file cannot be parsed."""
+    try:
+        with wave.open(str(path), "rb") as wav:
+            frames = wav.readframes(wav.getnframes())
+    except (wave.Error, EOFError):
+        return None
+    samples = np.frombuffer(frames, dtype="<i2").astype(np.float32)
+    samples /= 32768.0
+    return samples
+
+
+def _feed(stdin, head: bytes, source) -> None:
+    """Write the upload to ffmpeg's stdin (runs on its own thread)."""
+    try:
+        stdin.write(head)
+        shutil.copyfileobj(source, stdin, CHUNK_BYTES)
+    except (BrokenPipeError, ValueError):
+        pass  # ffmpeg exited early; its return code tells why
+    finally:
+        try:
+            stdin.close()
+        except OSError:
+            pass
+
+
+def _start_ffmpeg(args, source, head: bytes, input_path, stdout):
+    cmd = [FFMPEG_BIN, "-hide_banner", "-loglevel", "error",
+           "-i", str(input_path) if input_path else "pipe:0", "-ac", "1", "-ar", str(SAMPLE_RATE), *args]
+    proc = subprocess.Popen(
+        cmd,
+        stdin=subprocess.DEVNULL if input_path else subprocess.PIPE,
+        stdout=stdout,
+        stderr=subprocess.PIPE,
+    )
+    # stderr is drained on its own thread so a chatty ffmpeg never blocks
+    errors = []
+    threads = [threading.Thread(target=lambda: errors.append(proc.stderr.read()), daemon=True)]
+    if not input_path:
+        threads.append(threading.Thread(target=_feed, args=(proc.stdin, head, source), daemon=True))
+    for thread in threads:
+        thread.start()
+    return proc, threads, errors
+
+
+def _finish_ffmpeg(proc, threads, errors) -> None:
+    proc.wait()
+    for thread in threads:
+        thread.join()
+    if proc.returncode != 0:
+        message = b"".join(errors).decode("utf-8", "replace").strip()
+        raise RuntimeError(f"ffmpeg failed ({proc.returncode}): {message}")
+
+
+def _ffmpeg_to_wav(source, head: bytes, final_path: Path, input_path=None) -> np.ndarray:
+    """
+    Decode the upload to 16 kHz mono PCM with ffmpeg, streaming it into
+    `final_path`; returns the samples for `audio_buffers`.
+    """
+    proc, threads, errors = _start_ffmpeg(["-f", "s16le", "pipe:1"], source, head, input_path, subprocess.PIPE)
+    pcm = bytearray()
+    try:
+        with wave.open(str(final_path), "wb") as out:
+            out.setnchannels(1)
+            out.setsampwidth(2)
+            out.setframerate(SAMPLE_RATE)
+            while True:
+                chunk = proc.stdout.read(CHUNK_BYTES)
+                if not chunk:
+                    break
+                out.writeframes(chunk)
+                pcm.extend(chunk)
+    finally:
+        proc.stdout.close()
+        _finish_ffmpeg(proc, threads, errors)
+    del pcm[len(pcm) & ~1:]
+    samples = np.frombuffer(pcm, dtype="<i2").astype(np.float32)
+    samples /= 32768.0
+    return samples
+
+
+def _ffmpeg_to_file(source, head: bytes, final_path: Path, input_path=None) -> None:
+    """Transcode the upload straight into `final_path` (format from its extension)."""
+    proc, threads, errors = _start_ffmpeg(["-y", str(final_path)], source, head, input_path, subprocess.DEVNULL)
+    _finish_ffmpeg(proc, threads, errors)
+
+
+def _convert_with_pydub(storage, directory: Path, final_path: Path, target_ext: str) -> None:
+    """Legacy path: temp file, full decode into an AudioSegment, export."""
     # 1) Save original upload as a temporary file
     suffix = Path(storage.filename).suffix or ""
     temp_name = f"{uuid.uuid4().hex}_temp{suffix}"
@@ -19,17 +203,13 @@ def save_and_convert_audio(storage, directory: Path, target_ext: str = ".wav") -
     storage.save(temp_path)
 
     # 2) Convert to desired format (let FFmpeg auto-detect the input!)
-    final_name = f"{uuid.uuid4().hex}{target_ext}"
-    final_path = directory / final_name
-
     # By not passing `format`, pydub/ffmpeg will probe the file for its true format
     audio = AudioSegment.from_file(temp_path)
     audio.export(final_path, format=target_ext.lstrip('.'))
+    audio_buffers.put(str(final_path), segment_to_array(audio))
 
     # 3) Clean up the temporary file
     try:
         os.remove(temp_path)
     except OSError:
         pass
-
-    return str(final_path)
@@ -0,0 +1,176 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+from sqlalchemy import or_, select
+
+from swagger_server.db import engine, messages
+
+# ---------------------------------------------------------------------------
+# Config
+# ---------------------------------------------------------------------------
+CONTEXT_CACHE_SIZE = int(os.getenv("CONTEXT_CACHE_SIZE", "256"))  # conversations kept in memory
+
+
+def format_turns(row) -> List[str]:
+    """
+    Format one message row as conversation-log turns.
+
+    Format:
+    user: text/audio path/image path
+    therapist: text
+    """
+    turns = []
+    user_parts = []
+    if row.text:
+        user_parts.append(row.text)
+    if row.audio_url:
+        user_parts.append(f"[audio: {row.audio_url}]")
+    if row.image_url:
+        user_parts.append(f"[image: {row.image_url}]")
+
+    if user_parts:
+        turns.append(f"user: {' '.join(user_parts)}")
+
+    # Add therapist response if present
+    if row.bot_text:
+        turns.append(f"therapist: {row.bot_text}")
+
+    return turns
+
+
+class _Context:
+    """Formatted history of one conversation."""
+
+    __slots__ = ("last_id", "turns", "tail_len", "unanswered", "lock")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        self.last_id = 0       # id of the newest row folded in
+        self.turns = []        # all formatted turns, oldest first
+        self.tail_len = 0      # number of turns contributed by the newest row
+        self.unanswered = set()  # folded rows without a bot reply yet
+
+    def append_row(self, row) -> None:
+        row_turns = format_turns(row)
+        self.turns.extend(row_turns)
+        self.tail_len = len(row_turns)
+        self.last_id = row.id
+        if not row.bot_text:
+            self.unanswered.add(row.id)
+
+    def replace_last_row(self, row) -> None:
+        if self.tail_len:
+            del self.turns[-self.tail_len:]
+        row_turns = format_turns(row)
+        self.turns.extend(row_turns)
+        self.tail_len = len(row_turns)
+        if row.bot_text:
+            self.unanswered.discard(row.id)
+
+
+class ConversationContextStore:
+    """
+    Incrementally maintained conversation logs, keyed by conversation id.
+
+    The first read of a conversation loads its rows once; afterwards each read
+    only fetches rows newer than the last one seen, plus rows still waiting
+    for a reply, and `record()` folds rows in as they are inserted or updated,
+    so building the prompt history no longer re-selects and re-formats the
+    whole conversation on every message. Replies written by other workers are
+    picked up through the unanswered rows; other edits to rows already folded
+    in only show up when this process records them or reloads the context.
+    Contexts are kept per process in an LRU bounded by `max_conversations`;
+    the store lock only guards that LRU, queries run under the lock of the
+    conversation they belong to.
+    """
+
+    def __init__(self, max_conversations: int = CONTEXT_CACHE_SIZE):
+        self._max = max(1, max_conversations)
+        self._contexts: "OrderedDict[int, _Context]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_turns(self, conn, conversation_id) -> List[str]:
+        """Return the formatted turns of the conversation, oldest first."""
+        ctx = self._context(conversation_id)
+        with ctx.lock:
+            self._fold_rows(conn, conversation_id, ctx)
+            return list(ctx.turns)
+
+    def record(self, conversation_id, row) -> None:
+        """Fold an inserted or updated message row into a cached conversation."""
+        with self._lock:
+            ctx = self._contexts.get(conversation_id)
+        if ctx is None:
+            # Not cached: the next read loads it from the database anyway
+            return
+        with ctx.lock:
+            if row.id > ctx.last_id:
+                # Rows other workers inserted in between must come first
+                with engine.connect() as conn:
+                    self._fold_rows(conn, conversation_id, ctx, before=row.id)
+                ctx.append_row(row)
+            elif row.id == ctx.last_id:
+                ctx.replace_last_row(row)
+            else:
+                # An older row changed; cheaper to reload than to splice
+                ctx.reset()
+
+    def invalidate(self, conversation_id) -> None:
+        with self._lock:
+            self._contexts.pop(conversation_id, None)
+
+    def _context(self, conversation_id) -> _Context:
+        """Return the cached context of the conversation, creating an empty one."""
+        with self._lock:
+            ctx = self._contexts.get(conversation_id)
+            if ctx is None:
+                ctx = _Context()
+                self._contexts[conversation_id] = ctx
+                while len(self._contexts) > self._max:
+                    self._contexts.popitem(last=False)
+            else:
+                self._contexts.move_to_end(conversation_id)
+            return ctx
+
+    @classmethod
+    def _fold_rows(cls, conn, conversation_id, ctx: _Context, before: Optional[int] = None) -> None:
+        """
+        Append the rows newer than `ctx.last_id` (and older than `before`, if
+        given) and re-read the unanswered ones; the caller holds `ctx.lock`.
+        """
+        newer = messages.c.id > ctx.last_id
+        query = (
+            select(
+                messages.c.id,
+                messages.c.text,
+                messages.c.audio_url,
+                messages.c.image_url,
+                messages.c.bot_text,
+            )
+            .where(messages.c.conversation_id == conversation_id)
+            .where(or_(newer, messages.c.id.in_(sorted(ctx.unanswered))) if ctx.unanswered else newer)
+            .order_by(messages.c.id)
+        )
+        if before is not None:
+            query = query.where(messages.c.id < before)
+        for row in conn.execute(query).fetchall():
+            if row.id > ctx.last_id:
+                ctx.append_row(row)
+            elif not row.bot_text:
+                continue
+            elif row.id == ctx.last_id:
+                ctx.replace_last_row(row)
+            else:
+                # Another worker answered an older row; reload from scratch
+                ctx.reset()
+                cls._fold_rows(conn, conversation_id, ctx, before)
+                return
+
+
+# Process-wide store used by the direct routes
+context_store = ConversationContextStore()
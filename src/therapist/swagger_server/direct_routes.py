@@ -1,16 +1,29 @@
-from flask import request, jsonify, current_app, send_file
+from flask import request, jsonify, current_app, send_file, Response, stream_with_context
 import os
 import uuid
+import json
+import hashlib
+import itertools
 import jwt
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
-import traceback
-from sqlalchemy import select
+import logging
+from sqlalchemy import select, func, case, or_, and_
 
 from swagger_server.db import engine, users, conversations, messages, ratings
 from logic.therapy import TherapySession
 from swagger_server.audio_converter import save_and_convert_audio
-from swagger_server.tts_service import generate_therapy_tts_safe, cleanup_old_tts_files, is_tts_enabled
+from logic.tools.audio_buffer import audio_buffers
+from logic.tools.ser_tool import ser_status
+from swagger_server.tts_service import (
+    generate_therapy_tts_safe, cleanup_old_tts_files, is_tts_enabled, stream_tts_wav, wav_bytes, tts_cache,
+    sentence_cache,
+)
+from swagger_server.message_jobs import job_runner, tts_runner, JobQueueFull
+from swagger_server.conversation_context import context_store
+from swagger_server.logging_setup import get_logger, sampled
+
+logger = get_logger(__name__)
 
 # ---------------------------------------------------------------------------
 # File-system config
@@ -21,8 +34,6 @@ AUDIO_DIR = UPLOAD_ROOT / "audio"
 for _d in (IMAGE_DIR, AUDIO_DIR):
     _d.mkdir(parents=True, exist_ok=True)
 
-REPORT_DIR = Path("report")
-
 # ---------------------------------------------------------------------------
 # Authentication config
 # ---------------------------------------------------------------------------
@@ -30,43 +41,83 @@ JWT_SECRET     = os.getenv("JWT_SECRET", "change_this_secret")
 JWT_ALGORITHM  = "HS256"
 JWT_EXPIRES_IN = 7 * 24 * 3600  # one week
 
+# ---------------------------------------------------------------------------
+# Message pipeline config
+# ---------------------------------------------------------------------------
+# When enabled, /direct/messages/send answers 202 immediately and the bot
+# reply is delivered later over Socket.IO. Clients can also opt in per request
+# with `?async=1` (or an `async` form field).
+ASYNC_MESSAGES = os.getenv("ASYNC_MESSAGES", "0") == "1"
+
+# Page sizes for GET /direct/messages/<user_id>. A default of 0 keeps the
+# legacy "whole conversation" behaviour for clients that send no limit.
+MESSAGES_DEFAULT_LIMIT = int(os.getenv("MESSAGES_DEFAULT_LIMIT", "0"))
+MESSAGES_MAX_LIMIT = int(os.getenv("MESSAGES_MAX_LIMIT", "200"))
+# Rows still waiting for their bot reply (async jobs) or audio (async TTS)
+# hold the delta-sync cursor back for this long, so `since` clients get
+# them again once they are complete
+MESSAGES_PENDING_GRACE = int(os.getenv("MESSAGES_PENDING_GRACE", "300"))  # seconds
+
+# Stream the therapist reply token by token to the user's Socket.IO room
+# (replyStart / replyToken / replyEnd events) while it is being generated.
+STREAM_REPLIES = os.getenv("STREAM_REPLIES", "1") == "1"
+
+# Push the reply audio sentence by sentence (replyAudio events, one WAV per
+# sentence) on the same stream, so playback starts before TTS is finished.
+# The audio of a stream always ends with replyAudioEnd. Inline TTS sends it
+# before replyEnd; with ASYNC_TTS it follows replyEnd (and precedes audioReady).
+STREAM_REPLY_AUDIO = os.getenv("STREAM_REPLY_AUDIO", "1") == "1"
+
+# Synthesize reply audio on the TTS worker pool instead of inline. The text
+# reply is returned right away; bot_audio_url is filled in later and an
+# audioReady event is pushed to the user's room.
+ASYNC_TTS = os.getenv("ASYNC_TTS", "1") == "1"
+
+# Longest text /direct/tts/stream synthesizes in one request
+TTS_STREAM_MAX_CHARS = int(os.getenv("TTS_STREAM_MAX_CHARS", "2000"))
+
 # ---------------------------------------------------------------------------
 # Helpers
 # ---------------------------------------------------------------------------
 
 def debug_file_path(file_path, prefix="File"):
-    """Print debugging information about a file path."""
+    """Log debugging information about a file path.
+    
+    This stats the file, so it is a no-op unless DEBUG logging is enabled.
+    """
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
     if not file_path:
-        print(f"{prefix} path is None")
+        logger.debug("%s path is None", prefix)
         return
     
-    print(f"{prefix} full path: {file_path}")
+    logger.debug("%s full path: %s", prefix, file_path)
     
     # Check if file exists
     exists = os.path.exists(file_path)
-    print(f"{prefix} exists: {exists}")
+    logger.debug("%s exists: %s", prefix, exists)
     
     if exists:
         # Check file size
         size = os.path.getsize(file_path)
-        print(f"{prefix} size: {size} bytes")
+        logger.debug("%s size: %s bytes", prefix, size)
         
         # Check permissions
         readable = os.access(file_path, os.R_OK)
         writable = os.access(file_path, os.W_OK)
-        print(f"{prefix} permissions: readable={readable}, writable={writable}")
+        logger.debug("%s permissions: readable=%s, writable=%s", prefix, readable, writable)
         
         # Check owner and group
         stat_info = os.stat(file_path)
-        print(f"{prefix} owner/group: {stat_info.st_uid}/{stat_info.st_gid}")
+        logger.debug("%s owner/group: %s/%s", prefix, stat_info.st_uid, stat_info.st_gid)
     
     # Get the file name
     filename = os.path.basename(file_path)
-    print(f"{prefix} filename: {filename}")
+    logger.debug("%s filename: %s", prefix, filename)
     
     # Construct the expected public URL
     public_url = get_public_url(file_path)
-    print(f"{prefix} expected public URL: {public_url}")
+    logger.debug("%s expected public URL: %s", prefix, public_url)
 
 def _save(storage, directory: Path, ext: str):
     """Persist an uploaded FileStorage; return the relative path or None."""
@@ -78,14 +129,6 @@ def _save(storage, directory: Path, ext: str):
     return str(dest)
 
 
-def _read_report(name: str):
-    """Read a report file, return None if not found."""
-    try:
-        return (REPORT_DIR / name).read_text("utf-8")
-    except FileNotFoundError:
-        return None
-
-
 def _ensure_conversation(conn, uid):
     """Return an existing conversation ID or create a new one for user `uid`."""
     row = conn.execute(
@@ -124,47 +167,19 @@ def get_public_url(file_path):
         return f"/uploads/{path.name}"
 
 
-def _build_conversation_log(conn, conversation_id):
+def _conversation_turns(conn, conversation_id):
     """
-    Build a conversation log string from the database history.
+    Return the conversation history of `conversation_id` as a list of turns.
     
-    Format:
+    Format of each turn:
     therapist: text
     user: text/audio path/image path
     
-    Args:
-        conn: Database connection
-        conversation_id: The conversation ID to fetch history for
-        
-    Returns:
-        String containing the formatted conversation history
+    Served from the incremental context store, so only rows added since the
+    last call are read from the database. TherapySession windows the turns to
+    its token budget before they reach the prompt.
     """
-    rows = conn.execute(
-        select(messages)
-        .where(messages.c.conversation_id == conversation_id)
-        .order_by(messages.c.id)
-    ).fetchall()
-    
-    conversation_log = []
-    
-    for row in rows:
-        # Add user message if present
-        user_parts = []
-        if row.text:
-            user_parts.append(row.text)
-        if row.audio_url:
-            user_parts.append(f"[audio: {row.audio_url}]")
-        if row.image_url:
-            user_parts.append(f"[image: {row.image_url}]")
-        
-        if user_parts:
-            conversation_log.append(f"user: {' '.join(user_parts)}")
-        
-        # Add therapist response if present
-        if row.bot_text:
-            conversation_log.append(f"therapist: {row.bot_text}")
-    
-    return '\n'.join(conversation_log)
+    return context_store.get_turns(conn, conversation_id)
 
 
 def _generate_token(user_id) -> str:
@@ -184,20 +199,384 @@ def _decode_token(token: str):
     except jwt.InvalidTokenError:
         return None, "Invalid token. Please log in again."
 
-def broadcast_new_message(message_data, user_id):
-    """Broadcast a new message via Socket.IO."""
+def _bearer_user_id():
+    """User id of the request's Bearer token: (user_id, None) or (None, error response)."""
+    auth_header = request.headers.get("Authorization", "")
+    if not auth_header.startswith("Bearer "):
+        return None, (jsonify({"message": "Missing Bearer token"}), 401)
+    payload, error = _decode_token(auth_header.split(" ", 1)[1])
+    if error:
+        return None, (jsonify({"message": error}), 401)
+    return payload.get("user_id"), None
+
+def emit_to_user(event, data, user_id):
+    """Emit a Socket.IO event to the user's personal room."""
     try:
         # Access the Socket.IO instance
         socketio = current_app.extensions.get('socketio')
         if socketio:
-            print(f"Broadcasting new message to user {user_id}")
-            # Emit to the room/user
-            socketio.emit('newMessage', message_data, room=f"user_{user_id}")
+            logger.debug("Emitting '%s' to user %s", event, user_id)
+            socketio.emit(event, data, room=f"user_{user_id}")
         else:
-            print("SocketIO not available")
+            logger.warning("SocketIO not available")
+    except Exception:
+        logger.exception("Error emitting '%s'", event)
+
+
+def broadcast_new_message(message_data, user_id):
+    """Broadcast a new message via Socket.IO."""
+    emit_to_user('newMessage', message_data, user_id)
+
+
+def _reply_streamer(user_id):
+    """
+    Return (stream_id, on_token) for streaming a reply to the user's room, or
+    (None, None) when streaming is disabled or Socket.IO is not available.
+    """
+    if not STREAM_REPLIES:
+        return None, None
+    socketio = current_app.extensions.get('socketio')
+    if not socketio:
+        return None, None
+
+    stream_id = uuid.uuid4().hex
+    room = f"user_{user_id}"
+    socketio.emit('replyStart', {"streamId": stream_id}, room=room)
+
+    def on_token(token):
+        socketio.emit('replyToken', {"streamId": stream_id, "token": token}, room=room)
+
+    return stream_id, on_token
+
+
+def _audio_streamer(stream_id, user_id):
+    """
+    Return an on_sentence callback that pushes each synthesized sentence to
+    the reply stream, or None when there is no stream or audio streaming is off.
+    """
+    if stream_id is None or not STREAM_REPLY_AUDIO:
+        return None
+    socketio = current_app.extensions.get('socketio')
+    if not socketio:
+        return None
+    room = f"user_{user_id}"
+
+    def on_sentence(index, sentence, waveform, sample_rate):
+        socketio.emit('replyAudio', {
+            "streamId": stream_id,
+            "index": index,
+            "text": sentence,
+            "sampleRate": sample_rate,
+            "audio": wav_bytes(waveform, sample_rate),
+        }, room=room)
+
+    return on_sentence
+
+
+def _stream_bot_audio(bot_reply, stream_id, user_id):
+    """
+    `_generate_bot_audio` with its sentences pushed to the reply stream; the
+    stream's audio is closed by a replyAudioEnd event (audio is the stored
+    file's URL, null when synthesis failed).
+    """
+    on_sentence = _audio_streamer(stream_id, user_id)
+    bot_audio_path = _generate_bot_audio(bot_reply, on_sentence)
+    if on_sentence is not None:
+        emit_to_user('replyAudioEnd', {
+            "streamId": stream_id,
+            "audio": get_public_url(bot_audio_path),
+        }, user_id)
+    return bot_audio_path
+
+
+def _end_reply_stream(stream_id, user_id, row=None):
+    """Tell the client which stored message replaces the streamed text."""
+    if stream_id is None:
+        return
+    emit_to_user('replyEnd', {
+        "streamId": stream_id,
+        "messageId": f"{row.id}-bot" if row is not None and row.bot_text else None,
+    }, user_id)
+
+
+def _wants_job_mode():
+    """Return True if the current send request should run as a background job."""
+    flag = request.args.get("async") or request.form.get("async")
+    if flag is not None:
+        return flag.strip().lower() in ("1", "true", "yes")
+    return ASYNC_MESSAGES
+
+
+def _content_type(user_text, audio_path, image_path):
+    """Classify a user message as text, audio, image or mixed."""
+    user_supplied = {
+        "text": bool(user_text),
+        "audio": bool(audio_path),
+        "image": bool(image_path),
+    }
+    if sum(user_supplied.values()) > 1:
+        return "mixed"
+    if user_supplied["audio"]:
+        return "audio"
+    if user_supplied["image"]:
+        return "image"
+    return "text"
+
+
+def _user_payload(row, user_id):
+    """Client representation of the user half of a message row."""
+    return {
+        "_id": f"{row.id}-user",
+        "senderId": str(user_id),
+        "conversationId": str(row.conversation_id),
+        "text": row.text,
+        "audio": get_public_url(row.audio_url),
+        "imageUrl": get_public_url(row.image_url),
+        "createdAt": row.timestamp.isoformat(),
+    }
+
+
+def _bot_payload(row, audio_pending=False):
+    """
+    Client representation of the bot half of a message row. `audioPending`
+    tells the client that the audio follows in an audioReady event.
+    """
+    return {
+        "_id": f"{row.id}-bot",
+        "senderId": "bot",
+        "conversationId": str(row.conversation_id),
+        "text": row.bot_text,
+        "audio": get_public_url(row.bot_audio_url),  # Include bot TTS audio
+        "audioPending": audio_pending,
+        "imageUrl": None,
+        "createdAt": row.timestamp.isoformat(),
+    }
+
+
+def _generate_bot_audio(bot_reply, on_sentence=None):
+    """
+    Synthesize TTS for a bot reply; return the audio path or None.
+    `on_sentence` receives each sentence as soon as it is synthesized.
+    """
+    if not (bot_reply and bot_reply.strip() and is_tts_enabled()):
+        if not is_tts_enabled():
+            logger.debug("TTS is disabled via environment variable")
+        elif not bot_reply:
+            logger.debug("No bot reply to convert to speech")
+        return None
+
+    try:
+        logger.debug("Attempting TTS generation for bot reply...")
+        # Create TTS directory if it doesn't exist
+        tts_dir = AUDIO_DIR / "tts"
+        tts_dir.mkdir(parents=True, exist_ok=True)
+
+        # Generate TTS audio with quota protection
+        bot_audio_path = generate_therapy_tts_safe(bot_reply, tts_dir, on_sentence=on_sentence)
+
+        if bot_audio_path:
+            logger.info("TTS generated: %s", bot_audio_path)
+            debug_file_path(bot_audio_path, "Bot TTS")
+
+            # Cleanup old TTS files to prevent disk space issues
+            cleanup_old_tts_files(tts_dir, max_age_hours=24)
+        else:
+            logger.warning("TTS generation skipped (quota/disabled/error)")
+        return bot_audio_path
+
     except Exception as e:
-        print(f"Error broadcasting message: {str(e)}")
-        traceback.print_exc()
+        logger.warning("TTS generation failed, continuing without audio: %s", e)
+        # Continue without TTS - don't let TTS failures break message flow
+        return None
+
+
+def _complete_tts_job(app, user_id, message_id, bot_reply, stream_id=None):
+    """
+    Background TTS for a stored bot reply: synthesize it, fill in
+    bot_audio_url and push audioReady (audio is null when synthesis failed).
+    """
+    with app.app_context():
+        bot_audio_path = _stream_bot_audio(bot_reply, stream_id, user_id)
+        if bot_audio_path:
+            with engine.begin() as conn:
+                conn.execute(
+                    messages.update()
+                    .where(messages.c.id == message_id)
+                    .values(bot_audio_url=bot_audio_path)
+                )
+        emit_to_user('audioReady', {
+            "messageId": f"{message_id}-bot",
+            "audio": get_public_url(bot_audio_path),
+        }, user_id)
+        return {"messageId": message_id, "audio": bot_audio_path}
+
+
+def _schedule_bot_audio(app, user_id, message_id, bot_reply, stream_id=None):
+    """Queue TTS for a stored bot reply; return True if audioReady will follow."""
+    if not (bot_reply and bot_reply.strip() and is_tts_enabled()):
+        return False
+    try:
+        tts_runner.submit(
+            _complete_tts_job,
+            app, user_id, message_id, bot_reply, stream_id,
+            userId=str(user_id),
+            messageId=message_id,
+        )
+    except JobQueueFull:
+        logger.warning("TTS queue full, message %s is stored without audio", message_id)
+        return False
+    return True
+
+
+def _complete_message_job(app, user_id, conv_id, message_id, user_text, image_path, audio_path, conversation_log):
+    """
+    Background half of an async send: run the crew and TTS for an already
+    stored user message, fill in the bot columns and push the reply to the
+    user's Socket.IO room.
+    """
+    with app.app_context():
+        stream_id, on_token = _reply_streamer(user_id)
+        try:
+            therapy = TherapySession()
+            try:
+                result = therapy.respond(
+                    user_text=user_text,
+                    image_path=image_path,
+                    audio_path=audio_path,
+                    conversation_log=conversation_log,
+                    conversation_id=conv_id,
+                    on_token=on_token,
+                )
+            finally:
+                # The decoded voice note is only needed by this request's analysis
+                audio_buffers.release(audio_path)
+            bot_reply = result.reply
+            logger.debug("[job] Bot reply for message %s: %.100s", message_id, bot_reply)
+
+            bot_audio_path = None if ASYNC_TTS else _stream_bot_audio(bot_reply, stream_id, user_id)
+
+            with engine.begin() as conn:
+                conn.execute(
+                    messages.update()
+                    .where(messages.c.id == message_id)
+                    .values(
+                        text_report=result.text_report,
+                        image_report=result.image_report,
+                        audio_report=result.audio_report,
+                        bot_text=bot_reply,
+                        bot_audio_url=bot_audio_path,
+                    )
+                )
+                row = conn.execute(
+                    select(messages).where(messages.c.id == message_id)
+                ).first()
+            context_store.record(conv_id, row)
+        except Exception as e:
+            _end_reply_stream(stream_id, user_id)
+            emit_to_user('messageFailed', {
+                "messageId": f"{message_id}-user",
+                "message": f"Server error: {str(e)}",
+            }, user_id)
+            raise
+
+        _end_reply_stream(stream_id, user_id, row)
+        audio_pending = ASYNC_TTS and _schedule_bot_audio(app, user_id, row.id, bot_reply, stream_id)
+        if row.bot_text:
+            broadcast_new_message(_bot_payload(row, audio_pending), user_id)
+        return {"messageId": row.id}
+
+
+def _parse_page_args(args):
+    """
+    Parse limit/before/after/since query args for message listing.
+    Returns (page, None) or (None, error_message). `since` is folded into
+    `after`, with the page size defaulting to the maximum.
+    """
+    page = {}
+    for key in ("limit", "before", "after", "since"):
+        raw = args.get(key)
+        if raw is None or raw == "":
+            page[key] = None
+            continue
+        try:
+            page[key] = int(raw)
+        except ValueError:
+            return None, f"'{key}' must be an integer"
+        if page[key] < (1 if key == "limit" else 0):
+            return None, f"'{key}' is out of range"
+    
+    if page["since"] is not None:
+        if page["after"] is not None or page["before"] is not None:
+            return None, "'since' cannot be combined with 'before' or 'after'"
+        page["after"] = page["since"]
+        if page["limit"] is None:
+            page["limit"] = MESSAGES_MAX_LIMIT
+    elif page["after"] is not None and page["before"] is not None:
+        return None, "Use either 'before' or 'after', not both"
+    
+    if page["limit"] is None:
+        page["limit"] = MESSAGES_DEFAULT_LIMIT
+    if page["limit"]:
+        page["limit"] = max(1, min(page["limit"], MESSAGES_MAX_LIMIT))
+    return page, None
+
+
+def _pending_condition():
+    """Rows whose bot reply or audio may still be filled in by a background job."""
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=MESSAGES_PENDING_GRACE)
+    incomplete = messages.c.bot_text.is_(None)
+    if ASYNC_TTS and is_tts_enabled():
+        incomplete = or_(incomplete, messages.c.bot_audio_url.is_(None))
+    return and_(messages.c.timestamp > cutoff, incomplete)
+
+
+def _conversation_state(conn, conversation_id):
+    """
+    Cheap aggregate over a conversation: everything a page depends on
+    (new rows, filled-in replies and audio, ratings) changes it, so it
+    serves as the validator without fetching the page itself.
+    """
+    state = conn.execute(
+        select(
+            func.max(messages.c.id),
+            func.count(messages.c.id),
+            func.count(messages.c.bot_text),
+            func.count(messages.c.bot_audio_url),
+            func.count(ratings.c.rating),
+            func.coalesce(func.sum(ratings.c.rating), 0),
+            func.min(case((_pending_condition(), messages.c.id))),
+        )
+        .select_from(messages.outerjoin(ratings, ratings.c.message_id == messages.c.id))
+        .where(messages.c.conversation_id == conversation_id)
+    ).first()
+    return {
+        "maxId": state[0],
+        "rows": state[1],
+        "replies": state[2],
+        "audio": state[3],
+        "ratings": state[4],
+        "ratingSum": int(state[5] or 0),
+        "pendingFrom": state[6],
+    }
+
+
+def _page_etag(state, page):
+    """Weak validator for one page of messages, from the conversation state."""
+    blob = json.dumps([page, state], sort_keys=True, default=str)
+    return hashlib.sha1(blob.encode("utf-8")).hexdigest()
+
+
+def _sync_cursor(rows, page, has_more, pending_from):
+    """
+    X-Last-Id for the next `after`/`since` request. On the last page the
+    cursor stays below the oldest pending row, so the row is sent again
+    once its reply or audio has been filled in.
+    """
+    last_id = rows[-1].id if rows else page["after"]
+    if not has_more and pending_from is not None and last_id is not None:
+        last_id = min(last_id, pending_from - 1)
+    return last_id
+
 
 # ---------------------------------------------------------------------------
 # Direct routes
@@ -210,45 +589,69 @@ def register_direct_routes(app):
     # Message routes
     # ---------------------------------------------------------------------------
     
+    def _enqueue_message_job(user_id, conv_id, content_type, user_text, image_path, audio_path, conversation_log):
+        """Store the user message, hand the bot work to the job pool and answer 202."""
+        with engine.begin() as conn:
+            ins = conn.execute(
+                messages.insert().values(
+                    conversation_id=conv_id,
+                    content_type=content_type,
+                    text=user_text,
+                    image_url=image_path,
+                    audio_url=audio_path,
+                )
+            )
+            row = conn.execute(
+                select(messages).where(messages.c.id == ins.inserted_primary_key[0])
+            ).first()
+        
+        # Submit only after commit so the worker is guaranteed to see the row
+        try:
+            job_id = job_runner.submit(
+                _complete_message_job,
+                app, user_id, conv_id, row.id, user_text, image_path, audio_path, conversation_log,
+                userId=str(user_id),
+                messageId=row.id,
+            )
+        except JobQueueFull as e:
+            # Drop the user row so a retry doesn't duplicate it
+            with engine.begin() as conn:
+                conn.execute(messages.delete().where(messages.c.id == row.id))
+            logger.warning("Message queue full, rejected message %s", row.id)
+            return jsonify({"message": str(e)}), 503
+        
+        context_store.record(conv_id, row)
+        logger.info("Queued message job %s for message %s", job_id, row.id)
+        
+        return jsonify({
+            "jobId": job_id,
+            "status": "queued",
+            "messages": [_user_payload(row, user_id)],
+        }), 202
+    
     @app.route('/direct/messages/send/<user_id>', methods=['POST'])
     def direct_send_message(user_id):
         """Handle message submission directly, bypassing Connexion."""
+        stream_id = None
         try:
-            print(f"\n{'=' * 50}")
-            print(f"DIRECT ROUTE HIT: POST /direct/messages/send/{user_id}")
-            print(f"Request content type: {request.content_type}")
-            print(f"Form keys: {list(request.form.keys()) if request.form else 'None'}")
-            print(f"Files keys: {list(request.files.keys()) if request.files else 'None'}")
-            
-            # Detailed info about files
-            for key, file_storage in request.files.items():
-                print(f"File '{key}' details:")
-                print(f"  - Filename: {file_storage.filename}")
-                print(f"  - Content type: {file_storage.content_type}")
-                print(f"  - Content length: {request.headers.get('Content-Length')}")
+            logger.info("POST /direct/messages/send/%s", user_id)
+            logger.debug("Request content type: %s, form keys: %s, file keys: %s, content length: %s",
+                         request.content_type, list(request.form.keys()), list(request.files.keys()),
+                         request.headers.get('Content-Length'))
             
             # Get message content
             user_text = request.form.get("text", "").strip() or None
             audio_storage = request.files.get("audio")
             image_storage = request.files.get("image")
             
-            print(f"Text content: {'Present' if user_text else 'Not present'}")
-            if user_text:
-                print(f"  - Text preview: {user_text[:50]}...")
-            
-            print(f"Audio: {'Present' if audio_storage else 'Not present'}")
-            if audio_storage:
-                print(f"  - Filename: {audio_storage.filename}")
-                print(f"  - Content type: {audio_storage.content_type}")
-            
-            print(f"Image: {'Present' if image_storage else 'Not present'}")
-            if image_storage:
-                print(f"  - Filename: {image_storage.filename}")
-                print(f"  - Content type: {image_storage.content_type}")
+            logger.debug("Text: %s, audio: %s, image: %s",
+                         "present" if user_text else "absent",
+                         audio_storage.filename if audio_storage else "absent",
+                         image_storage.filename if image_storage else "absent")
             
             # Validate
             if not any([user_text, audio_storage, image_storage]):
-                print("ERROR: No content provided")
+                logger.info("Rejected message without content")
                 return jsonify({
                     "message": "Provide at least one of: text, audio, or image."
                 }), 400
@@ -264,17 +667,12 @@ def register_direct_routes(app):
                     # Save the file with a .webm extension
                     audio_path = save_and_convert_audio(audio_storage, AUDIO_DIR, target_ext=".wav")
                     
-                    print(f"Audio saved:")
-                    print(f"  - Original filename: {original_filename}")
-                    print(f"  - Content type: {content_type}")
-                    print(f"  - Saved to: {audio_path}")
-                    print(f"  - Public URL: {get_public_url(audio_path)}")
+                    logger.debug("Audio saved: %s (%s) -> %s", original_filename, content_type, audio_path)
                     
                     # Debug the file path
                     debug_file_path(audio_path, "Audio")
-                except Exception as e:
-                    print(f"ERROR saving audio: {str(e)}")
-                    traceback.print_exc()
+                except Exception:
+                    logger.exception("Error saving audio")
             
             image_path = None
             if image_storage:
@@ -292,17 +690,12 @@ def register_direct_routes(app):
                     
                     image_path = _save(image_storage, IMAGE_DIR, ext)
                     
-                    print(f"Image saved:")
-                    print(f"  - Original filename: {original_filename}")
-                    print(f"  - Content type: {content_type}")
-                    print(f"  - Saved to: {image_path}")
-                    print(f"  - Public URL: {get_public_url(image_path)}")
+                    logger.debug("Image saved: %s (%s) -> %s", original_filename, content_type, image_path)
                     
                     # Debug the file path
                     debug_file_path(image_path, "Image")
-                except Exception as e:
-                    print(f"ERROR saving image: {str(e)}")
-                    traceback.print_exc()
+                except Exception:
+                    logger.exception("Error saving image")
             
             # Check user exists and get conversation history
             with engine.begin() as conn:
@@ -311,73 +704,39 @@ def register_direct_routes(app):
                 conv_id = _ensure_conversation(conn, user_id)
                 
                 # Build conversation log
-                conversation_log = _build_conversation_log(conn, conv_id)
-                print(f"Conversation log preview: {conversation_log[:200]}..." if conversation_log else "No conversation history")
+                conversation_log = _conversation_turns(conn, conv_id)
+                logger.debug("Conversation history: %d turns", len(conversation_log))
+            
+            content_type = _content_type(user_text, audio_path, image_path)
+            logger.debug("Content type: %s", content_type)
+            
+            if _wants_job_mode():
+                return _enqueue_message_job(
+                    user_id, conv_id, content_type, user_text, image_path, audio_path, conversation_log
+                )
             
             # Process with AI
+            stream_id, on_token = _reply_streamer(user_id)
             therapy = TherapySession()
-            bot_reply = therapy.run(
-                user_text=user_text,
-                image_path=image_path,
-                audio_path=audio_path,
-                conversation_log=conversation_log,
-            )
-            
-            print(f"Bot reply: {bot_reply[:100]}..." if bot_reply else "No bot reply")
+            try:
+                result = therapy.respond(
+                    user_text=user_text,
+                    image_path=image_path,
+                    audio_path=audio_path,
+                    conversation_log=conversation_log,
+                    conversation_id=conv_id,
+                    on_token=on_token,
+                )
+            finally:
+                # The decoded voice note is only needed by this request's analysis
+                audio_buffers.release(audio_path)
+            bot_reply = result.reply
             
-            # Generate TTS for bot reply (quota-safe version)
-            bot_audio_path = None
-            if bot_reply and bot_reply.strip() and is_tts_enabled():
-                try:
-                    print("Attempting TTS generation for bot reply...")
-                    # Create TTS directory if it doesn't exist
-                    tts_dir = AUDIO_DIR / "tts"
-                    tts_dir.mkdir(parents=True, exist_ok=True)
-                    
-                    # Generate TTS audio with quota protection
-                    bot_audio_path = generate_therapy_tts_safe(bot_reply, tts_dir)
-                    
-                    if bot_audio_path:
-                        print(f"✅ TTS generated successfully: {bot_audio_path}")
-                        print(f"TTS public URL: {get_public_url(bot_audio_path)}")
-                        debug_file_path(bot_audio_path, "Bot TTS")
-                        
-                        # Cleanup old TTS files to prevent disk space issues
-                        cleanup_old_tts_files(tts_dir, max_age_hours=24)
-                    else:
-                        print("⚠️ TTS generation skipped (quota/disabled/error)")
-                        
-                except Exception as e:
-                    print(f"⚠️ TTS generation failed, continuing without audio: {str(e)}")
-                    # Continue without TTS - don't let TTS failures break message flow
-                    bot_audio_path = None
-            else:
-                if not is_tts_enabled():
-                    print("ℹ️ TTS is disabled via environment variable")
-                elif not bot_reply:
-                    print("ℹ️ No bot reply to convert to speech")
-            
-            # Get reports
-            text_rep = _read_report("text_report.md")
-            img_rep = _read_report("image_report.md")
-            aud_rep = _read_report("audio_report.md")
-            
-            # Determine content type
-            user_supplied = {
-                "text": bool(user_text),
-                "audio": bool(audio_path),
-                "image": bool(image_path),
-            }
-            if sum(user_supplied.values()) > 1:
-                content_type = "mixed"
-            elif user_supplied["audio"]:
-                content_type = "audio"
-            elif user_supplied["image"]:
-                content_type = "image"
-            else:
-                content_type = "text"
+            logger.debug("Bot reply: %.100s", bot_reply)
             
-            print(f"Content type: {content_type}")
+            # Generate TTS for bot reply (quota-safe version); with ASYNC_TTS it
+            # runs on the TTS pool once the row is stored
+            bot_audio_path = None if ASYNC_TTS else _stream_bot_audio(bot_reply, stream_id, user_id)
             
             # Save to database
             with engine.begin() as conn:
@@ -388,9 +747,9 @@ def register_direct_routes(app):
                         text=user_text,
                         image_url=image_path,
                         audio_url=audio_path,
-                        text_report=text_rep,
-                        image_report=img_rep,
-                        audio_report=aud_rep,
+                        text_report=result.text_report,
+                        image_report=result.image_report,
+                        audio_report=result.audio_report,
                         bot_text=bot_reply,
                         bot_audio_url=bot_audio_path,  # Store TTS audio path
                     )
@@ -398,62 +757,44 @@ def register_direct_routes(app):
                 row = conn.execute(
                     select(messages).where(messages.c.id == ins.inserted_primary_key[0])
                 ).first()
-                
-                # Print detailed info about what was saved
-                print("\n----- DATABASE RECORD DEBUG -----")
-                print(f"Message ID: {row.id}")
-                print(f"User text: {row.text}")
-                print(f"Image path: {row.image_url}")
-                print(f"Audio path: {row.audio_url}")
-                print(f"Bot text length: {len(row.bot_text) if row.bot_text else 0}")
-                print(f"Bot text preview: {row.bot_text[:50]}..." if row.bot_text else "None")
-                print(f"Bot audio path: {row.bot_audio_url}")
-                print("----- END DEBUG -----\n")
-            
-            print("Message saved successfully")
+            
+            context_store.record(conv_id, row)
+            _end_reply_stream(stream_id, user_id, row)
+            audio_pending = ASYNC_TTS and _schedule_bot_audio(
+                current_app._get_current_object(), user_id, row.id, bot_reply, stream_id
+            )
+            logger.info("Saved message %s (bot text: %d chars, bot audio: %s)",
+                        row.id, len(row.bot_text or ""), "pending" if audio_pending else row.bot_audio_url)
             
             # Return both the user message and bot response
             # Create the response with both messages and convert file paths to public URLs
-            timestamp = row.timestamp.isoformat()
-            response = []
-            
-            # Add user message
-            user_message = {
-                "_id": f"{row.id}-user",
-                "senderId": str(user_id),
-                "conversationId": str(row.conversation_id),
-                "text": row.text,
-                "audio": get_public_url(row.audio_url),
-                "imageUrl": get_public_url(row.image_url),
-                "createdAt": timestamp,
-            }
-            response.append(user_message)
+            response = [_user_payload(row, user_id)]
             
             # Add bot response if present
             if row.bot_text:
-                bot_message = {
-                    "_id": f"{row.id}-bot",
-                    "senderId": "bot",
-                    "conversationId": str(row.conversation_id),
-                    "text": row.bot_text,
-                    "audio": get_public_url(row.bot_audio_url),  # Include bot TTS audio
-                    "imageUrl": None,
-                    "createdAt": timestamp,
-                }
-                response.append(bot_message)
+                response.append(_bot_payload(row, audio_pending))
             
-            print(f"Response with public URLs: {response}")
-            print(f"Response status: 201 Created")
-            print(f"{'=' * 50}\n")
+            logger.debug("Response: %s", response)
             
             return jsonify(response), 201
             
         except Exception as e:
-            print(f"ERROR in direct_send_message: {str(e)}")
-            traceback.print_exc()
-            print(f"{'=' * 50}\n")
+            logger.exception("Error in direct_send_message")
+            _end_reply_stream(stream_id, user_id)
             return jsonify({"message": f"Server error: {str(e)}"}), 500
     
+    @app.route('/direct/messages/jobs/<job_id>', methods=['GET'])
+    def direct_message_job_status(job_id):
+        """Return the state of an async message job of the authenticated user."""
+        user_id, error = _bearer_user_id()
+        if error:
+            return error
+        job = job_runner.get(job_id)
+        # Other users' jobs are reported as missing, so job ids cannot be probed
+        if not job or job.get("userId") != str(user_id):
+            return jsonify({"message": "Job not found"}), 404
+        return jsonify(job), 200
+    
     @app.route('/direct/messages/<user_id>', methods=['GET'])
     def direct_get_messages(user_id):
         """Get messages for a user directly, bypassing Connexion.
@@ -461,20 +802,45 @@ def register_direct_routes(app):
         This version correctly handles the database schema where each row
         contains both a user message and bot response, returning them as
         separate message objects. Also includes ratings for messages.
+        
+        Query parameters (all optional, cursors are message row ids):
+            limit:  page size (newest rows unless a cursor is given)
+            before: rows older than this id, for scrolling back
+            after:  rows newer than this id, oldest first
+            since:  delta sync, every row newer than this id (up to the max page size)
+        
+        The response carries X-Has-More / X-Next-Before / X-Last-Id cursor
+        headers and a weak ETag; a matching If-None-Match gets a 304. In
+        after/since mode X-Last-Id stays below rows whose reply or audio is
+        still being produced, so they are sent again once complete (clients
+        upsert by message id).
         """
         try:
-            print(f"Direct route hit for getting messages, user_id: {user_id}")
+            if sampled("get_messages"):
+                logger.info("GET /direct/messages/%s %s", user_id, dict(request.args))
+            
+            page, error = _parse_page_args(request.args)
+            if error:
+                return jsonify({"message": error}), 400
             
             with engine.connect() as conn:
                 conv = conn.execute(
                     select(conversations.c.id).where(conversations.c.user_id == user_id)
                 ).first()
                 if not conv:
-                    print("No conversation found for user")
+                    logger.debug("No conversation found for user %s", user_id)
                     return jsonify([]), 200
                 
+                # Validate before the page query, so a 304 also saves the query
+                state = _conversation_state(conn, conv.id)
+                etag = _page_etag(state, page)
+                if request.if_none_match.contains_weak(etag):
+                    response = current_app.response_class(status=304)
+                    response.set_etag(etag, weak=True)
+                    return response
+                
                 # Get messages with their ratings
-                rows = conn.execute(
+                query = (
                     select(
                         messages,
                         ratings.c.rating
@@ -482,75 +848,71 @@ def register_direct_routes(app):
                     .select_from(messages)
                     .outerjoin(ratings, ratings.c.message_id == messages.c.id)
                     .where(messages.c.conversation_id == conv.id)
-                    .order_by(messages.c.id)
-                ).fetchall()
-            
-            # Debug file paths from database
-            for idx, row in enumerate(rows):
-                print(f"\nDebugging file paths for message {idx + 1}:")
-                if row.audio_url:
-                    debug_file_path(row.audio_url, "Database Audio")
-                if row.image_url:
-                    debug_file_path(row.image_url, "Database Image")
-                if row.bot_audio_url:
-                    debug_file_path(row.bot_audio_url, "Database Bot Audio")
+                )
+                if page["after"] is not None:
+                    query = query.where(messages.c.id > page["after"]).order_by(messages.c.id)
+                else:
+                    if page["before"] is not None:
+                        query = query.where(messages.c.id < page["before"])
+                    query = query.order_by(messages.c.id.desc())
+                if page["limit"]:
+                    # One extra row tells us whether there is more
+                    query = query.limit(page["limit"] + 1)
+                rows = conn.execute(query).fetchall()
+            
+            has_more = bool(page["limit"]) and len(rows) > page["limit"]
+            if has_more:
+                rows = rows[:page["limit"]]
+            if page["after"] is None:
+                rows = rows[::-1]  # fetched newest first, return oldest first
+            
+            # Debug file paths from database (filesystem probing, debug mode only)
+            if logger.isEnabledFor(logging.DEBUG):
+                for row in rows:
+                    if row.audio_url:
+                        debug_file_path(row.audio_url, f"Message {row.id} audio")
+                    if row.image_url:
+                        debug_file_path(row.image_url, f"Message {row.id} image")
+                    if row.bot_audio_url:
+                        debug_file_path(row.bot_audio_url, f"Message {row.id} bot audio")
             
             # Convert rows to message objects, splitting each row into user message and bot response
             result = []
             for row in rows:
                 # Add user message if there's any user content
                 if row.text or row.audio_url or row.image_url:
-                    user_message = {
-                        "_id": f"{row.id}-user",
-                        "senderId": str(user_id),
-                        "conversationId": str(row.conversation_id),
-                        "text": row.text,
-                        "audio": get_public_url(row.audio_url),
-                        "imageUrl": get_public_url(row.image_url),
-                        "createdAt": row.timestamp.isoformat(),
-                    }
-                    result.append(user_message)
+                    result.append(_user_payload(row, user_id))
                 
                 # Add bot response if present
                 if row.bot_text:
-                    bot_message = {
-                        "_id": f"{row.id}-bot",
-                        "senderId": "bot",
-                        "conversationId": str(row.conversation_id),
-                        "text": row.bot_text,
-                        "audio": get_public_url(row.bot_audio_url),  # Include bot TTS audio
-                        "imageUrl": None,
-                        "createdAt": row.timestamp.isoformat(),
-                        "rating": row.rating  # Include rating if present
-                    }
+                    bot_message = _bot_payload(row)
+                    bot_message["rating"] = row.rating  # Include rating if present
                     result.append(bot_message)
             
-            print(f"Found {len(result)} messages (including bot responses)")
-            
-            # Debug log for media URLs
-            for idx, msg in enumerate(result):
-                audio_url = msg.get('audio')
-                image_url = msg.get('imageUrl')
-                if audio_url or image_url:
-                    print(f"Message {idx + 1} media:")
-                    if audio_url:
-                        print(f"  - Audio URL: {audio_url}")
-                    if image_url:
-                        print(f"  - Image URL: {image_url}")
-            
-            return jsonify(result), 200
+            logger.debug("Found %d messages (including bot responses)", len(result))
+            
+            response = jsonify(result)
+            response.headers["X-Has-More"] = "true" if has_more else "false"
+            if page["after"] is not None:
+                last_id = _sync_cursor(rows, page, has_more, state["pendingFrom"])
+                if last_id is not None:
+                    response.headers["X-Last-Id"] = str(last_id)
+            elif rows:
+                response.headers["X-Last-Id"] = str(rows[-1].id)
+                if has_more:
+                    response.headers["X-Next-Before"] = str(rows[0].id)
+            response.set_etag(etag, weak=True)
+            return response
             
         except Exception as e:
-            print(f"Error in direct_get_messages: {str(e)}")
-            traceback.print_exc()
+            logger.exception("Error in direct_get_messages")
             return jsonify({"message": f"Server error: {str(e)}"}), 500
     
     @app.route('/direct/messages/rate/<message_id>', methods=['POST'])
     def direct_rate_message(message_id):
         """Handle rating submission for a message."""
         try:
-            print(f"\n{'=' * 50}")
-            print(f"DIRECT ROUTE HIT: POST /direct/messages/rate/{message_id}")
+            logger.info("POST /direct/messages/rate/%s", message_id)
             
             data = request.get_json()
             if not data:
@@ -565,7 +927,7 @@ def register_direct_routes(app):
             if rating < 1 or rating > 5:
                 return jsonify({"message": "Rating must be between 1 and 5"}), 400
             
-            print(f"Rating value: {rating}")
+            logger.debug("Rating value: %s", rating)
             
             # Get authentication from header
             auth_header = request.headers.get("Authorization", "")
@@ -606,7 +968,7 @@ def register_direct_routes(app):
                         .where(ratings.c.id == existing_rating.id)
                         .values(rating=rating)
                     )
-                    print(f"Updated existing rating for message {message_id}")
+                    logger.debug("Updated existing rating for message %s", message_id)
                 else:
                     # Insert new rating
                     conn.execute(
@@ -615,28 +977,23 @@ def register_direct_routes(app):
                             rating=rating
                         )
                     )
-                    print(f"Created new rating for message {message_id}")
-            
-            print(f"Rating submitted successfully")
-            print(f"{'=' * 50}\n")
+                    logger.debug("Created new rating for message %s", message_id)
             
             return jsonify({"message": "Rating submitted successfully", "rating": rating}), 201
             
         except Exception as e:
-            print(f"ERROR in direct_rate_message: {str(e)}")
-            traceback.print_exc()
-            print(f"{'=' * 50}\n")
+            logger.exception("Error in direct_rate_message")
             return jsonify({"message": f"Server error: {str(e)}"}), 500
     
     @app.route('/direct/messages/test/<user_id>', methods=['POST'])
     def direct_test_message(user_id):
         """Test endpoint that always returns a fixed response."""
         try:
-            print(f"Test endpoint hit for user_id: {user_id}")
+            logger.info("POST /direct/messages/test/%s", user_id)
             
             # Get message content
             user_text = request.form.get("text", "").strip() or None
-            print(f"User text: {user_text}")
+            logger.debug("User text: %s", user_text)
             
             # Check user exists
             with engine.begin() as conn:
@@ -671,13 +1028,9 @@ def register_direct_routes(app):
                     select(messages).where(messages.c.id == message_id)
                 ).first()
                 
-                # Print debug info
-                print("\n----- TEST ENDPOINT DEBUG -----")
-                print(f"Message ID: {row.id}")
-                print(f"User text: {row.text}")
-                print(f"Bot text: {row.bot_text}")
-                print(f"Timestamp: {row.timestamp}")
-                print("----- END DEBUG -----\n")
+                logger.debug("Test message %s saved at %s", row.id, row.timestamp)
+            
+            context_store.record(conv_id, row)
             
             # Return both the user message and the bot response
             timestamp = row.timestamp.isoformat()
@@ -704,12 +1057,11 @@ def register_direct_routes(app):
                 }
             ]
             
-            print(f"Returning response: {response}")
+            logger.debug("Returning response: %s", response)
             return jsonify(response), 201
             
         except Exception as e:
-            print(f"Error in test endpoint: {str(e)}")
-            traceback.print_exc()
+            logger.exception("Error in test endpoint")
             return jsonify({"message": f"Server error: {str(e)}"}), 500
     
     # Add a route to test direct file access
@@ -720,7 +1072,7 @@ def register_direct_routes(app):
             upload_dir = os.getenv("UPLOAD_DIR", "/tmp/uploads")
             file_path = os.path.join(upload_dir, filename)
             
-            print(f"Testing direct file access: {file_path}")
+            logger.debug("Testing direct file access: %s", file_path)
             debug_file_path(file_path, "Test File")
             
             # Detect content type based on file extension
@@ -742,8 +1094,7 @@ def register_direct_routes(app):
             else:
                 return jsonify({"message": f"File {filename} not found"}), 404
         except Exception as e:
-            print(f"Error in direct_test_file: {str(e)}")
-            traceback.print_exc()
+            logger.exception("Error in direct_test_file")
             return jsonify({"message": f"Server error: {str(e)}"}), 500
 
     # Add a route to serve TTS files specifically
@@ -754,7 +1105,7 @@ def register_direct_routes(app):
             tts_dir = AUDIO_DIR / "tts"
             file_path = tts_dir / filename
             
-            print(f"Serving TTS file: {file_path}")
+            logger.debug("Serving TTS file: %s", file_path)
             debug_file_path(file_path, "TTS File")
             
             if file_path.exists():
@@ -763,12 +1114,11 @@ def register_direct_routes(app):
                 response.headers['Cache-Control'] = 'public, max-age=3600'  # Cache for 1 hour
                 return response
             else:
-                print(f"TTS file not found: {file_path}")
+                logger.info("TTS file not found: %s", file_path)
                 return jsonify({"message": f"TTS file {filename} not found"}), 404
                 
         except Exception as e:
-            print(f"Error serving TTS file: {str(e)}")
-            traceback.print_exc()
+            logger.exception("Error serving TTS file")
             return jsonify({"message": f"Server error: {str(e)}"}), 500
 
     # Add TTS status endpoint
@@ -785,14 +1135,16 @@ def register_direct_routes(app):
                 "tts_enabled": tts_enabled,
                 "quota_available": quota_available,
                 "status": "available" if (tts_enabled and quota_available) else "unavailable",
-                "reason": "disabled" if not tts_enabled else ("quota_exceeded" if not quota_available else "available")
+                "reason": "disabled" if not tts_enabled else ("quota_exceeded" if not quota_available else "available"),
+                "cache": tts_cache.stats(),
+                "sentenceCache": sentence_cache.stats(),
             }
             
-            print(f"TTS Status check: {status}")
+            logger.debug("TTS status check: %s", status)
             return jsonify(status), 200
             
         except Exception as e:
-            print(f"Error checking TTS status: {str(e)}")
+            logger.warning("Error checking TTS status: %s", e)
             return jsonify({
                 "tts_enabled": False,
                 "quota_available": False,
@@ -800,6 +1152,43 @@ def register_direct_routes(app):
                 "reason": "service_error"
             }), 500
     
+    @app.route('/direct/tts/stream', methods=['GET', 'POST'])
+    def direct_tts_stream():
+        """
+        Synthesize text as a chunked WAV stream, one sentence at a time.
+        
+        The first sentence is synthesized before the response starts, so a
+        synthesis failure is answered with a 500 instead of an empty stream.
+        """
+        user_id, error = _bearer_user_id()
+        if error:
+            return error
+        payload = request.get_json(silent=True) or {}
+        text = (payload.get("text") or request.values.get("text") or "").strip()
+        if not text:
+            return jsonify({"message": "Provide the text to synthesize."}), 400
+        if len(text) > TTS_STREAM_MAX_CHARS:
+            return jsonify({"message": f"Text is longer than {TTS_STREAM_MAX_CHARS} characters."}), 413
+        if not is_tts_enabled():
+            return jsonify({"message": "TTS is disabled"}), 503
+        logger.debug("Streaming TTS for user %s, %d chars", user_id, len(text))
+        chunks = stream_tts_wav(text)
+        # Header and first sentence; nothing means synthesis failed
+        first = list(itertools.islice(chunks, 2))
+        if not first:
+            return jsonify({"message": "TTS synthesis failed"}), 500
+        return Response(
+            stream_with_context(itertools.chain(first, chunks)),
+            mimetype="audio/wav",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+    
+    # SER monitoring: deadline hits, dropped work, queue depth
+    @app.route('/direct/ser/status', methods=['GET'])
+    def direct_ser_status():
+        """Speech emotion recognition counters (timeouts, dropped and late work)."""
+        return jsonify(ser_status()), 200
+    
     # ---------------------------------------------------------------------------
     # Authentication routes
     # ---------------------------------------------------------------------------
@@ -808,13 +1197,11 @@ def register_direct_routes(app):
     def direct_auth_signup():
         """Handle user signup."""
         try:
-            print("Direct signup route hit")
+            logger.info("POST /direct/auth/signup")
             data = request.get_json()
             
             if not data:
                 return jsonify({"message": "No data provided"}), 400
-                
-            print(f"Signup data: {data}")
             
             username = data.get('username')
             email = data.get('email')
@@ -859,21 +1246,18 @@ def register_direct_routes(app):
             }), 201
             
         except Exception as e:
-            print(f"Error in direct_auth_signup: {str(e)}")
-            traceback.print_exc()
+            logger.exception("Error in direct_auth_signup")
             return jsonify({"message": f"Server error: {str(e)}"}), 500
     
     @app.route('/direct/auth/login', methods=['POST'])
     def direct_auth_login():
         """Handle user login."""
         try:
-            print("Direct login route hit")
+            logger.info("POST /direct/auth/login")
             data = request.get_json()
             
             if not data:
                 return jsonify({"message": "No data provided"}), 400
-                
-            print(f"Login data: {data}")
             
             email = data.get('email')
             password = data.get('password')
@@ -901,15 +1285,14 @@ def register_direct_routes(app):
             })
             
         except Exception as e:
-            print(f"Error in direct_auth_login: {str(e)}")
-            traceback.print_exc()
+            logger.exception("Error in direct_auth_login")
             return jsonify({"message": f"Server error: {str(e)}"}), 500
     
     @app.route('/direct/auth/check', methods=['GET'])
     def direct_auth_check():
         """Check authentication status."""
         try:
-            print("Direct auth check route hit")
+            logger.debug("GET /direct/auth/check")
             
             auth_header = request.headers.get("Authorization", "")
             if not auth_header.startswith("Bearer "):
@@ -939,8 +1322,7 @@ def register_direct_routes(app):
             })
             
         except Exception as e:
-            print(f"Error in direct_auth_check: {str(e)}")
-            traceback.print_exc()
+            logger.exception("Error in direct_auth_check")
             return jsonify({"message": f"Server error: {str(e)}"}), 500
     
     @app.route('/direct/auth/logout', methods=['POST'])
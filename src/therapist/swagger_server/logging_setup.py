@@ -0,0 +1,70 @@
+import os
+import sys
+import queue
+import atexit
+import logging
+import threading
+import logging.handlers
+from collections import defaultdict
+
+# ---------------------------------------------------------------------------
+# Config
+# ---------------------------------------------------------------------------
+# APP_DEBUG=1 restores the old verbose output: per-request dumps, file-path
+# probing, Socket.IO/engine.io traces and crewai agent chatter.
+DEBUG_ENABLED = os.getenv("APP_DEBUG", "0") == "1"
+LOG_LEVEL = os.getenv("LOG_LEVEL", "DEBUG" if DEBUG_ENABLED else "INFO").upper()
+LOG_SAMPLE_EVERY = int(os.getenv("LOG_SAMPLE_EVERY", "1" if DEBUG_ENABLED else "50"))
+LOG_FORMAT = "%(asctime)s %(levelname)s [%(threadName)s] %(name)s: %(message)s"
+
+_listener = None
+_configure_lock = threading.Lock()
+_sample_counts = defaultdict(int)
+_sample_lock = threading.Lock()
+
+
+def configure_logging() -> None:
+    """
+    Install the process-wide logging setup (idempotent).
+
+    Records are handed to a queue and written to stdout by a background
+    listener thread, so request threads never block on console I/O.
+    """
+    global _listener
+    with _configure_lock:
+        if _listener is not None:
+            return
+
+        log_queue = queue.SimpleQueue()
+        stream = logging.StreamHandler(sys.stdout)
+        stream.setFormatter(logging.Formatter(LOG_FORMAT))
+
+        root = logging.getLogger()
+        # Replace handlers installed by library-level basicConfig() calls
+        root.handlers[:] = [logging.handlers.QueueHandler(log_queue)]
+        root.setLevel(LOG_LEVEL)
+
+        if not DEBUG_ENABLED:
+            for noisy in ("werkzeug", "engineio", "socketio", "urllib3", "httpx", "LiteLLM"):
+                logging.getLogger(noisy).setLevel(logging.WARNING)
+
+        _listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(name)
+
+
+def sampled(key: str, every: int = LOG_SAMPLE_EVERY) -> bool:
+    """
+    Return True for the first and then every `every`-th call with `key`.
+    Use it to keep high-frequency log lines (polling, per-row details) cheap.
+    """
+    if every <= 1:
+        return True
+    with _sample_lock:
+        count = _sample_counts[key]
+        _sample_counts[key] = count + 1
+    return count % every == 0
@@ -0,0 +1,106 @@
+import os
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+from swagger_server.logging_setup import get_logger
+
+logger = get_logger(__name__)
+
+# ---------------------------------------------------------------------------
+# Config
+# ---------------------------------------------------------------------------
+MESSAGE_WORKERS = int(os.getenv("MESSAGE_WORKERS", "2"))
+MESSAGE_QUEUE_SIZE = int(os.getenv("MESSAGE_QUEUE_SIZE", "16"))
+MESSAGE_JOB_TTL = int(os.getenv("MESSAGE_JOB_TTL", "3600"))  # seconds a finished job stays queryable
+# Background TTS synthesis; kept small so SpeechT5 cannot starve the crews of CPU
+TTS_WORKERS = int(os.getenv("TTS_WORKERS", "1"))
+TTS_QUEUE_SIZE = int(os.getenv("TTS_QUEUE_SIZE", "32"))
+
+
+class JobQueueFull(RuntimeError):
+    """Raised when every worker is busy and the pending queue is full."""
+
+
+class MessageJobRunner:
+    """
+    Bounded worker pool for long-running message jobs (crew run, TTS, DB update).
+
+    At most `max_workers` jobs run at once and at most `max_pending` more may
+    wait; further submissions raise JobQueueFull instead of queueing unbounded.
+    Job state is kept in memory so clients can poll it by id.
+    """
+
+    def __init__(self, max_workers: int = MESSAGE_WORKERS, max_pending: int = MESSAGE_QUEUE_SIZE,
+                 name: str = "message-job"):
+        self.name = name
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._slots = threading.BoundedSemaphore(max_workers + max_pending)
+        self._jobs: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, fn: Callable, *args, **meta) -> str:
+        """Schedule `fn(*args)` and return the job id. `meta` is stored on the job record."""
+        if not self._slots.acquire(blocking=False):
+            raise JobQueueFull("Message queue is full, please retry later.")
+
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._prune()
+            self._jobs[job_id] = {
+                "jobId": job_id,
+                "status": "queued",
+                "createdAt": time.time(),
+                "finishedAt": None,
+                "error": None,
+                "result": None,
+                **meta,
+            }
+
+        try:
+            self._executor.submit(self._run, job_id, fn, args)
+        except Exception:
+            self._slots.release()
+            with self._lock:
+                self._jobs.pop(job_id, None)
+            raise
+        return job_id
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """Return a copy of the job record, or None if unknown/expired."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def _run(self, job_id: str, fn: Callable, args: tuple) -> None:
+        self._update(job_id, status="running")
+        try:
+            result = fn(*args)
+            self._update(job_id, status="done", result=result, finishedAt=time.time())
+        except Exception as e:
+            logger.exception("%s %s failed", self.name, job_id)
+            self._update(job_id, status="failed", error=str(e), finishedAt=time.time())
+        finally:
+            self._slots.release()
+
+    def _update(self, job_id: str, **fields) -> None:
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields)
+
+    def _prune(self) -> None:
+        """Drop finished jobs older than MESSAGE_JOB_TTL. Caller holds the lock."""
+        cutoff = time.time() - MESSAGE_JOB_TTL
+        expired = [
+            jid for jid, job in self._jobs.items()
+            if job["finishedAt"] is not None and job["finishedAt"] < cutoff
+        ]
+        for jid in expired:
+            del self._jobs[jid]
+
+
+# Process-wide runners used by the direct routes
+job_runner = MessageJobRunner()
+tts_runner = MessageJobRunner(max_workers=max(1, TTS_WORKERS), max_pending=TTS_QUEUE_SIZE, name="tts-job")
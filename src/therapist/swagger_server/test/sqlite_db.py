@@ -0,0 +1,39 @@
+# coding: utf-8
+
+"""
+Throwaway SQLite database for tests.
+
+`swagger_server.db` reflects its tables at import time, so tests that import
+modules depending on it call `use_sqlite_database()` first.
+"""
+
+import os
+import tempfile
+
+from sqlalchemy import create_engine
+
+SCHEMA = (
+    "CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, email TEXT, password TEXT)",
+    "CREATE TABLE conversations (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, "
+    "created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)",
+    "CREATE TABLE messages (id INTEGER PRIMARY KEY AUTOINCREMENT, conversation_id INTEGER, "
+    "content_type TEXT, text TEXT, image_url TEXT, audio_url TEXT, text_report TEXT, "
+    "image_report TEXT, audio_report TEXT, bot_text TEXT, bot_audio_url TEXT, "
+    "timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP)",
+    "CREATE TABLE ratings (id INTEGER PRIMARY KEY AUTOINCREMENT, message_id INTEGER, rating INTEGER)",
+)
+
+
+def use_sqlite_database():
+    """Point DATABASE_URL at a fresh SQLite file with the app's tables, unless one is set."""
+    if os.environ.get("DATABASE_URL"):
+        return
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    url = f"sqlite:///{path}"
+    engine = create_engine(url)
+    with engine.begin() as conn:
+        for statement in SCHEMA:
+            conn.exec_driver_sql(statement)
+    engine.dispose()
+    os.environ["DATABASE_URL"] = url
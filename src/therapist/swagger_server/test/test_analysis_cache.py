@@ -0,0 +1,90 @@
+# coding: utf-8
+
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from logic.tools.analysis_cache import AnalysisCache, audio_fingerprint
+
+
+class TestAnalysisCache(unittest.TestCase):
+    """Persistent cache of audio analysis results"""
+
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory, True)
+
+    def _cache(self, **kwargs):
+        kwargs.setdefault("max_entries", 100)
+        kwargs.setdefault("max_bytes", 1024 * 1024)
+        kwargs.setdefault("ttl_hours", 1)
+        kwargs.setdefault("enabled", True)
+        return AnalysisCache(directory=self.directory / "cache", **kwargs)
+
+    def _clip(self, data=b"RIFF....WAVE"):
+        path = self.directory / f"clip-{time.monotonic_ns()}.wav"
+        path.write_bytes(data)
+        return str(path)
+
+    def test_fingerprint_hashes_file_bytes(self):
+        self.assertEqual(audio_fingerprint(self._clip(b"abc")), audio_fingerprint(self._clip(b"abc")))
+        self.assertNotEqual(audio_fingerprint(self._clip(b"abc")), audio_fingerprint(self._clip(b"abd")))
+
+    def test_miss_then_hit(self):
+        cache = self._cache()
+        clip = self._clip()
+        calls = []
+        compute = lambda: calls.append(1) or "result"  # noqa: E731
+        self.assertEqual(cache.cached(clip, "emotion", {"model": "a"}, compute), "result")
+        self.assertEqual(cache.cached(clip, "emotion", {"model": "a"}, compute), "result")
+        self.assertEqual(len(calls), 1)
+
+    def test_params_are_part_of_the_key(self):
+        cache = self._cache()
+        clip = self._clip()
+        cache.put(cache.key_for(clip, "emotion", {"model": "a"}), "emotion", "old")
+        self.assertIsNone(cache.get(cache.key_for(clip, "emotion", {"model": "b"})))
+
+    def test_expired_entry_is_dropped(self):
+        cache = self._cache(ttl_hours=1)
+        cache.put("k", "emotion", "value")
+        path = cache.directory / "k.json"
+        with open(path) as f:
+            entry = json.load(f)
+        entry["created"] = time.time() - 2 * 3600
+        with open(path, "w") as f:
+            json.dump(entry, f)
+        self.assertIsNone(cache.get("k"))
+        self.assertFalse(path.exists())
+
+    def test_least_recently_used_evicted_over_entry_limit(self):
+        cache = self._cache(max_entries=3)
+        for key in ("a", "b", "c"):
+            cache.put(key, "emotion", key)
+            os.utime(cache.directory / f"{key}.json", (time.time() - 10, time.time() - 10))
+        cache.get("a")
+        cache.put("d", "emotion", "d")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), "a")
+        self.assertEqual(cache.get("d"), "d")
+
+    def test_evicted_over_size_limit(self):
+        cache = self._cache(max_bytes=300)
+        for i in range(5):
+            cache.put(str(i), "transcript", "x" * 100)
+        total = sum(p.stat().st_size for p in cache.directory.glob("*.json"))
+        self.assertLessEqual(total, 300)
+
+    def test_disabled_cache(self):
+        cache = self._cache(enabled=False)
+        self.assertIsNone(cache.key_for(self._clip(), "emotion", {}))
+        cache.put("k", "emotion", "value")
+        self.assertIsNone(cache.get("k"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+# coding: utf-8
+
+import io
+import shutil
+import struct
+import tempfile
+import unittest
+import wave
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+
+from logic.tools import audio_buffer
+from logic.tools.audio_buffer import SAMPLE_RATE, AudioBufferCache, audio_buffers
+from swagger_server.audio_converter import save_and_convert_audio
+
+
+class TestAudioBufferCache(unittest.TestCase):
+    """Decode-once sample cache shared by the audio tools"""
+
+    def setUp(self):
+        patcher = mock.patch.object(audio_buffer.librosa, "load",
+                                    return_value=(np.zeros(4, dtype=np.float32), SAMPLE_RATE))
+        self.decode = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_registered_samples_are_not_decoded_again(self):
+        cache = AudioBufferCache()
+        samples = np.ones(4, dtype=np.float32)
+        cache.put("clip.wav", samples)
+        self.assertIs(cache.load("clip.wav"), samples)
+        self.decode.assert_not_called()
+
+    def test_shared_samples_are_read_only(self):
+        cache = AudioBufferCache()
+        cache.put("clip.wav", np.ones(4, dtype=np.float32))
+        with self.assertRaises(ValueError):
+            cache.load("clip.wav")[0] = 0.0
+
+    def test_miss_is_decoded_once(self):
+        cache = AudioBufferCache()
+        cache.load("clip.wav")
+        cache.load("clip.wav")
+        self.decode.assert_called_once_with("clip.wav", sr=SAMPLE_RATE, mono=True)
+
+    def test_release_and_lru_eviction(self):
+        cache = AudioBufferCache(max_items=1)
+        cache.put("a.wav", np.ones(4, dtype=np.float32))
+        cache.put("b.wav", np.ones(4, dtype=np.float32))
+        cache.load("a.wav")
+        self.assertEqual(self.decode.call_count, 1)
+        cache.release("a.wav")
+        cache.load("a.wav")
+        self.assertEqual(self.decode.call_count, 2)
+
+    def test_expired_samples_are_decoded_again(self):
+        cache = AudioBufferCache(ttl=-1)
+        cache.put("clip.wav", np.ones(4, dtype=np.float32))
+        cache.load("clip.wav")
+        self.decode.assert_called_once()
+
+
+class TestNormalizedUpload(unittest.TestCase):
+    """A 16 kHz mono PCM upload is stored as is and registered once"""
+
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory, True)
+
+    def test_samples_are_registered_under_the_stored_path(self):
+        buf = io.BytesIO()
+        with wave.open(buf, "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(SAMPLE_RATE)
+            wav.writeframes(struct.pack("<4h", 0, 16384, -16384, 0))
+        storage = SimpleNamespace(stream=io.BytesIO(buf.getvalue()), filename="note.wav")
+
+        path = save_and_convert_audio(storage, self.directory)
+        self.addCleanup(audio_buffers.release, path)
+
+        self.assertEqual(Path(path).read_bytes(), buf.getvalue())
+        with mock.patch.object(audio_buffer.librosa, "load") as decode:
+            samples = audio_buffers.load(path)
+        decode.assert_not_called()
+        np.testing.assert_allclose(samples, [0.0, 0.5, -0.5, 0.0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+# coding: utf-8
+
+import unittest
+
+from sqlalchemy import select
+
+from swagger_server.test.sqlite_db import use_sqlite_database
+
+use_sqlite_database()
+
+from swagger_server.conversation_context import ConversationContextStore  # noqa: E402
+from swagger_server.db import engine, messages  # noqa: E402
+
+
+class TestConversationContextStore(unittest.TestCase):
+    """Incremental conversation history kept by ConversationContextStore"""
+
+    def setUp(self):
+        self.store = ConversationContextStore()
+        with engine.begin() as conn:
+            conn.execute(messages.delete())
+
+    def _insert(self, conv_id, text, bot_text=None):
+        with engine.begin() as conn:
+            ins = conn.execute(messages.insert().values(conversation_id=conv_id, text=text, bot_text=bot_text))
+            return conn.execute(select(messages).where(messages.c.id == ins.inserted_primary_key[0])).first()
+
+    def _turns(self, conv_id):
+        with engine.connect() as conn:
+            return self.store.get_turns(conn, conv_id)
+
+    def test_first_read_loads_conversation(self):
+        self._insert(1, "hello", "hi there")
+        self._insert(1, "how are you")
+        self._insert(2, "other conversation")
+        self.assertEqual(self._turns(1), ["user: hello", "therapist: hi there", "user: how are you"])
+
+    def test_record_appends_new_row(self):
+        self._insert(1, "first")
+        self._turns(1)
+        self.store.record(1, self._insert(1, "second"))
+        self.assertEqual(self._turns(1), ["user: first", "user: second"])
+
+    def test_record_keeps_rows_of_other_workers_in_order(self):
+        self._insert(1, "first")
+        self._turns(1)
+        # Inserted by another worker, never recorded in this process
+        self._insert(1, "second")
+        self.store.record(1, self._insert(1, "third"))
+        self.assertEqual(self._turns(1), ["user: first", "user: second", "user: third"])
+
+    def test_record_replaces_updated_last_row(self):
+        row = self._insert(1, "question")
+        self._turns(1)
+        with engine.begin() as conn:
+            conn.execute(messages.update().where(messages.c.id == row.id).values(bot_text="answer"))
+            row = conn.execute(select(messages).where(messages.c.id == row.id)).first()
+        self.store.record(1, row)
+        self.assertEqual(self._turns(1), ["user: question", "therapist: answer"])
+
+    def test_update_of_older_row_reloads(self):
+        row = self._insert(1, "first")
+        self._insert(1, "second")
+        self._turns(1)
+        with engine.begin() as conn:
+            conn.execute(messages.update().where(messages.c.id == row.id).values(bot_text="late reply"))
+            row = conn.execute(select(messages).where(messages.c.id == row.id)).first()
+        self.store.record(1, row)
+        self.assertEqual(self._turns(1), ["user: first", "therapist: late reply", "user: second"])
+
+    def test_reply_written_by_other_worker_is_picked_up(self):
+        self._insert(1, "first", "reply")
+        row = self._insert(1, "second")
+        self._turns(1)
+        # Answered by another worker, never recorded in this process
+        with engine.begin() as conn:
+            conn.execute(messages.update().where(messages.c.id == row.id).values(bot_text="late reply"))
+        self.assertEqual(self._turns(1), ["user: first", "therapist: reply", "user: second", "therapist: late reply"])
+
+    def test_older_reply_written_by_other_worker_reloads(self):
+        row = self._insert(1, "first")
+        self._insert(1, "second", "answer")
+        self._turns(1)
+        with engine.begin() as conn:
+            conn.execute(messages.update().where(messages.c.id == row.id).values(bot_text="late reply"))
+        self.assertEqual(self._turns(1), ["user: first", "therapist: late reply", "user: second", "therapist: answer"])
+
+    def test_record_ignores_uncached_conversation(self):
+        self.store.record(1, self._insert(1, "first"))
+        self.assertEqual(self._turns(1), ["user: first"])
+
+
+if __name__ == '__main__':
+    unittest.main()
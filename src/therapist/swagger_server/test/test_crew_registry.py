@@ -0,0 +1,82 @@
+# coding: utf-8
+
+import unittest
+from unittest import mock
+
+from logic import crew_registry
+from logic.crew_registry import MODALITY_COMBINATIONS, CrewRegistry
+
+
+class _FakeTherapist:
+    """Records what the registry does with a crew instead of building agents."""
+
+    def __init__(self, text_provided=False, image_provided=False, audio_provided=False, stream=False):
+        self.inputs = (text_provided, image_provided, audio_provided, stream)
+        self.resets = 0
+        self.prebuilt = False
+        self.fail_reset = False
+
+    def prebuild(self):
+        self.prebuilt = True
+
+    def reset(self):
+        if self.fail_reset:
+            raise RuntimeError("cannot reset")
+        self.resets += 1
+
+
+class TestCrewRegistry(unittest.TestCase):
+    """Check-out/check-in of pre-built crews"""
+
+    def setUp(self):
+        patcher = mock.patch.object(crew_registry, "Therapist", _FakeTherapist)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.registry = CrewRegistry(pool_size=2)
+
+    def test_released_crew_is_reset_and_reused(self):
+        therapist = self.registry.acquire(text_provided=True)
+        self.registry.release(therapist)
+        self.assertEqual(therapist.resets, 1)
+        self.assertIs(self.registry.acquire(text_provided=True), therapist)
+
+    def test_combinations_get_their_own_crews(self):
+        therapist = self.registry.acquire(text_provided=True)
+        self.registry.release(therapist)
+        other = self.registry.acquire(text_provided=True, audio_provided=True)
+        self.assertIsNot(other, therapist)
+        self.assertEqual(other.inputs, (True, False, True, False))
+        self.assertIsNot(self.registry.acquire(text_provided=True, stream=True), therapist)
+
+    def test_concurrent_requests_never_share_a_crew(self):
+        first = self.registry.acquire(image_provided=True)
+        second = self.registry.acquire(image_provided=True)
+        self.assertIsNot(first, second)
+
+    def test_unusable_crews_are_dropped(self):
+        therapist = self.registry.acquire(text_provided=True)
+        self.registry.release(therapist, reusable=False)
+        self.assertEqual(therapist.resets, 0)
+        self.assertIsNot(self.registry.acquire(text_provided=True), therapist)
+
+        broken = self.registry.acquire(text_provided=True)
+        broken.fail_reset = True
+        self.registry.release(broken)
+        self.assertIsNot(self.registry.acquire(text_provided=True), broken)
+
+    def test_idle_pool_is_bounded(self):
+        crews = [self.registry.acquire(audio_provided=True) for _ in range(3)]
+        for therapist in crews:
+            self.registry.release(therapist)
+        reused = {id(self.registry.acquire(audio_provided=True)) for _ in range(3)}
+        self.assertEqual(len(reused & {id(therapist) for therapist in crews}), 2)
+
+    def test_warm_up_prebuilds_every_combination(self):
+        self.registry.warm_up()
+        for text, image, audio in MODALITY_COMBINATIONS:
+            therapist = self.registry.acquire(text_provided=text, image_provided=image, audio_provided=audio)
+            self.assertTrue(therapist.prebuilt)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+# coding: utf-8
+
+from __future__ import absolute_import
+
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from logic import history
+from logic.history import HistoryManager, chunk_turns, estimate_tokens
+
+
+class TestHistoryManager(unittest.TestCase):
+    """HistoryManager windowing and rolling summary tests"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.calls = []
+        patcher = mock.patch.object(history, "_summarize", side_effect=self._fake_summarize)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(shutil.rmtree, self.directory, True)
+
+    def _fake_summarize(self, previous, new_turns):
+        self.calls.append(list(new_turns))
+        return (previous + " " if previous else "") + "+".join(new_turns)
+
+    def _manager(self, **kwargs):
+        kwargs.setdefault("token_budget", 1000)
+        kwargs.setdefault("max_turns", 2)
+        kwargs.setdefault("directory", self.directory)
+        return HistoryManager(**kwargs)
+
+    @staticmethod
+    def _drain(manager):
+        # The summary worker is single-threaded, so this waits for queued updates
+        manager._executor.submit(lambda: None).result()
+
+    def test_short_history_is_verbatim(self):
+        manager = self._manager()
+        self.assertEqual(manager.render(1, ["a", "b"]), "a\nb")
+        self.assertEqual(self.calls, [])
+
+    def test_window_respects_token_budget(self):
+        manager = self._manager(max_turns=10, token_budget=estimate_tokens("x" * 40) * 2)
+        turns = ["x" * 40] * 5
+        self.assertEqual(manager._window_start(turns), 3)
+
+    def test_newest_turn_kept_over_budget(self):
+        manager = self._manager(token_budget=1)
+        self.assertEqual(manager._window_start(["a", "b" * 100]), 1)
+
+    def test_pending_turns_stay_in_prompt(self):
+        manager = self._manager()
+        with mock.patch.object(manager._executor, "submit"):
+            rendered = manager.render(1, ["a", "b", "c", "d"])
+        self.assertEqual(rendered, "a\nb\nc\nd")
+
+    def test_summary_replaces_covered_turns(self):
+        manager = self._manager()
+        manager.render(1, ["a", "b", "c", "d"])
+        self._drain(manager)
+        rendered = manager.render(1, ["a", "b", "c", "d"])
+        self.assertEqual(rendered, "Summary of earlier conversation:\na+b\n\nRecent conversation:\nc\nd")
+
+    def test_summary_is_built_in_bounded_chunks(self):
+        turn = "x" * 40
+        manager = self._manager(chunk_tokens=estimate_tokens(turn) * 2)
+        manager.render(1, [turn] * 7)
+        self._drain(manager)
+        self.assertEqual([len(chunk) for chunk in self.calls], [2, 2, 1])
+
+    def test_summary_survives_restart(self):
+        manager = self._manager()
+        manager.render(1, ["a", "b", "c", "d"])
+        self._drain(manager)
+        restarted = self._manager()
+        self.assertEqual(restarted.summary(1), None)
+        restarted.render(1, ["a", "b", "c", "d"])
+        self.assertEqual(restarted.summary(1), "a+b")
+        self.assertEqual(len(self.calls), 1)
+
+    def test_oversized_turn_is_cut(self):
+        chunks = chunk_turns(["x" * 100], 5)
+        self.assertLessEqual(estimate_tokens(chunks[0][0]), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
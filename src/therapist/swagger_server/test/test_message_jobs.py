@@ -0,0 +1,97 @@
+# coding: utf-8
+
+import threading
+import time
+import unittest
+
+from flask import Flask
+
+from swagger_server.test.sqlite_db import use_sqlite_database
+
+use_sqlite_database()
+
+from swagger_server.direct_routes import _generate_token, register_direct_routes  # noqa: E402
+from swagger_server.message_jobs import JobQueueFull, MessageJobRunner, job_runner  # noqa: E402
+
+
+def _wait_finished(runner, job_id, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = runner.get(job_id)
+        if job["finishedAt"] is not None:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+class TestMessageJobRunner(unittest.TestCase):
+    """Bounded worker pool of async message jobs"""
+
+    def test_result_and_meta_are_recorded(self):
+        runner = MessageJobRunner(max_workers=1, max_pending=1)
+        job_id = runner.submit(lambda a, b: a + b, 2, 3, userId="7")
+        job = _wait_finished(runner, job_id)
+        self.assertEqual(job["status"], "done")
+        self.assertEqual(job["result"], 5)
+        self.assertEqual(job["userId"], "7")
+
+    def test_failure_is_recorded(self):
+        def fail():
+            raise ValueError("boom")
+        runner = MessageJobRunner(max_workers=1, max_pending=1)
+        job = _wait_finished(runner, runner.submit(fail))
+        self.assertEqual(job["status"], "failed")
+        self.assertEqual(job["error"], "boom")
+
+    def test_full_queue_rejects_and_frees_slots(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+        runner = MessageJobRunner(max_workers=1, max_pending=0)
+        job_id = runner.submit(release.wait, 5)
+        with self.assertRaises(JobQueueFull):
+            runner.submit(lambda: None)
+        release.set()
+        _wait_finished(runner, job_id)
+        _wait_finished(runner, runner.submit(lambda: None))
+
+    def test_unknown_job(self):
+        self.assertIsNone(MessageJobRunner(max_workers=1).get("missing"))
+
+
+class TestJobStatusRoute(unittest.TestCase):
+    """GET /direct/messages/jobs/<job_id> only shows the caller's jobs"""
+
+    @classmethod
+    def setUpClass(cls):
+        app = Flask(__name__)
+        register_direct_routes(app)
+        cls.client = app.test_client()
+
+    def setUp(self):
+        self.job_id = job_runner.submit(lambda: "reply", userId="1", messageId=10)
+        _wait_finished(job_runner, self.job_id)
+
+    def _status(self, user_id=None):
+        headers = {"Authorization": f"Bearer {_generate_token(user_id)}"} if user_id is not None else {}
+        return self.client.get(f"/direct/messages/jobs/{self.job_id}", headers=headers)
+
+    def test_requires_a_token(self):
+        self.assertEqual(self._status().status_code, 401)
+
+    def test_rejects_an_invalid_token(self):
+        response = self.client.get(f"/direct/messages/jobs/{self.job_id}",
+                                   headers={"Authorization": "Bearer not-a-token"})
+        self.assertEqual(response.status_code, 401)
+
+    def test_owner_sees_the_job(self):
+        response = self._status(1)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()["jobId"], self.job_id)
+        self.assertEqual(response.get_json()["status"], "done")
+
+    def test_other_users_get_not_found(self):
+        self.assertEqual(self._status(2).status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+# coding: utf-8
+
+import unittest
+from collections import namedtuple
+
+from swagger_server.test.sqlite_db import use_sqlite_database
+
+use_sqlite_database()
+
+from swagger_server import direct_routes  # noqa: E402
+from swagger_server.direct_routes import _page_etag, _parse_page_args, _sync_cursor  # noqa: E402
+
+Row = namedtuple("Row", "id")
+
+
+class TestParsePageArgs(unittest.TestCase):
+    """Query args of GET /direct/messages/<user_id>"""
+
+    def test_defaults(self):
+        page, error = _parse_page_args({})
+        self.assertIsNone(error)
+        self.assertEqual(page["limit"], direct_routes.MESSAGES_DEFAULT_LIMIT)
+        self.assertIsNone(page["after"])
+        self.assertIsNone(page["before"])
+
+    def test_since_is_folded_into_after_with_max_page(self):
+        page, error = _parse_page_args({"since": "42"})
+        self.assertIsNone(error)
+        self.assertEqual(page["after"], 42)
+        self.assertEqual(page["limit"], direct_routes.MESSAGES_MAX_LIMIT)
+
+    def test_limit_is_clamped(self):
+        page, _ = _parse_page_args({"limit": str(direct_routes.MESSAGES_MAX_LIMIT + 50)})
+        self.assertEqual(page["limit"], direct_routes.MESSAGES_MAX_LIMIT)
+
+    def test_invalid_args(self):
+        for args in ({"limit": "x"}, {"limit": "0"}, {"before": "-1"},
+                     {"since": "1", "after": "2"}, {"since": "1", "before": "2"},
+                     {"after": "1", "before": "2"}):
+            with self.subTest(args=args):
+                page, error = _parse_page_args(args)
+                self.assertIsNone(page)
+                self.assertTrue(error)
+
+
+class TestSyncCursor(unittest.TestCase):
+    """X-Last-Id in after/since mode"""
+
+    def setUp(self):
+        self.page, _ = _parse_page_args({"since": "10"})
+
+    def test_advances_to_the_last_row(self):
+        self.assertEqual(_sync_cursor([Row(11), Row(12)], self.page, False, None), 12)
+
+    def test_stays_below_a_pending_row(self):
+        self.assertEqual(_sync_cursor([Row(11), Row(12)], self.page, False, 12), 11)
+
+    def test_resends_a_pending_row_the_client_already_has(self):
+        self.assertEqual(_sync_cursor([], self.page, False, 8), 7)
+
+    def test_keeps_the_cursor_without_rows(self):
+        self.assertEqual(_sync_cursor([], self.page, False, None), 10)
+
+    def test_mid_pagination_always_advances(self):
+        self.assertEqual(_sync_cursor([Row(11), Row(12)], self.page, True, 11), 12)
+
+
+class TestPageEtag(unittest.TestCase):
+    """Validator built from the conversation state"""
+
+    state = {"maxId": 12, "rows": 12, "replies": 11, "audio": 10, "ratings": 1,
+             "ratingSum": 5, "pendingFrom": 12}
+
+    def test_stable_for_the_same_state(self):
+        page, _ = _parse_page_args({"limit": "20"})
+        self.assertEqual(_page_etag(dict(self.state), page), _page_etag(dict(self.state), page))
+
+    def test_changes_when_a_reply_or_audio_is_filled_in(self):
+        page, _ = _parse_page_args({"limit": "20"})
+        base = _page_etag(self.state, page)
+        self.assertNotEqual(base, _page_etag(dict(self.state, replies=12), page))
+        self.assertNotEqual(base, _page_etag(dict(self.state, audio=11), page))
+        self.assertNotEqual(base, _page_etag(dict(self.state, ratingSum=4), page))
+
+    def test_changes_with_the_page(self):
+        first, _ = _parse_page_args({"limit": "20"})
+        older, _ = _parse_page_args({"limit": "20", "before": "5"})
+        self.assertNotEqual(_page_etag(self.state, first), _page_etag(self.state, older))
+
+
+if __name__ == '__main__':
+    unittest.main()
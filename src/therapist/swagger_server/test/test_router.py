@@ -0,0 +1,39 @@
+# coding: utf-8
+
+import unittest
+
+from logic.router import is_small_talk
+
+
+class TestSmallTalkRouter(unittest.TestCase):
+    """Fast-path classification of text-only messages"""
+
+    def test_greetings_and_thanks_are_small_talk(self):
+        for text in ("hi", "Hello!", "hey there :)", "Thanks a lot!", "thank you 🙏",
+                     "Good morning", "hi, how are you?", "ok, bye!", "  thx  "):
+            with self.subTest(text=text):
+                self.assertTrue(is_small_talk(text))
+
+    def test_distress_after_a_greeting_is_not_small_talk(self):
+        for text in ("Hello, I want to end my life",
+                     "thanks, I cut myself again",
+                     "Hi, my mom passed away",
+                     "Hey I feel really down",
+                     "hey i got fired today"):
+            with self.subTest(text=text):
+                self.assertFalse(is_small_talk(text))
+
+    def test_anything_beyond_a_pleasantry_is_not_small_talk(self):
+        for text in ("hi, can we talk about my week", "hello I have a question",
+                     "thanks for yesterday", "ok so"):
+            with self.subTest(text=text):
+                self.assertFalse(is_small_talk(text))
+
+    def test_empty_and_long_messages_are_not_small_talk(self):
+        self.assertFalse(is_small_talk(""))
+        self.assertFalse(is_small_talk(None))
+        self.assertFalse(is_small_talk("hi " * 20))
+
+
+if __name__ == '__main__':
+    unittest.main()
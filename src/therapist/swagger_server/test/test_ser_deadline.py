@@ -0,0 +1,148 @@
+# coding: utf-8
+
+import json
+import threading
+import unittest
+from unittest import mock
+
+import torch
+
+from logic.tools import audio_engine, ser_tool
+from logic.tools.ser_tool import (
+    SERBatcher, SERTool, default_distribution, run_with_deadline, ser_batcher, ser_stats,
+)
+
+
+class TestRunWithDeadline(unittest.TestCase):
+    """Deadline enforcement and counters of SER calls"""
+
+    def setUp(self):
+        self.before = ser_stats.snapshot()
+
+    def _delta(self, name):
+        return ser_stats.snapshot()[name] - self.before[name]
+
+    def _finish(self, future_done, release):
+        release.set()
+        self.assertTrue(future_done.wait(5))
+
+    def test_result_within_deadline(self):
+        self.assertEqual(run_with_deadline(lambda: "ok", 5), "ok")
+        self.assertEqual(self._delta("requests"), 1)
+        self.assertEqual(self._delta("completed"), 1)
+
+    def test_error_returns_neutral_distribution(self):
+        def fail():
+            raise ValueError("boom")
+        self.assertEqual(json.loads(run_with_deadline(fail, 5)), default_distribution())
+        self.assertEqual(self._delta("errors"), 1)
+
+    def test_timeout_then_late_finish(self):
+        release, done = threading.Event(), threading.Event()
+
+        def slow():
+            release.wait(5)
+            done.set()
+            return "late"
+        self.assertEqual(json.loads(run_with_deadline(slow, 0.05)), default_distribution())
+        self.assertEqual(self._delta("timeouts"), 1)
+        self._finish(done, release)
+        self._wait_for(lambda: self._delta("late_finished") == 1)
+        self.assertEqual(self._delta("late_failed"), 0)
+
+    def test_timeout_then_late_failure(self):
+        release, done = threading.Event(), threading.Event()
+
+        def slow_failure():
+            release.wait(5)
+            done.set()
+            raise TimeoutError("Emotion inference timeout")
+        run_with_deadline(slow_failure, 0.05)
+        self._finish(done, release)
+        self._wait_for(lambda: self._delta("late_failed") == 1)
+        self.assertEqual(self._delta("late_finished"), 0)
+
+    def _wait_for(self, condition):
+        for _ in range(100):
+            if condition():
+                return
+            threading.Event().wait(0.01)
+        self.fail("condition not reached")
+
+
+class TestSERToolSharedEngine(unittest.TestCase):
+    """SERTool with TRANSCRIPTION_BACKEND=local"""
+
+    def setUp(self):
+        self.engine = mock.Mock()
+        patches = (
+            mock.patch.object(ser_tool, "SHARED_AUDIO_ENGINE", True),
+            mock.patch.object(audio_engine, "get_audio_engine", return_value=self.engine),
+        )
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_emotions_come_from_the_engine(self):
+        self.engine.detect_emotions.return_value = '{"sad": 100.0}'
+        self.assertEqual(SERTool()._run("clip.wav"), '{"sad": 100.0}')
+        self.engine.detect_emotions.assert_called_once_with("clip.wav", timeout=ser_tool.SER_TIMEOUT)
+
+    def test_busy_engine_gives_neutral_distribution(self):
+        self.engine.detect_emotions.side_effect = TimeoutError("Audio engine busy")
+        self.assertEqual(json.loads(SERTool()._run("clip.wav")), default_distribution())
+
+
+class TestSERBatcher(unittest.TestCase):
+    """Micro-batching of concurrent SER requests"""
+
+    def setUp(self):
+        self.batches = []
+
+        def model(input_values):
+            self.batches.append(input_values.shape[0])
+            # One logit per clip that identifies it
+            return input_values.mean(dim=(1, 2)).unsqueeze(-1)
+
+        patcher = mock.patch.object(ser_tool, "load_ser_model", return_value=(model, None))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.batcher = SERBatcher(max_batch=3, max_wait_ms=200)
+
+    @staticmethod
+    def _clip(value, frames=10):
+        return torch.full((1, 2, frames), float(value))
+
+    def test_queue_depth(self):
+        self.assertGreaterEqual(ser_batcher.queue_depth(), 0)
+
+    def test_concurrent_clips_share_a_batch_and_get_their_own_logits(self):
+        futures = [self.batcher.submit(self._clip(value)) for value in (1, 2, 3)]
+        results = [future.result(timeout=5) for future in futures]
+        self.assertEqual([float(logits) for logits in results], [1.0, 2.0, 3.0])
+        self.assertEqual(self.batches, [3])
+
+    def test_clips_of_different_length_run_separately(self):
+        futures = [self.batcher.submit(self._clip(1)), self.batcher.submit(self._clip(2, frames=20))]
+        self.assertEqual([float(future.result(timeout=5)) for future in futures], [1.0, 2.0])
+        self.assertEqual(sorted(self.batches), [1, 1])
+
+    def test_cancelled_clips_are_dropped(self):
+        before = ser_stats.snapshot()["dropped"]
+        kept = self.batcher.submit(self._clip(1))
+        cancelled = self.batcher.submit(self._clip(2))
+        self.assertTrue(cancelled.cancel())
+        self.assertEqual(float(kept.result(timeout=5)), 1.0)
+        self.assertEqual(self.batches, [1])
+        self.assertEqual(ser_stats.snapshot()["dropped"] - before, 1)
+
+    def test_model_errors_reach_every_caller(self):
+        ser_tool.load_ser_model.side_effect = RuntimeError("no weights")
+        futures = [self.batcher.submit(self._clip(value)) for value in (1, 2)]
+        for future in futures:
+            with self.assertRaises(RuntimeError):
+                future.result(timeout=5)
+
+
+if __name__ == '__main__':
+    unittest.main()
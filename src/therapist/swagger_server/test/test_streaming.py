@@ -0,0 +1,61 @@
+# coding: utf-8
+
+import unittest
+
+from logic.streaming import FinalAnswerFilter
+
+
+class TestFinalAnswerFilter(unittest.TestCase):
+    """Filtering of streamed agent generations"""
+
+    def setUp(self):
+        self.tokens = []
+
+    def _filter(self, passthrough=False):
+        return FinalAnswerFilter(self.tokens.append, passthrough=passthrough)
+
+    def test_forwards_only_after_marker(self):
+        token_filter = self._filter()
+        for chunk in ("Thought: the user is sad\n", "Final ", "Answer: I hear", " you."):
+            token_filter.feed(chunk)
+        token_filter.flush()
+        self.assertEqual("".join(self.tokens), "I hear you.")
+
+    def test_passthrough_forwards_everything(self):
+        token_filter = self._filter(passthrough=True)
+        token_filter.feed("Hello")
+        token_filter.feed(" there")
+        self.assertEqual(self.tokens, ["Hello", " there"])
+
+    def test_reset_drops_previous_call(self):
+        token_filter = self._filter()
+        token_filter.feed("Thought: I should use a tool\nAction: search")
+        token_filter.reset()
+        token_filter.feed("Thought: done\nFinal Answer: Take a breath.")
+        token_filter.flush()
+        self.assertEqual(self.tokens, ["Take a breath."])
+
+    def test_reset_filters_again_after_an_answer(self):
+        token_filter = self._filter()
+        token_filter.feed("Final Answer: first")
+        token_filter.reset()
+        token_filter.feed("Thought: retry")
+        self.assertEqual(self.tokens, ["first"])
+
+    def test_flush_without_marker_forwards_generation(self):
+        token_filter = self._filter()
+        token_filter.feed("I am here ")
+        token_filter.feed("for you.")
+        self.assertEqual(self.tokens, [])
+        token_filter.flush()
+        self.assertEqual(self.tokens, ["I am here for you."])
+
+    def test_flush_after_answer_adds_nothing(self):
+        token_filter = self._filter()
+        token_filter.feed("Final Answer: done")
+        token_filter.flush()
+        self.assertEqual(self.tokens, ["done"])
+
+
+if __name__ == '__main__':
+    unittest.main()
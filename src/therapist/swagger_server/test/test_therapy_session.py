@@ -0,0 +1,133 @@
+# coding: utf-8
+
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from logic import therapy
+from logic.therapy import TherapySession, _format_reports, abandoned_analyses
+
+
+class _FakeTherapist:
+    """Stands in for a pooled Therapist crew; kickoffs wait for each other."""
+
+    def __init__(self, name, barrier=None):
+        self.name = name
+        self.barrier = barrier
+        self.therapist_llm = object()
+
+    def crew(self):
+        return SimpleNamespace(kickoff=self._kickoff)
+
+    def _kickoff(self, inputs):
+        if self.barrier is not None:
+            self.barrier.wait(5)
+        return SimpleNamespace(raw=f"reply {self.name}")
+
+    def reports(self):
+        return {"text": f"text report {self.name}", "image": None, "audio": None}
+
+
+class TestInMemoryReports(unittest.TestCase):
+    """Analysis reports travel with the TherapyResult, not through shared files"""
+
+    def setUp(self):
+        for name, value in (("ORCHESTRATION_MODE", "crew"), ("FAST_PATH_ENABLED", False)):
+            patcher = mock.patch.object(therapy, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.registry = mock.Mock()
+        patcher = mock.patch.object(therapy, "crew_registry", self.registry)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_result_carries_the_reports(self):
+        therapist = _FakeTherapist("a")
+        self.registry.acquire.return_value = therapist
+        result = TherapySession().respond(user_text="I feel tense at work")
+        self.assertEqual(result.reply, "reply a")
+        self.assertEqual(result.text_report, "text report a")
+        self.assertIsNone(result.image_report)
+        self.registry.release.assert_called_once_with(therapist, reusable=True)
+
+    def test_concurrent_sessions_keep_their_own_reports(self):
+        barrier = threading.Barrier(2)
+        self.registry.acquire.side_effect = [_FakeTherapist("a", barrier), _FakeTherapist("b", barrier)]
+        results = {}
+
+        def respond(key):
+            results[key] = TherapySession().respond(user_text=f"message {key}")
+
+        threads = [threading.Thread(target=respond, args=(key,)) for key in ("first", "second")]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(len(results), 2)
+        for result in results.values():
+            self.assertEqual(result.text_report, "text report " + result.reply.split()[-1])
+
+
+class _AnalysisCrews:
+    """Per-modality crews: text answers, image fails, audio blocks until released."""
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def analysis_crew(self, modality):
+        def kickoff(inputs):
+            if modality == "image":
+                raise ValueError("vision backend down")
+            if modality == "audio":
+                self.release.wait(5)
+            return SimpleNamespace(raw=f"{modality} report")
+        return SimpleNamespace(kickoff=kickoff)
+
+
+class TestManagedAnalyses(unittest.TestCase):
+    """Per-modality deadlines of the managed orchestration"""
+
+    def setUp(self):
+        patcher = mock.patch.dict(therapy.ANALYSIS_DEADLINES, {"text": 5, "image": 5, "audio": 0.1})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.crews = _AnalysisCrews()
+        self.addCleanup(self._settle)
+
+    def _settle(self):
+        """Let abandoned analyses end, so the next test starts from zero."""
+        self.crews.release.set()
+        deadline = time.monotonic() + 5
+        while abandoned_analyses() and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def test_failures_are_told_apart_from_timeouts(self):
+        reports, failures, settled = TherapySession()._run_analyses(
+            self.crews, ["audio", "image", "text"], {})
+        self.assertEqual(reports, {"text": "text report", "image": None, "audio": None})
+        self.assertEqual(failures, {"audio": "timeout", "image": "error"})
+        self.assertFalse(settled)
+
+    def test_abandoned_analyses_are_tracked_until_they_end(self):
+        TherapySession()._run_analyses(self.crews, ["audio"], {})
+        self.assertEqual(abandoned_analyses(), 1)
+        self._settle()
+        self.assertEqual(abandoned_analyses(), 0)
+
+    def test_analyses_are_skipped_while_abandoned_work_fills_the_slots(self):
+        with mock.patch.object(therapy, "ANALYSIS_ABANDONED_SLOTS", 0):
+            reports, failures, settled = TherapySession()._run_analyses(self.crews, ["text"], {})
+        self.assertIsNone(reports["text"])
+        self.assertEqual(failures, {"text": "skipped"})
+        self.assertTrue(settled)
+
+    def test_missing_reports_are_marked_with_their_reason(self):
+        rendered = _format_reports({"text": "calm", "audio": None}, ["audio", "text"], {"audio": "timeout"})
+        self.assertIn("calm", rendered)
+        self.assertIn(f"Unavailable ({therapy.UNAVAILABLE_REASONS['timeout']})", rendered)
+
+
+if __name__ == '__main__':
+    unittest.main()
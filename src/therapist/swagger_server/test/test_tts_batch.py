@@ -0,0 +1,82 @@
+# coding: utf-8
+
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import torch
+
+from swagger_server import tts_service
+from swagger_server.tts_service import _synthesize_batch
+
+SAMPLES_PER_CHAR = 10
+
+
+class _Inputs(dict):
+    def to(self, device):
+        return self
+
+
+class _FakeProcessor:
+    """Encodes each text as its length; records the batches it was given."""
+
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, text, **kwargs):
+        self.batches.append(list(text))
+        lengths = torch.tensor([len(t) for t in text])
+        return _Inputs(input_ids=lengths[:, None], attention_mask=torch.ones(len(text), 1))
+
+
+class _FakeAcoustic:
+    """Padded batch whose rows are filled with the chunk length, padding with zeros."""
+
+    def generate_speech(self, input_ids, speaker_embeddings=None, attention_mask=None, vocoder=None,
+                        return_output_lengths=False):
+        lengths = input_ids[:, 0] * SAMPLES_PER_CHAR
+        batch = torch.zeros(len(lengths), int(lengths.max()))
+        for row, length in enumerate(lengths):
+            batch[row, :int(length)] = float(length)
+        return batch, lengths
+
+
+class TestSynthesizeBatch(unittest.TestCase):
+    """Batched synthesis of the chunks of one reply"""
+
+    def setUp(self):
+        self.processor = _FakeProcessor()
+        self.ctx = SimpleNamespace(processor=self.processor, acoustic=_FakeAcoustic(), vocoder=None,
+                                   spk_emb=None, sr_out=16000, device="cpu", voice_key="v")
+        patcher = mock.patch.object(tts_service, "TTS_BATCH_SIZE", 2)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_waveforms_keep_chunk_order_and_own_length(self):
+        chunks = ["A much longer chunk.", "Hi.", "Medium chunk.", "Okay then."]
+        wavs = _synthesize_batch(self.ctx, chunks, log_debug=False)
+        self.assertEqual([len(wav) for wav in wavs], [len(c) * SAMPLES_PER_CHAR for c in chunks])
+        for wav in wavs:
+            # Level-matched, and no padding of a longer neighbour is left over
+            self.assertAlmostEqual(float(wav.pow(2).mean().sqrt()), 0.045, places=3)
+
+    def test_similar_lengths_share_a_batch(self):
+        chunks = ["A much longer chunk.", "Hi.", "Medium chunk.", "Okay then."]
+        _synthesize_batch(self.ctx, chunks, log_debug=False)
+        self.assertEqual(self.processor.batches, [["Hi.", "Okay then."], ["Medium chunk.", "A much longer chunk."]])
+
+    def test_single_chunk_is_not_batched(self):
+        with mock.patch.object(tts_service, "_synthesize_chunk", return_value=torch.ones(3)) as single:
+            wavs = _synthesize_batch(self.ctx, ["Only one."], log_debug=False)
+        single.assert_called_once_with(self.ctx, "Only one.", 1, False)
+        self.assertEqual(len(wavs), 1)
+
+    def test_falls_back_to_one_chunk_at_a_time(self):
+        self.ctx.acoustic = mock.Mock()
+        self.ctx.acoustic.generate_speech.side_effect = TypeError("unexpected keyword argument")
+        with mock.patch.object(tts_service, "_synthesize_chunk", side_effect=lambda ctx, chunk, i, log: chunk):
+            self.assertEqual(_synthesize_batch(self.ctx, ["One.", "Two."], log_debug=False), ["One.", "Two."])
+
+
+if __name__ == '__main__':
+    unittest.main()
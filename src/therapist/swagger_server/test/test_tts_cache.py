@@ -0,0 +1,146 @@
+# coding: utf-8
+
+import shutil
+import tempfile
+import os
+import time
+import unittest
+from pathlib import Path
+
+import torch
+
+from swagger_server.tts_service import SentenceWaveCache, TTSOutputCache, _split_sentences, cleanup_old_tts_files
+
+
+class TestSentenceWaveCache(unittest.TestCase):
+    """Per-sentence waveform memo"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, True)
+
+    def _cache(self, **kwargs):
+        kwargs.setdefault("max_items", 2)
+        kwargs.setdefault("max_files", 100)
+        kwargs.setdefault("enabled", True)
+        return SentenceWaveCache(directory=self.directory, **kwargs)
+
+    def test_key_normalizes_whitespace(self):
+        self.assertEqual(SentenceWaveCache.key("I  hear\nyou.", "v", 16000),
+                         SentenceWaveCache.key(" I hear you. ", "v", 16000))
+
+    def test_key_depends_on_voice_rate_and_model(self):
+        key = SentenceWaveCache.key("Okay.", "v", 16000, model="a|b")
+        self.assertNotEqual(key, SentenceWaveCache.key("Okay.", "w", 16000, model="a|b"))
+        self.assertNotEqual(key, SentenceWaveCache.key("Okay.", "v", 22050, model="a|b"))
+        self.assertNotEqual(key, SentenceWaveCache.key("Okay.", "v", 16000, model="a|c"))
+
+    def test_hit_returns_a_copy(self):
+        cache = self._cache()
+        cache.put("k", torch.ones(4))
+        wav = cache.get("k")
+        wav.zero_()
+        self.assertTrue(torch.equal(cache.get("k"), torch.ones(4)))
+        self.assertEqual(cache.stats()["hits"], 2)
+
+    def test_evicted_from_memory_is_read_from_disk(self):
+        cache = self._cache(max_items=1)
+        cache.put("a", torch.ones(3))
+        cache.put("b", torch.zeros(3))
+        self.assertTrue(torch.equal(cache.get("a"), torch.ones(3)))
+        self.assertEqual(cache.stats()["diskHits"], 1)
+
+    def test_files_are_trimmed_to_limit(self):
+        cache = self._cache(max_files=5)
+        for i in range(8):
+            cache.put(str(i), torch.ones(2))
+        self.assertLessEqual(len(cache._items), 2)
+        self.assertLessEqual(sum(1 for _ in cache.directory.glob("*.pt")), 5)
+
+    def test_disabled_cache_stores_nothing(self):
+        cache = self._cache(enabled=False)
+        cache.put("k", torch.ones(2))
+        self.assertIsNone(cache.get("k"))
+
+
+class TestTTSOutputCache(unittest.TestCase):
+    """Content-addressed cache of whole replies"""
+
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory, True)
+
+    def _synthesized(self, size, ext=".mp3"):
+        path = self.directory / f"fresh-{time.monotonic_ns()}{ext}"
+        path.write_bytes(b"x" * size)
+        return path
+
+    def test_miss_then_hit(self):
+        cache = TTSOutputCache(max_bytes=1000, enabled=True)
+        self.assertIsNone(cache.get(self.directory, "k", ".mp3"))
+        fresh = self._synthesized(10)
+        self.assertEqual(cache.put(self.directory, "k", fresh), fresh)
+        served = cache.get(self.directory, "k", ".mp3")
+        self.assertEqual(served.parent, self.directory)
+        self.assertNotEqual(served, fresh)
+        self.assertEqual(served.read_bytes(), fresh.read_bytes())
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_wav_fallback_is_found(self):
+        cache = TTSOutputCache(max_bytes=1000, enabled=True)
+        cache.put(self.directory, "k", self._synthesized(10, ext=".wav"))
+        self.assertEqual(cache.get(self.directory, "k", ".mp3").suffix, ".wav")
+
+    def test_least_recently_used_is_evicted(self):
+        cache = TTSOutputCache(max_bytes=250, enabled=True)
+        cache.put(self.directory, "old", self._synthesized(100))
+        os.utime(self.directory / TTSOutputCache.SUBDIR / "old.mp3", (1, 1))
+        cache.put(self.directory, "new", self._synthesized(100))
+        cache.put(self.directory, "newest", self._synthesized(100))
+        self.assertIsNone(cache.get(self.directory, "old", ".mp3"))
+        self.assertIsNotNone(cache.get(self.directory, "newest", ".mp3"))
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_served_files_survive_eviction(self):
+        cache = TTSOutputCache(max_bytes=150, enabled=True)
+        fresh = self._synthesized(100)
+        cache.put(self.directory, "first", fresh)
+        served = cache.get(self.directory, "first", ".mp3")
+        os.utime(self.directory / TTSOutputCache.SUBDIR / "first.mp3", (1, 1))
+        cache.put(self.directory, "second", self._synthesized(100))
+        self.assertIsNone(cache.get(self.directory, "first", ".mp3"))
+        self.assertTrue(fresh.exists())
+        self.assertTrue(served.exists())
+
+    def test_key_depends_on_render_mode(self):
+        self.assertNotEqual(TTSOutputCache.key("Hi.", [], ".mp3", {}, mode="full"),
+                            TTSOutputCache.key("Hi.", [], ".mp3", {}, mode="stream"))
+
+    def test_key_depends_on_model(self):
+        self.assertNotEqual(TTSOutputCache.key("Hi.", [], ".mp3", {}, model="a|b"),
+                            TTSOutputCache.key("Hi.", [], ".mp3", {}, model="a|c"))
+
+    def test_cleanup_leaves_cache_alone(self):
+        cache = TTSOutputCache(max_bytes=1000, enabled=True)
+        fresh = self._synthesized(10)
+        cache.put(self.directory, "k", fresh)
+        os.utime(fresh, (1, 1))
+        self.assertEqual(cleanup_old_tts_files(self.directory, max_age_hours=1), 1)
+        self.assertIsNotNone(cache.get(self.directory, "k", ".mp3"))
+
+
+class TestSplitSentences(unittest.TestCase):
+    """Sentence units for streaming and for the memo"""
+
+    def test_short_sentences_are_merged_for_streaming(self):
+        self.assertEqual(_split_sentences("Okay. I hear you, that sounds hard.", 20),
+                         ["Okay. I hear you, that sounds hard."])
+
+    def test_short_sentences_are_own_units_for_the_memo(self):
+        self.assertEqual(_split_sentences("Okay. I hear you, that sounds hard.", 1),
+                         ["Okay.", "I hear you, that sounds hard."])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+# coding: utf-8
+
+import unittest
+from unittest import mock
+
+import torch
+from flask import Flask
+from sqlalchemy import select
+
+from swagger_server.test.sqlite_db import use_sqlite_database
+
+use_sqlite_database()
+
+from swagger_server import direct_routes  # noqa: E402
+from swagger_server.db import engine, messages  # noqa: E402
+from swagger_server.direct_routes import _complete_tts_job, _schedule_bot_audio  # noqa: E402
+from swagger_server.message_jobs import JobQueueFull  # noqa: E402
+
+AUDIO_PATH = str(direct_routes.AUDIO_DIR / "tts" / "reply.mp3")
+
+
+class _FakeSocketIO:
+    def __init__(self):
+        self.events = []
+
+    def emit(self, event, data, room=None):
+        self.events.append((event, data, room))
+
+
+class TestBackgroundTTS(unittest.TestCase):
+    """Late-bound bot audio: synthesis off the request, then bot_audio_url and audioReady"""
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.socketio = _FakeSocketIO()
+        self.app.extensions["socketio"] = self.socketio
+        with engine.begin() as conn:
+            ins = conn.execute(messages.insert().values(conversation_id=1, text="hi", bot_text="Hello. Welcome."))
+            self.message_id = ins.inserted_primary_key[0]
+        patcher = mock.patch.object(direct_routes, "_generate_bot_audio", side_effect=self._synthesize)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.audio_path = AUDIO_PATH
+
+    def _synthesize(self, bot_reply, on_sentence=None):
+        if on_sentence is not None:
+            on_sentence(0, "Hello.", torch.zeros(160), 16000)
+        return self.audio_path
+
+    def _events(self):
+        return [event for event, _, _ in self.socketio.events]
+
+    def _stored_audio(self):
+        with engine.connect() as conn:
+            return conn.execute(
+                select(messages.c.bot_audio_url).where(messages.c.id == self.message_id)
+            ).scalar()
+
+    def test_audio_url_is_filled_in_and_announced(self):
+        _complete_tts_job(self.app, 7, self.message_id, "Hello. Welcome.")
+        self.assertEqual(self._stored_audio(), AUDIO_PATH)
+        event, data, room = self.socketio.events[-1]
+        self.assertEqual(event, "audioReady")
+        self.assertEqual(data, {"messageId": f"{self.message_id}-bot", "audio": "/uploads/audio/tts/reply.mp3"})
+        self.assertEqual(room, "user_7")
+
+    def test_streamed_audio_is_closed_before_audio_ready(self):
+        _complete_tts_job(self.app, 7, self.message_id, "Hello. Welcome.", stream_id="s1")
+        self.assertEqual(self._events(), ["replyAudio", "replyAudioEnd", "audioReady"])
+        self.assertEqual(self.socketio.events[1][1]["streamId"], "s1")
+
+    def test_failed_synthesis_announces_no_audio(self):
+        self.audio_path = None
+        _complete_tts_job(self.app, 7, self.message_id, "Hello. Welcome.")
+        self.assertIsNone(self._stored_audio())
+        self.assertIsNone(self.socketio.events[-1][1]["audio"])
+
+    def test_scheduling(self):
+        with mock.patch.object(direct_routes, "is_tts_enabled", return_value=True), \
+                mock.patch.object(direct_routes, "tts_runner") as runner:
+            self.assertTrue(_schedule_bot_audio(self.app, 7, self.message_id, "Hello."))
+            self.assertFalse(_schedule_bot_audio(self.app, 7, self.message_id, "   "))
+            runner.submit.side_effect = JobQueueFull("full")
+            self.assertFalse(_schedule_bot_audio(self.app, 7, self.message_id, "Hello."))
+        _, kwargs = runner.submit.call_args_list[0]
+        self.assertEqual(kwargs["userId"], "7")
+
+
+if __name__ == '__main__':
+    unittest.main()
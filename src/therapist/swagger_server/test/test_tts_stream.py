@@ -0,0 +1,68 @@
+# coding: utf-8
+
+import unittest
+from unittest import mock
+
+from flask import Flask
+
+from swagger_server.test.sqlite_db import use_sqlite_database
+
+use_sqlite_database()
+
+from swagger_server import direct_routes  # noqa: E402
+from swagger_server.direct_routes import _generate_token, register_direct_routes  # noqa: E402
+
+
+class TestTTSStreamRoute(unittest.TestCase):
+    """/direct/tts/stream: authentication, limits and failure before streaming"""
+
+    @classmethod
+    def setUpClass(cls):
+        app = Flask(__name__)
+        register_direct_routes(app)
+        cls.client = app.test_client()
+
+    def setUp(self):
+        self.chunks = [b"RIFF-header", b"pcm-1", b"pcm-2"]
+        patches = (
+            mock.patch.object(direct_routes, "is_tts_enabled", return_value=True),
+            mock.patch.object(direct_routes, "stream_tts_wav", side_effect=lambda text: iter(self.chunks)),
+        )
+        for patcher in patches:
+            self.synthesize = patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _post(self, text, token=True):
+        headers = {"Authorization": f"Bearer {_generate_token(1)}"} if token else {}
+        return self.client.post("/direct/tts/stream", json={"text": text}, headers=headers)
+
+    def test_requires_a_token(self):
+        self.assertEqual(self._post("Hello.", token=False).status_code, 401)
+        self.synthesize.assert_not_called()
+
+    def test_rejects_empty_text(self):
+        self.assertEqual(self._post("   ").status_code, 400)
+
+    def test_rejects_text_over_the_limit(self):
+        response = self._post("a" * (direct_routes.TTS_STREAM_MAX_CHARS + 1))
+        self.assertEqual(response.status_code, 413)
+        self.synthesize.assert_not_called()
+
+    def test_disabled_tts(self):
+        with mock.patch.object(direct_routes, "is_tts_enabled", return_value=False):
+            self.assertEqual(self._post("Hello.").status_code, 503)
+
+    def test_failure_before_the_first_sentence_is_an_error(self):
+        self.chunks = []
+        self.assertEqual(self._post("Hello.").status_code, 500)
+
+    def test_streams_header_and_sentences(self):
+        response = self._post("Hello. How are you?")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, "audio/wav")
+        self.assertEqual(response.get_data(), b"RIFF-headerpcm-1pcm-2")
+        self.synthesize.assert_called_once_with("Hello. How are you?")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+# coding: utf-8
+
+import sys
+import threading
+import types
+import unittest
+from unittest import mock
+
+from logic.tools import voice_transcription_tool
+from logic.tools.voice_transcription_tool import TRANSCRIPTION_TIMEOUT_TEXT, LocalWhisperTranscriber, transcribe_audio
+
+
+class TestLocalTranscriptionDeadline(unittest.TestCase):
+    """Deadline of the local transcription backend"""
+
+    def _engine_module(self, engine):
+        # Stands in for audio_engine, which the local backend imports lazily
+        module = types.ModuleType("logic.tools.audio_engine")
+        module.get_audio_engine = lambda: engine
+        return mock.patch.dict(sys.modules, {"logic.tools.audio_engine": module})
+
+    def test_transcript_within_deadline(self):
+        engine = mock.Mock()
+        engine.transcribe.return_value = "hello"
+        with self._engine_module(engine):
+            self.assertEqual(LocalWhisperTranscriber().transcribe("clip.wav", timeout=5), "hello")
+        engine.transcribe.assert_called_once_with("clip.wav", timeout=5)
+
+    def test_slow_transcription_times_out(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+        engine = mock.Mock()
+        engine.transcribe.side_effect = lambda *args, **kwargs: release.wait(5) and "late"
+        with self._engine_module(engine):
+            with self.assertRaises(TimeoutError):
+                LocalWhisperTranscriber().transcribe("clip.wav", timeout=0.05)
+
+
+class TestTranscribeAudio(unittest.TestCase):
+    """Errors surfaced by transcribe_audio"""
+
+    def _transcribe(self, error):
+        transcriber = mock.Mock()
+        transcriber.cache_params.return_value = None
+        transcriber.transcribe.side_effect = error
+        with mock.patch.object(voice_transcription_tool, "get_transcriber", return_value=transcriber):
+            return transcribe_audio("clip.wav")
+
+    def test_timeout_returns_fallback(self):
+        self.assertEqual(self._transcribe(TimeoutError("Audio engine busy")), TRANSCRIPTION_TIMEOUT_TEXT)
+
+    def test_other_errors_still_raise(self):
+        with self.assertRaises(RuntimeError):
+            self._transcribe(ValueError("boom"))
+
+
+if __name__ == '__main__':
+    unittest.main()
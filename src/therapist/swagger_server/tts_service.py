@@ -2,14 +2,20 @@ import os
 import re
 import math
 import time
+import io
 import uuid
+import struct
+import shutil
+import threading
 import traceback
+from collections import OrderedDict
 from dataclasses import dataclass
 from functools import lru_cache
 from pathlib import Path
-from typing import Optional, Tuple, Callable, List, Union, Dict
+from typing import Optional, Tuple, Callable, List, Union, Dict, Iterator
 import hashlib
 import json
+import logging
 
 try:
     from openai import OpenAI  # type: ignore
@@ -22,10 +28,49 @@ import torchaudio
 import soundfile as sf
 from transformers import SpeechT5Processor, SpeechT5ForTextToSpeech, SpeechT5HifiGan
 
+from swagger_server.logging_setup import get_logger
+
+logger = get_logger(__name__)
 
 ENABLE_TTS = True
 TTS_VOICE: List[str] = [f"swagger_server/voice_samples/arctic_a{str(i).zfill(4)}.wav" for i in range(1, 101)]
 TTS_OUT_FORMAT = "mp3"  
+# Checkpoints; part of every cache key, so switching models never serves stale audio
+TTS_ACOUSTIC_MODEL = os.getenv("TTS_ACOUSTIC_MODEL", "microsoft/speecht5_tts")
+TTS_VOCODER_MODEL = os.getenv("TTS_VOCODER_MODEL", "microsoft/speecht5_hifigan")
+TTS_MODEL_KEY = f"{TTS_ACOUSTIC_MODEL}|{TTS_VOCODER_MODEL}"
+# Sentence streaming: fragments shorter than this are merged into the next
+# sentence, so "Okay." is not synthesized (and played) on its own
+TTS_STREAM_MIN_CHARS = int(os.getenv("TTS_STREAM_MIN_CHARS", "20"))
+# Chunks of one reply synthesized together (padded batch); 1 = one at a time
+TTS_BATCH_SIZE = int(os.getenv("TTS_BATCH_SIZE", "4"))
+# Synthesized replies are reused for identical text/voice/format/FX
+TTS_CACHE_ENABLED = os.getenv("TTS_CACHE_ENABLED", "1") == "1"
+TTS_CACHE_MAX_MB = int(os.getenv("TTS_CACHE_MAX_MB", "512"))
+# Per-sentence waveform memo (in memory + on disk), so stock sentences are
+# synthesized once and spliced into later replies
+TTS_SENTENCE_CACHE_ENABLED = os.getenv("TTS_SENTENCE_CACHE_ENABLED", "1") == "1"
+TTS_SENTENCE_CACHE_SIZE = int(os.getenv("TTS_SENTENCE_CACHE_SIZE", "256"))          # in memory
+TTS_SENTENCE_CACHE_MAX_FILES = int(os.getenv("TTS_SENTENCE_CACHE_MAX_FILES", "5000"))  # on disk
+# The memo is keyed on the usual ~280-token chunks (and on stream sentences).
+# TTS_SENTENCE_CHUNKS=1 synthesizes per sentence instead, so stock sentences hit
+# whatever surrounds them; this changes chunk boundaries and pauses, hence opt-in
+TTS_SENTENCE_CHUNKS = os.getenv("TTS_SENTENCE_CHUNKS", "0") == "1"
+# Sentence units are at least this many characters (shorter ones are merged
+# forward); kept apart from TTS_STREAM_MIN_CHARS so "Okay." is a unit
+TTS_SENTENCE_CACHE_MIN_CHARS = int(os.getenv("TTS_SENTENCE_CACHE_MIN_CHARS", "1"))
+# Runtime data lives outside the code tree (DATA_DIR is shared with the analysis cache)
+SENTENCE_CACHE_DIR = Path(os.getenv(
+    "TTS_SENTENCE_CACHE_DIR", os.path.join(os.getenv("DATA_DIR", "/tmp/therapist-data"), "tts_sentence_cache")
+))
+# Voice FX used by the routes; part of the output cache key
+TTS_FX = {
+    "pitch_shift_steps": -1.0,  # slightly lower pitch for a calmer tone; auto-disabled on long text
+    "male_timbre_tweak": True,
+    "treble_cut_db": 6.0,
+    "presence_cut_db": 3.0,
+    "body_boost_db": 2.5,
+}
 
 
 DEFAULT_VOICE_REFS_ROOT = Path(__file__).parent / "voice_refs"
@@ -58,10 +103,10 @@ def check_openai_quota() -> bool:
     except Exception as e:
         msg = str(e).lower()
         if "quota" in msg or "rate_limit" in msg or "insufficient" in msg:
-            print(f"[TTS] OpenAI quota check failed: {e}")
+            logger.warning("[TTS] OpenAI quota check failed: %s", e)
             return False
         # Other network/auth errors should not block local TTS
-        print(f"[TTS] OpenAI check warning (ignoring): {e}")
+        logger.info("[TTS] OpenAI check warning (ignoring): %s", e)
         return True
 
 
@@ -75,17 +120,17 @@ class _EmbedBackend:
 
 @lru_cache(maxsize=1)
 def _get_processor():
-    return SpeechT5Processor.from_pretrained("microsoft/speecht5_tts")
+    return SpeechT5Processor.from_pretrained(TTS_ACOUSTIC_MODEL)
 
 
 @lru_cache(maxsize=1)
 def _get_acoustic():
-    return SpeechT5ForTextToSpeech.from_pretrained("microsoft/speecht5_tts")
+    return SpeechT5ForTextToSpeech.from_pretrained(TTS_ACOUSTIC_MODEL)
 
 
 @lru_cache(maxsize=1)
 def _get_vocoder():
-    return SpeechT5HifiGan.from_pretrained("microsoft/speecht5_hifigan")
+    return SpeechT5HifiGan.from_pretrained(TTS_VOCODER_MODEL)
 
 
 @lru_cache(maxsize=1)
@@ -181,7 +226,7 @@ def _preprocess_reference(wav: torch.Tensor, sr: int, target_sr: int, min_ref_se
     wav = _crop_duration(wav, sr, min_ref_sec, max_ref_sec)
     if log_debug:
         dur = wav.shape[1] / sr
-        print(f"[REF] duration after preprocess: {dur:.2f}s @ {sr} Hz")
+        logger.debug("[REF] duration after preprocess: %.2fs @ %s Hz", dur, sr)
     return wav
 
 
@@ -220,7 +265,7 @@ def _log_embed_stats(emb: torch.Tensor, backend_name: str, sr: int, wav: Optiona
     mean = emb.mean().item()
     std = emb.std().item()
     norm = torch.linalg.vector_norm(emb).item()
-    print(f"[EMBED] backend={backend_name} | mean={mean:.4f} std={std:.4f} ||emb||={norm:.3f}")
+    logger.debug("[EMBED] backend=%s | mean=%.4f std=%.4f ||emb||=%.3f", backend_name, mean, std, norm)
 
 
 
@@ -259,7 +304,7 @@ def _load_emb_from_disk(key: str) -> Optional[torch.Tensor]:
         try:
             return torch.load(fp, map_location="cpu")
         except Exception as e:
-            print(f"[TTS] Failed loading cached embedding {fp}: {e}")
+            logger.warning("[TTS] Failed loading cached embedding %s: %s", fp, e)
     return None
 
 
@@ -268,7 +313,7 @@ def _save_emb_to_disk(key: str, emb: torch.Tensor) -> None:
     try:
         torch.save(emb.detach().cpu(), fp)
     except Exception as e:
-        print(f"[TTS] Failed saving cached embedding {fp}: {e}")
+        logger.warning("[TTS] Failed saving cached embedding %s: %s", fp, e)
 
 
 def _get_cached_speaker_embedding(
@@ -287,7 +332,7 @@ def _get_cached_speaker_embedding(
         if not require_real and allow_random:
             torch.manual_seed(random_seed)
             if log_debug:
-                print("[TTS] Using random speaker embedding (no refs).")
+                logger.debug("[TTS] Using random speaker embedding (no refs).")
             return torch.randn(1, 512)
         raise RuntimeError("No reference wavs provided and random fallback disabled.")
 
@@ -296,14 +341,14 @@ def _get_cached_speaker_embedding(
 
     if key in _SPK_EMB_CACHE:
         if log_debug:
-            print("[TTS] Speaker embedding hit (memory cache).")
+            logger.debug("[TTS] Speaker embedding hit (memory cache).")
         return _SPK_EMB_CACHE[key].clone()
 
 
     emb_disk = _load_emb_from_disk(key)
     if emb_disk is not None:
         if log_debug:
-            print(f"[TTS] Speaker embedding hit (disk cache: {_disk_cache_path(key).name}).")
+            logger.debug("[TTS] Speaker embedding hit (disk cache: %s).", _disk_cache_path(key).name)
         _SPK_EMB_CACHE[key] = emb_disk
         return emb_disk.clone()
 
@@ -315,7 +360,7 @@ def _get_cached_speaker_embedding(
         try:
             wav, sr = torchaudio.load(wav_path)
         except Exception as e:
-            print(f"[TTS] Skipping ref '{wav_path}': {e}")
+            logger.warning("[TTS] Skipping ref '%s': %s", wav_path, e)
             continue
         if wav.numel() == 0:
             continue
@@ -337,13 +382,13 @@ def _get_cached_speaker_embedding(
                 e = emb_backend.embed_fn(ch)
                 all_embs.append(e)
             except Exception as ee:
-                print(f"[TTS] Embed chunk failed for '{wav_path}': {ee}")
+                logger.warning("[TTS] Embed chunk failed for '%s': %s", wav_path, ee)
 
     if not all_embs:
         if not require_real and allow_random:
             torch.manual_seed(random_seed)
             if log_debug:
-                print("[TTS] Using random speaker embedding (no valid chunks).")
+                logger.debug("[TTS] Using random speaker embedding (no valid chunks).")
             spk_emb = torch.randn(1, 512)
         else:
             raise RuntimeError("No valid embeddings extracted from reference wavs.")
@@ -357,7 +402,7 @@ def _get_cached_speaker_embedding(
 
     if log_debug:
         _log_embed_stats(spk_emb, backend_name=emb_backend.name, sr=emb_backend.sample_rate, wav=None)
-        print(f"[TTS] Speaker embedding cached under key {key[:8]}…")
+        logger.debug("[TTS] Speaker embedding cached under key %s…", key[:8])
 
     return spk_emb
 
@@ -465,31 +510,29 @@ def _concat_with_crossfade(waves: List[torch.Tensor], sr: int, fade_ms: int = 15
 
 
 
-def tts_speecht5_hifigan(
-    text: str,
-    voice_ref_wavs: Union[str, List[str]],  # accept one or many
-    out_path: str,
-    device: Optional[str] = None,
-    normalize_spk: bool = True,
-    require_real_embed: bool = True,
-    allow_random_fallback: bool = True,
-    random_seed: int = 0,
-    pitch_shift_steps: float = 0.0,
-    min_ref_sec: float = 5.0,
-    max_ref_sec: float = 20.0,
-    log_debug: bool = True,
-    male_timbre_tweak: bool = True,
-    treble_cut_db: float = 6.0,
-    presence_cut_db: float = 3.0,
-    body_boost_db: float = 2.5,
-) -> Tuple[str, int]:
-    """
-    Text-to-Speech (SpeechT5 + HiFi-GAN) with multiple reference support.
-    - Accepts one or many reference files (list of paths).
-    - Averages embeddings across all files and speech chunks.
-    - Optional pitch shift + EQ tweaks for darker/more male timbre.
-    - Splits long text into ~280-token chunks to avoid crash/drift.
-    """
+@dataclass
+class _SynthContext:
+    processor: SpeechT5Processor
+    acoustic: SpeechT5ForTextToSpeech
+    vocoder: SpeechT5HifiGan
+    spk_emb: torch.Tensor
+    sr_out: int
+    device: str
+    voice_key: str  # identifies spk_emb in the sentence cache
+
+
+def _synthesis_context(
+    voice_ref_wavs: Union[str, List[str]],
+    device: Optional[str],
+    normalize_spk: bool,
+    require_real_embed: bool,
+    allow_random_fallback: bool,
+    random_seed: int,
+    min_ref_sec: float,
+    max_ref_sec: float,
+    log_debug: bool,
+) -> _SynthContext:
+    """Models, speaker embedding and output rate shared by all chunks of one reply."""
     if device is None:
         device = (
             "cuda" if torch.cuda.is_available() else
@@ -527,73 +570,384 @@ def tts_speecht5_hifigan(
     if log_debug:
         _log_embed_stats(spk_emb, backend_name=emb_backend.name, sr=emb_backend.sample_rate, wav=None)
 
-    # --- Normalize & chunk text ---
-    text = _normalize_text_quick(text)
-    chunks = _chunk_text_by_tokens(text, processor, max_tokens=280)
-    if log_debug and len(chunks) > 1:
-        print(f"[TTS] Long text split into {len(chunks)} chunks (<=280 tokens each).")
+    voice_key = hashlib.sha1(spk_emb.detach().cpu().numpy().tobytes()).hexdigest()
+    return _SynthContext(processor, acoustic, vocoder, spk_emb, sr_out, device, voice_key)
 
-    # Optional: tone down FX automatically for very long inputs
-    joined_len = sum(len(c) for c in chunks)
-    if joined_len > 800:
-        # Disable by default for long-form; you can override by passing flags from routes
-        pitch_shift_steps = 0.0
-        male_timbre_tweak = False
-        if log_debug:
-            print("[TTS] Long-form detected → disabling pitch shift & timbre tweak for cleanliness.")
 
-    chunk_wavs: List[torch.Tensor] = []
-
-    for i, chunk in enumerate(chunks if chunks else [text], 1):
-        # Safety: truncation guard if a single sentence still overflows
-        inputs = processor(text=chunk, return_tensors="pt").to(device)
-        if inputs["input_ids"].shape[1] > 600:
-            if log_debug:
-                print(f"[TTS] Truncating chunk {i} from {inputs['input_ids'].shape[1]} to 600 tokens.")
-            inputs = processor(text=chunk, return_tensors="pt", max_length=600, truncation=True).to(device)
+def _synthesize_chunk(ctx: _SynthContext, chunk: str, i: int, log_debug: bool) -> torch.Tensor:
+    """Waveform of one text chunk, level-matched, on CPU."""
+    processor = ctx.processor
+    # Safety: truncation guard if a single sentence still overflows
+    inputs = processor(text=chunk, return_tensors="pt").to(ctx.device)
+    if inputs["input_ids"].shape[1] > 600:
+        if log_debug:
+            logger.debug("[TTS] Truncating chunk %d from %d to 600 tokens.", i, inputs['input_ids'].shape[1])
+        inputs = processor(text=chunk, return_tensors="pt", max_length=600, truncation=True).to(ctx.device)
 
-        # Try to include attention_mask if supported
-        gen_kwargs = {}
-        if hasattr(processor, "model_input_names") and "attention_mask" in getattr(processor, "model_input_names", []):
-            if "attention_mask" in inputs:
-                gen_kwargs["attention_mask"] = inputs["attention_mask"]
+    # Try to include attention_mask if supported
+    gen_kwargs = {}
+    if hasattr(processor, "model_input_names") and "attention_mask" in getattr(processor, "model_input_names", []):
+        if "attention_mask" in inputs:
+            gen_kwargs["attention_mask"] = inputs["attention_mask"]
 
+    with torch.inference_mode():
+        try:
+            wav = ctx.acoustic.generate_speech(
+                inputs["input_ids"],
+                speaker_embeddings=ctx.spk_emb,
+                vocoder=ctx.vocoder,
+                **gen_kwargs,
+            )
+        except TypeError:
+            # Older transformers without attention_mask support
+            wav = ctx.acoustic.generate_speech(
+                inputs["input_ids"],
+                speaker_embeddings=ctx.spk_emb,
+                vocoder=ctx.vocoder,
+            )
+
+    if wav.dim() > 1:
+        wav = wav.squeeze(0)
+
+    # Level-match each chunk to avoid loudness swings
+    wav = _match_rms(wav, target_rms=0.045)
+    return wav.detach().cpu()
+
+
+def _synthesize_batch(ctx: _SynthContext, chunks: List[str], log_debug: bool) -> List[torch.Tensor]:
+    """
+    Waveforms of several chunks, in order. Chunks are tokenized together and
+    run through the acoustic model and vocoder as padded batches of up to
+    TTS_BATCH_SIZE; each waveform is cut to its own length and level-matched.
+    """
+    if len(chunks) < 2 or TTS_BATCH_SIZE < 2:
+        return [_synthesize_chunk(ctx, chunk, i, log_debug) for i, chunk in enumerate(chunks, 1)]
+
+    # Similar lengths share a batch, which keeps padding (and wasted decoder steps) low
+    order = sorted(range(len(chunks)), key=lambda i: len(chunks[i]))
+    wavs: List[Optional[torch.Tensor]] = [None] * len(chunks)
+    for start in range(0, len(order), TTS_BATCH_SIZE):
+        idx = order[start:start + TTS_BATCH_SIZE]
+        inputs = ctx.processor(
+            text=[chunks[i] for i in idx], return_tensors="pt",
+            padding=True, max_length=600, truncation=True,
+        ).to(ctx.device)
         with torch.inference_mode():
             try:
-                wav = acoustic.generate_speech(
+                batch, lengths = ctx.acoustic.generate_speech(
                     inputs["input_ids"],
-                    speaker_embeddings=spk_emb,
-                    vocoder=vocoder,
-                    **gen_kwargs,
+                    speaker_embeddings=ctx.spk_emb,
+                    attention_mask=inputs["attention_mask"],
+                    vocoder=ctx.vocoder,
+                    return_output_lengths=True,
                 )
             except TypeError:
-                # Older transformers without attention_mask support
-                wav = acoustic.generate_speech(
-                    inputs["input_ids"],
-                    speaker_embeddings=spk_emb,
-                    vocoder=vocoder,
-                )
+                # Older transformers without batched generation: one chunk at a time
+                return [_synthesize_chunk(ctx, chunk, i, log_debug) for i, chunk in enumerate(chunks, 1)]
+        if log_debug:
+            logger.debug("[TTS] Synthesized batch of %d chunks.", len(idx))
+        if batch.dim() == 1:
+            batch = batch.unsqueeze(0)
+        for row, (i, length) in enumerate(zip(idx, lengths)):
+            wav = batch[row, :int(length)]
+            wavs[i] = _match_rms(wav, target_rms=0.045).detach().cpu()
+    return wavs
 
-        if wav.dim() > 1:
-            wav = wav.squeeze(0)
 
-        # Level-match each chunk to avoid loudness swings
-        wav = _match_rms(wav, target_rms=0.045)
-        chunk_wavs.append(wav.detach().cpu())
+class SentenceWaveCache:
+    """
+    Memo of synthesized chunk waveforms (level-matched, before fades and FX);
+    chunks are sentences when TTS_SENTENCE_CHUNKS is on.
 
-    # Concatenate all chunks with short pauses to avoid phoneme smearing
-    waveform = _concat_with_pauses(chunk_wavs, sr=sr_out, pause_ms=120, edge_fade_ms=6)
+    Keyed by the whitespace-normalized chunk, the speaker embedding, the
+    output rate and the model checkpoints. Recent entries are kept in memory (LRU); every entry is
+    also written to disk as a tensor file, trimmed by mtime to `max_files`.
+    `get` returns a copy, because concatenation fades waveforms in place.
+    """
 
-    # Optional timbre/pitch post-processing (consider disabled for long text)
+    def __init__(self, directory: Path = SENTENCE_CACHE_DIR, max_items: int = TTS_SENTENCE_CACHE_SIZE,
+                 max_files: int = TTS_SENTENCE_CACHE_MAX_FILES, enabled: bool = TTS_SENTENCE_CACHE_ENABLED):
+        self.directory = Path(directory)
+        self.max_items = max_items
+        self.max_files = max_files
+        self.enabled = enabled
+        self._items: "OrderedDict[str, torch.Tensor]" = OrderedDict()
+        self._files = None  # number of files on disk, counted on first write
+        self._counts = {"hits": 0, "diskHits": 0, "misses": 0}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(sentence: str, voice_key: str, sr: int, model: str = TTS_MODEL_KEY) -> str:
+        normalized = re.sub(r'\s+', ' ', sentence.strip())
+        return hashlib.sha1(f"{model}|{voice_key}|{sr}|{normalized}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[torch.Tensor]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            wav = self._items.get(key)
+            if wav is not None:
+                self._items.move_to_end(key)
+                self._counts["hits"] += 1
+                return wav.clone()
+
+        path = self.directory / f"{key}.pt"
+        try:
+            wav = torch.load(path, map_location="cpu")
+            os.utime(path)
+        except FileNotFoundError:
+            wav = None
+        except Exception as e:
+            logger.warning("[TTS] Ignoring unreadable sentence cache entry %s: %s", path, e)
+            wav = None
+
+        with self._lock:
+            if wav is None:
+                self._counts["misses"] += 1
+                return None
+            self._counts["diskHits"] += 1
+            self._remember(key, wav)
+        return wav.clone()
+
+    def put(self, key: str, wav: torch.Tensor) -> None:
+        if not self.enabled:
+            return
+        wav = wav.detach().cpu().clone()
+        with self._lock:
+            self._remember(key, wav)
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            path = self.directory / f"{key}.pt"
+            tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+            torch.save(wav, tmp)
+            existed = path.exists()
+            os.replace(tmp, path)
+            with self._lock:
+                if self._files is None:
+                    self._files = sum(1 for _ in self.directory.glob("*.pt"))
+                elif not existed:
+                    self._files += 1
+                if self._files > self.max_files:
+                    self._evict_files()
+        except Exception as e:
+            logger.warning("[TTS] Could not write sentence cache entry: %s", e)
+
+    def _remember(self, key: str, wav: torch.Tensor) -> None:
+        """Caller holds the lock."""
+        self._items[key] = wav
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+
+    def _evict_files(self) -> None:
+        """Delete the least recently used files down to 90% of the limit. Caller holds the lock."""
+        entries = sorted(self.directory.glob("*.pt"), key=lambda p: p.stat().st_mtime)
+        for path in entries[:max(0, len(entries) - int(self.max_files * 0.9))]:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+        self._files = sum(1 for _ in self.directory.glob("*.pt"))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"enabled": self.enabled, "inMemory": len(self._items), **self._counts}
+
+
+# Process-wide sentence memo shared by all synthesis paths
+sentence_cache = SentenceWaveCache()
+
+
+def _synthesize_cached(ctx: _SynthContext, chunks: List[str], log_debug: bool) -> List[torch.Tensor]:
+    """Waveforms of `chunks`; memoized ones are reused, only the rest is synthesized (batched)."""
+    keys = [sentence_cache.key(chunk, ctx.voice_key, ctx.sr_out) for chunk in chunks]
+    wavs = [sentence_cache.get(key) for key in keys]
+    missing = [i for i, wav in enumerate(wavs) if wav is None]
+    if log_debug and len(missing) < len(chunks):
+        logger.debug("[TTS] Reusing %d of %d sentences from cache.", len(chunks) - len(missing), len(chunks))
+    if missing:
+        fresh = _synthesize_batch(ctx, [chunks[i] for i in missing], log_debug)
+        for i, wav in zip(missing, fresh):
+            sentence_cache.put(keys[i], wav)
+            wavs[i] = wav
+    return wavs
+
+
+def _apply_voice_fx(
+    waveform: torch.Tensor,
+    sr: int,
+    pitch_shift_steps: float,
+    male_timbre_tweak: bool,
+    treble_cut_db: float,
+    presence_cut_db: float,
+    body_boost_db: float,
+) -> torch.Tensor:
+    """Optional timbre/pitch post-processing (consider disabled for long text)."""
     if abs(pitch_shift_steps) > 1e-6:
         w = waveform.unsqueeze(0) if waveform.dim() == 1 else waveform
-        ps = torchaudio.transforms.PitchShift(sample_rate=sr_out, n_steps=pitch_shift_steps)
+        ps = torchaudio.transforms.PitchShift(sample_rate=sr, n_steps=pitch_shift_steps)
         waveform = ps(w).squeeze(0)
     if male_timbre_tweak:
-        waveform = _male_tone(waveform, sr_out, treble_cut_db, presence_cut_db, body_boost_db)
+        waveform = _male_tone(waveform, sr, treble_cut_db, presence_cut_db, body_boost_db)
+    return waveform
+
+
+def _is_long_form(chunks: List[str]) -> bool:
+    """Replies this long are rendered without pitch shift and timbre tweak."""
+    return sum(len(c) for c in chunks) > 800
+
+
+def tts_speecht5_hifigan(
+    text: str,
+    voice_ref_wavs: Union[str, List[str]],  # accept one or many
+    out_path: str,
+    device: Optional[str] = None,
+    normalize_spk: bool = True,
+    require_real_embed: bool = True,
+    allow_random_fallback: bool = True,
+    random_seed: int = 0,
+    pitch_shift_steps: float = 0.0,
+    min_ref_sec: float = 5.0,
+    max_ref_sec: float = 20.0,
+    log_debug: bool = True,
+    male_timbre_tweak: bool = True,
+    treble_cut_db: float = 6.0,
+    presence_cut_db: float = 3.0,
+    body_boost_db: float = 2.5,
+) -> Tuple[str, int]:
+    """
+    Text-to-Speech (SpeechT5 + HiFi-GAN) with multiple reference support.
+    - Accepts one or many reference files (list of paths).
+    - Averages embeddings across all files and speech chunks.
+    - Optional pitch shift + EQ tweaks for darker/more male timbre.
+    - Splits long text into ~280-token chunks to avoid crash/drift.
+    """
+    ctx = _synthesis_context(
+        voice_ref_wavs, device, normalize_spk, require_real_embed, allow_random_fallback,
+        random_seed, min_ref_sec, max_ref_sec, log_debug,
+    )
+
+    # --- Normalize & chunk text ---
+    text = _normalize_text_quick(text)
+    if sentence_cache.enabled and TTS_SENTENCE_CHUNKS:
+        # Sentence chunks, so stock sentences hit the memo whatever surrounds them
+        chunks = _split_sentences(text, TTS_SENTENCE_CACHE_MIN_CHARS)
+    else:
+        chunks = _chunk_text_by_tokens(text, ctx.processor, max_tokens=280)
+    if log_debug and len(chunks) > 1:
+        logger.debug("[TTS] Long text split into %d chunks.", len(chunks))
+
+    # Optional: tone down FX automatically for very long inputs
+    if _is_long_form(chunks):
+        # Disable by default for long-form; you can override by passing flags from routes
+        pitch_shift_steps = 0.0
+        male_timbre_tweak = False
+        if log_debug:
+            logger.debug("[TTS] Long-form detected → disabling pitch shift & timbre tweak for cleanliness.")
+
+    chunk_wavs = _synthesize_cached(ctx, chunks if chunks else [text], log_debug)
+
+    # Concatenate all chunks with short pauses to avoid phoneme smearing
+    waveform = _concat_with_pauses(chunk_wavs, sr=ctx.sr_out, pause_ms=120, edge_fade_ms=6)
+
+    waveform = _apply_voice_fx(waveform, ctx.sr_out, pitch_shift_steps, male_timbre_tweak,
+                               treble_cut_db, presence_cut_db, body_boost_db)
+
+    sf.write(out_path, waveform.detach().cpu().numpy(), ctx.sr_out)
+    return out_path, ctx.sr_out
 
-    sf.write(out_path, waveform.detach().cpu().numpy(), sr_out)
-    return out_path, sr_out
+
+def _split_sentences(text: str, min_chars: int = TTS_STREAM_MIN_CHARS) -> List[str]:
+    """Sentences of `text`; fragments shorter than `min_chars` are merged forward."""
+    raw = re.split(r'(?<=[\.\!\?\:])\s+|\n{2,}', text.strip())
+    sentences: List[str] = []
+    pending = ""
+    for piece in (p.strip() for p in raw):
+        if not piece:
+            continue
+        pending = f"{pending} {piece}" if pending else piece
+        if len(pending) >= min_chars:
+            sentences.append(pending)
+            pending = ""
+    if pending:
+        if sentences:
+            sentences[-1] = f"{sentences[-1]} {pending}"
+        else:
+            sentences.append(pending)
+    return sentences
+
+
+def tts_stream_sentences(
+    text: str,
+    voice_ref_wavs: Union[str, List[str]],
+    device: Optional[str] = None,
+    normalize_spk: bool = True,
+    require_real_embed: bool = True,
+    allow_random_fallback: bool = True,
+    random_seed: int = 0,
+    pitch_shift_steps: float = 0.0,
+    min_ref_sec: float = 5.0,
+    max_ref_sec: float = 20.0,
+    log_debug: bool = True,
+    male_timbre_tweak: bool = True,
+    treble_cut_db: float = 6.0,
+    presence_cut_db: float = 3.0,
+    body_boost_db: float = 2.5,
+    pause_ms: int = 120,
+) -> Iterator[Tuple[int, str, torch.Tensor, int]]:
+    """
+    Sentence-by-sentence variant of `tts_speecht5_hifigan`.
+
+    Yields (index, sentence, waveform, sample_rate) as soon as each sentence
+    is synthesized. FX run per sentence and every sentence after the first
+    starts with the inter-chunk pause, so concatenating the yielded
+    waveforms gives the complete reply.
+    """
+    ctx = _synthesis_context(
+        voice_ref_wavs, device, normalize_spk, require_real_embed, allow_random_fallback,
+        random_seed, min_ref_sec, max_ref_sec, log_debug,
+    )
+
+    text = _normalize_text_quick(text)
+    sentences = _split_sentences(text) or [text]
+    if _is_long_form(sentences):
+        pitch_shift_steps = 0.0
+        male_timbre_tweak = False
+
+    pause = torch.zeros(max(1, int(ctx.sr_out * pause_ms / 1000)))
+    for i, sentence in enumerate(sentences):
+        # With sentence chunks, memoized per unit so stream sentences share entries with full replies
+        parts = _split_sentences(sentence, TTS_SENTENCE_CACHE_MIN_CHARS) if TTS_SENTENCE_CHUNKS else [sentence]
+        wav = _concat_with_pauses(_synthesize_cached(ctx, parts or [sentence], log_debug),
+                                  sr=ctx.sr_out, pause_ms=pause_ms, edge_fade_ms=6)
+        wav = _apply_voice_fx(wav, ctx.sr_out, pitch_shift_steps, male_timbre_tweak,
+                              treble_cut_db, presence_cut_db, body_boost_db).detach().cpu()
+        if i > 0:
+            wav = torch.cat([pause, wav])
+        yield i, sentence, wav, ctx.sr_out
+
+
+def pcm16_bytes(waveform: torch.Tensor) -> bytes:
+    """Little-endian 16-bit PCM of a mono waveform in [-1, 1]."""
+    samples = torch.clamp(waveform.detach().cpu().view(-1), -1.0, 1.0)
+    return (samples * 32767.0).round().to(torch.int16).numpy().tobytes()
+
+
+def wav_bytes(waveform: torch.Tensor, sr: int) -> bytes:
+    """A complete, self-contained WAV file of one waveform (e.g. one sentence)."""
+    buf = io.BytesIO()
+    sf.write(buf, waveform.detach().cpu().view(-1).numpy(), sr, format="WAV", subtype="PCM_16")
+    return buf.getvalue()
+
+
+def stream_wav_header(sr: int) -> bytes:
+    """WAV header of a mono 16-bit stream whose length is not known yet."""
+    unknown = 0xFFFFFFFF
+    return (
+        b"RIFF" + struct.pack("<I", unknown) + b"WAVE"
+        + b"fmt " + struct.pack("<IHHIIHH", 16, 1, 1, sr, sr * 2, 2, 16)
+        + b"data" + struct.pack("<I", unknown)
+    )
 
 
 # ---------------------- Public API used by routes ----------------------
@@ -627,17 +981,151 @@ def _resolve_ref_wavs(voice: Union[str, List[str]]) -> List[str]:
     return []
 
 
+class TTSOutputCache:
+    """
+    Content-addressed cache of synthesized replies.
+
+    Files live in a `cache/` subdirectory of the regular TTS output as
+    `<key><ext>`, where the key hashes the normalized text, the voice
+    signature, the model checkpoints, the render mode, the output format and
+    the FX parameters. The subdirectory belongs to the cache alone (age-based
+    cleanup of the output directory leaves it alone), so the byte count kept
+    per directory stays exact. Callers never get a path inside it: `put`
+    links the fresh file into the cache and `get` hands out a new hardlink
+    (or copy) in the output directory, so stored message URLs survive
+    eviction. Hits bump the file's mtime; once the cached files exceed
+    `max_bytes`, the least recently used ones are deleted.
+    """
+
+    SUBDIR = "cache"
+
+    def __init__(self, max_bytes: int = TTS_CACHE_MAX_MB * 1024 * 1024, enabled: bool = TTS_CACHE_ENABLED):
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._sizes: Dict[Path, Optional[int]] = {}  # cache directory -> bytes on disk, counted on first write
+        self._counts = {"hits": 0, "misses": 0, "evictions": 0}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(text: str, ref_wavs: List[str], ext: str, fx: dict, model: str = TTS_MODEL_KEY,
+            mode: str = "full") -> str:
+        """`mode` is the render path ("full" or "stream"); they chunk and apply FX differently."""
+        blob = json.dumps({
+            "text": _normalize_text_quick(text),
+            "voice": _voice_files_signature(ref_wavs),
+            "model": model,
+            "mode": mode,
+            "format": ext,
+            "fx": fx,
+        }, sort_keys=True)
+        return hashlib.sha1(blob.encode("utf-8")).hexdigest()
+
+    def get(self, directory: Path, key: str, ext: str) -> Optional[Path]:
+        """A fresh file in `directory` with the cached reply, or None on a miss."""
+        if not self.enabled:
+            return None
+        directory = Path(directory)
+        cache_dir = directory / self.SUBDIR
+        # A failed MP3 conversion stores the WAV instead
+        for suffix in dict.fromkeys((ext, ".wav")):
+            path = cache_dir / f"{key}{suffix}"
+            try:
+                os.utime(path)
+                out = directory / f"{uuid.uuid4().hex}{suffix}"
+                _link_or_copy(path, out)
+            except OSError:
+                continue  # not cached (or deleted meanwhile)
+            self._count("hits")
+            return out
+        self._count("misses")
+        return None
+
+    def put(self, directory: Path, key: str, path: Path) -> Path:
+        """Add a freshly synthesized file to the cache; the file itself stays where it is."""
+        if not self.enabled:
+            return path
+        cache_dir = Path(directory) / self.SUBDIR
+        target = cache_dir / f"{key}{path.suffix}"
+        try:
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp = cache_dir / f"{key}.{threading.get_ident()}.tmp"
+            _link_or_copy(path, tmp)
+            existed = target.exists()
+            os.replace(tmp, target)
+        except OSError as e:
+            logger.warning("[TTS] Could not cache %s: %s", path, e)
+            return path
+        with self._lock:
+            size = self._sizes.get(cache_dir)
+            if size is None:
+                size = self._disk_usage(cache_dir)
+            elif not existed:
+                size += target.stat().st_size
+            if size > self.max_bytes:
+                size = self._evict(cache_dir, keep=target)
+            self._sizes[cache_dir] = size
+        return path
+
+    @staticmethod
+    def _disk_usage(cache_dir: Path) -> int:
+        return sum(p.stat().st_size for p in cache_dir.iterdir() if p.is_file())
+
+    def _evict(self, cache_dir: Path, keep: Path) -> int:
+        """Delete the least recently used files down to 90% of the limit. Caller holds the lock."""
+        entries = sorted(
+            (p for p in cache_dir.iterdir() if p.is_file() and p != keep),
+            key=lambda p: p.stat().st_mtime,
+        )
+        size = self._disk_usage(cache_dir)
+        for path in entries:
+            if size <= self.max_bytes * 0.9:
+                break
+            try:
+                file_size = path.stat().st_size
+                path.unlink()
+            except OSError:
+                continue
+            size -= file_size
+            self._counts["evictions"] += 1
+        return size
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counts[name] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"enabled": self.enabled, **self._counts}
+
+
+def _link_or_copy(source: Path, target: Path) -> None:
+    """Hardlink `source` to `target`, copying where links are not supported."""
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
+
+
+# Process-wide cache used by generate_tts_audio_safe
+tts_cache = TTSOutputCache()
+
+
 def generate_tts_audio_safe(
     text: str,
     output_dir: Path,
     voice: Optional[Union[str, List[str]]] = None,
+    on_sentence: Optional[Callable[[int, str, torch.Tensor, int], None]] = None,
 ) -> Optional[str]:
     """
     Generate text-to-speech audio using local SpeechT5 pipeline, wrapped with robust error handling.
     Returns the path to the generated audio file (wav or mp3), or None on failure.
+
+    With `on_sentence`, the reply is synthesized sentence by sentence and
+    the callback gets (index, sentence, waveform, sample_rate) for each one
+    as soon as it is ready; the complete file is still written at the end.
     """
     if not text or not text.strip():
-        print("[TTS] No text provided for TTS generation")
+        logger.info("[TTS] No text provided for TTS generation")
         return None
 
     if voice is None:
@@ -652,25 +1140,40 @@ def generate_tts_audio_safe(
 
     # Resolve reference wavs
     ref_wavs = _resolve_ref_wavs(voice)
+
+    # Identical text in the same voice is served from the output cache
+    cache_key = tts_cache.key(text, ref_wavs, ext, TTS_FX, mode="stream" if on_sentence is not None else "full")
+    cached = tts_cache.get(output_dir, cache_key, ext)
+    if cached is not None:
+        logger.debug("[TTS] Output cache hit: %s", cached.name)
+        if on_sentence is not None:
+            _replay_cached(cached, text, on_sentence)
+        return str(cached)
+
     require_real = True
     allow_rand = True
     if not ref_wavs:
-        print("[TTS] No reference wavs found. Falling back to random embedding (voice cloning disabled).")
+        logger.warning("[TTS] No reference wavs found. Falling back to random embedding (voice cloning disabled).")
         require_real = False
 
     # If mp3 requested, synthesize wav first and convert via torchaudio if available
     tmp_wav_path = out_path.with_suffix(".wav") if ext == ".mp3" else out_path
 
     try:
-        path, sr = tts_speecht5_hifigan(
-            text=text,
-            voice_ref_wavs=ref_wavs if ref_wavs else ["_dummy"],
-            out_path=str(tmp_wav_path),
-            require_real_embed=require_real,
-            allow_random_fallback=allow_rand,
-            pitch_shift_steps=-1.0,  # slightly lower pitch for a calmer tone; auto-disabled on long text
-            log_debug=True,
-        )
+        if on_sentence is not None:
+            path, sr = _synthesize_streaming(
+                text, ref_wavs, str(tmp_wav_path), require_real, allow_rand, on_sentence
+            )
+        else:
+            path, sr = tts_speecht5_hifigan(
+                text=text,
+                voice_ref_wavs=ref_wavs if ref_wavs else ["_dummy"],
+                out_path=str(tmp_wav_path),
+                require_real_embed=require_real,
+                allow_random_fallback=allow_rand,
+                log_debug=logger.isEnabledFor(logging.DEBUG),
+                **TTS_FX,
+            )
         # Convert to mp3 if requested
         if ext == ".mp3":
             try:
@@ -681,37 +1184,99 @@ def generate_tts_audio_safe(
                 except Exception:
                     pass
             except Exception as ce:
-                print(f"[TTS] MP3 conversion failed ({ce}), keeping WAV instead.")
+                logger.warning("[TTS] MP3 conversion failed (%s), keeping WAV instead.", ce)
                 out_path = Path(path)
         else:
             out_path = Path(path)
 
-        return str(out_path)
+        return str(tts_cache.put(output_dir, cache_key, out_path))
 
     except Exception as e:
-        print(f"[TTS] Error generating TTS: {e}")
-        traceback.print_exc()
+        logger.exception("[TTS] Error generating TTS: %s", e)
         return None
 
 
+def _replay_cached(path: Path, text: str, on_sentence: Callable[[int, str, torch.Tensor, int], None]) -> None:
+    """Hand a cached reply to a streaming listener, as one piece."""
+    try:
+        wav, sr = torchaudio.load(str(path))
+        on_sentence(0, text, wav.mean(dim=0), sr)
+    except Exception as e:
+        logger.warning("[TTS] Could not replay cached reply %s: %s", path.name, e)
+
+
+def _synthesize_streaming(
+    text: str,
+    ref_wavs: List[str],
+    out_path: str,
+    require_real: bool,
+    allow_rand: bool,
+    on_sentence: Callable[[int, str, torch.Tensor, int], None],
+) -> Tuple[str, int]:
+    """Stream sentences to `on_sentence`, then write the whole reply to `out_path`."""
+    waves: List[torch.Tensor] = []
+    sr = 16000
+    for index, sentence, wav, sr in tts_stream_sentences(
+        text=text,
+        voice_ref_wavs=ref_wavs if ref_wavs else ["_dummy"],
+        require_real_embed=require_real,
+        allow_random_fallback=allow_rand,
+        log_debug=logger.isEnabledFor(logging.DEBUG),
+        **TTS_FX,
+    ):
+        waves.append(wav)
+        try:
+            on_sentence(index, sentence, wav, sr)
+        except Exception as e:
+            # A dropped listener must not cost the stored audio
+            logger.warning("[TTS] Sentence callback failed: %s", e)
+    waveform = torch.cat(waves) if waves else torch.zeros(1)
+    sf.write(out_path, waveform.numpy(), sr)
+    return out_path, sr
+
+
+def stream_tts_wav(text: str, voice: Optional[Union[str, List[str]]] = None) -> Iterator[bytes]:
+    """
+    Chunked WAV stream of `text`: a header with open length, then the PCM of
+    each sentence as soon as it is synthesized. Stops early on errors.
+    """
+    ref_wavs = _resolve_ref_wavs(voice if voice is not None else TTS_VOICE)
+    try:
+        for index, _, wav, sr in tts_stream_sentences(
+            text=text,
+            voice_ref_wavs=ref_wavs if ref_wavs else ["_dummy"],
+            require_real_embed=bool(ref_wavs),
+            allow_random_fallback=True,
+            log_debug=logger.isEnabledFor(logging.DEBUG),
+            **TTS_FX,
+        ):
+            if index == 0:
+                yield stream_wav_header(sr)
+            yield pcm16_bytes(wav)
+    except Exception as e:
+        logger.exception("[TTS] Error streaming TTS: %s", e)
+
+
 def generate_therapy_tts_safe(
     text: str,
     output_dir: Path,
     voice: Optional[Union[str, List[str]]] = None,
+    on_sentence: Optional[Callable[[int, str, torch.Tensor, int], None]] = None,
 ) -> Optional[str]:
     """
     Compatibility wrapper used by routes.
     """
     if not is_tts_enabled():
-        print("[TTS] Disabled via ENABLE_TTS")
+        logger.debug("[TTS] Disabled via ENABLE_TTS")
         return None
-    return generate_tts_audio_safe(text, output_dir, voice=voice or TTS_VOICE)
+    return generate_tts_audio_safe(text, output_dir, voice=voice or TTS_VOICE, on_sentence=on_sentence)
 
 
 def cleanup_old_tts_files(directory: Path, max_age_hours: int = 24) -> int:
     """
     Delete audio files in 'directory' older than max_age_hours.
-    Returns the count of deleted files.
+    Returns the count of deleted files. Only files directly in 'directory'
+    are considered; the output cache keeps its own subdirectory.
     """
     directory = Path(directory)
     if not directory.exists():
@@ -724,9 +1289,9 @@ def cleanup_old_tts_files(directory: Path, max_age_hours: int = 24) -> int:
                 p.unlink()
                 deleted += 1
         except Exception as e:
-            print(f"[TTS] Cleanup warning: failed to delete {p}: {e}")
+            logger.warning("[TTS] Cleanup warning: failed to delete %s: %s", p, e)
     if deleted:
-        print(f"[TTS] Cleaned up {deleted} old TTS files from {directory}")
+        logger.info("[TTS] Cleaned up %d old TTS files from %s", deleted, directory)
     return deleted
 
 
@@ -756,10 +1321,26 @@ def warm_speaker_embedding_cache(voice: Optional[Union[str, List[str]]] = None)
             require_real=True,
             allow_random=True,
             random_seed=0,
-            log_debug=True,
+            log_debug=logger.isEnabledFor(logging.DEBUG),
         )
     except Exception as e:
-        print(f"[TTS] Warm cache failed: {e}")
+        logger.warning("[TTS] Warm cache failed: %s", e)
+
+
+def warm_up_tts() -> None:
+    """
+    Load the SpeechT5 processor, acoustic model, vocoder and speaker embedding,
+    then synthesize one short phrase so the first reply pays no load cost.
+    The phrase goes straight through the models: neither the output cache nor
+    the sentence memo is read or written, so every synthesis step really runs.
+    """
+    ref_wavs = _resolve_ref_wavs(TTS_VOICE)
+    ctx = _synthesis_context(
+        ref_wavs if ref_wavs else ["_dummy"], None, True, bool(ref_wavs), True,
+        0, 5.0, 20.0, logger.isEnabledFor(logging.DEBUG),
+    )
+    wav = _synthesize_chunk(ctx, "Hello.", 1, False)
+    _apply_voice_fx(wav, ctx.sr_out, **TTS_FX)
 
 
 # ------------------------------ Self test ------------------------------
@@ -0,0 +1,100 @@
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict
+
+from logic.crew_registry import crew_registry, CREW_PREBUILD
+from logic.tools.ser_tool import warm_up_ser
+from swagger_server.logging_setup import get_logger
+from swagger_server.tts_service import is_tts_enabled, warm_up_tts
+
+logger = get_logger(__name__)
+
+# ---------------------------------------------------------------------------
+# Config
+# ---------------------------------------------------------------------------
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "1") == "1"
+WARMUP_WORKERS = int(os.getenv("WARMUP_WORKERS", "3"))
+
+
+class WarmupState:
+    """
+    Runs the model warm-up tasks in parallel and tracks their progress.
+
+    Every task loads its models and runs one dummy inference. The instance
+    is ready once all tasks have finished. A failed task does not block
+    readiness, because each component already degrades on its own (e.g. a
+    reply without TTS audio). The failure is reported instead.
+    """
+
+    def __init__(self):
+        self._components: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._started = False
+        self._finished = False
+
+    def start(self, tasks: Dict[str, Callable[[], None]], workers: int = WARMUP_WORKERS) -> None:
+        """Start the tasks in the background (once); returns immediately."""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            for name in tasks:
+                self._components[name] = {"status": "pending", "seconds": None, "error": None}
+
+        def _run_all():
+            with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="warmup") as pool:
+                for name, fn in tasks.items():
+                    pool.submit(self._run, name, fn)
+            with self._lock:
+                self._finished = True
+            logger.info("Warm-up finished: %s", self.snapshot()["components"])
+
+        threading.Thread(target=_run_all, name="warmup", daemon=True).start()
+
+    def mark_ready(self) -> None:
+        """Readiness without warm-up (WARMUP_ENABLED=0)."""
+        with self._lock:
+            self._started = True
+            self._finished = True
+
+    def _run(self, name: str, fn: Callable[[], None]) -> None:
+        self._update(name, status="loading")
+        start = time.time()
+        try:
+            fn()
+            self._update(name, status="ready", seconds=round(time.time() - start, 2))
+            logger.info("Warm-up of %s done in %.2fs", name, time.time() - start)
+        except Exception as e:
+            self._update(name, status="failed", seconds=round(time.time() - start, 2), error=str(e))
+            logger.warning("Warm-up of %s failed: %s", name, e)
+
+    def _update(self, name: str, **fields) -> None:
+        with self._lock:
+            self._components[name].update(fields)
+
+    def is_ready(self) -> bool:
+        with self._lock:
+            return self._finished
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "ready": self._finished,
+                "components": {name: dict(info) for name, info in self._components.items()},
+            }
+
+
+def default_tasks(stream: bool) -> Dict[str, Callable[[], None]]:
+    """Warm-up task per configured model family."""
+    tasks = {"ser": warm_up_ser}
+    if is_tts_enabled():
+        tasks["tts"] = warm_up_tts
+    if CREW_PREBUILD:
+        tasks["crews"] = lambda: crew_registry.warm_up(stream=stream)
+    return tasks
+
+
+# Process-wide warm-up state behind /ready
+warmup_state = WarmupState()